@@ -0,0 +1,130 @@
+"""
+MemoryMonitorService 读写竞争基准：对比有无 /api/status 读取压力时采样线程的吞吐与调度延迟。
+
+用法：python -m benchmarks.contention --devices 50 --readers 4 --duration 5
+"""
+
+import argparse
+import itertools
+import json
+import statistics
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+from monitor_service import MemoryMonitorService
+from session_log import RawSample
+
+
+class _FakeCollectService(MemoryMonitorService):
+    """用固定耗时的 sleep 模拟 adb 调用（释放 GIL），其余采样路径保持不变。"""
+
+    def __init__(self, collect_delay: float, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.collect_delay = collect_delay
+        self.samples = itertools.count()
+        self.lags: List[float] = []
+        self._last_call: Dict[str, float] = {}
+
+    def _run_collector(self, device_id: str) -> RawSample:
+        now = time.perf_counter()
+        last = self._last_call.get(device_id)
+        if last is not None:
+            # 上次采集返回到本次采集开始之间除去采样周期，剩下的就是记录/等锁造成的延迟
+            self.lags.append(now - last - self.interval)
+        next(self.samples)
+        time.sleep(self.collect_delay)
+        self._last_call[device_id] = time.perf_counter()
+        return RawSample(0, "TOTAL    102400", "")
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_phase(args, readers: int) -> Dict[str, float]:
+    service = _FakeCollectService(
+        collect_delay=args.collect_delay,
+        process_name="bench.process",
+        devices=[f"bench-{idx}" for idx in range(args.devices)],
+        interval=0,
+        threshold_mb=float("inf"),
+        history_points=args.history,
+    )
+    service.start()
+    # 先让每台设备的历史填满，读取方才有完整的负载
+    time.sleep(args.warmup)
+    service.lags.clear()
+    start_samples = next(service.samples)
+
+    stop = threading.Event()
+    reads = itertools.count()
+
+    def reader() -> None:
+        while not stop.is_set():
+            service.get_status()
+            next(reads)
+            if args.read_interval:
+                time.sleep(args.read_interval)
+
+    reader_threads = [threading.Thread(target=reader, daemon=True) for _ in range(readers)]
+    for thread in reader_threads:
+        thread.start()
+
+    begin = time.perf_counter()
+    time.sleep(args.duration)
+    elapsed = time.perf_counter() - begin
+    samples = next(service.samples) - start_samples
+    read_count = next(reads)
+
+    stop.set()
+    for thread in reader_threads:
+        thread.join(timeout=1)
+    service.stop()
+
+    lags_ms = [lag * 1000 for lag in service.lags]
+    return {
+        "readers": readers,
+        "samples_per_sec": round(samples / elapsed, 1),
+        "reads_per_sec": round(read_count / elapsed, 1),
+        "lag_p50_ms": round(_percentile(lags_ms, 50), 3),
+        "lag_p99_ms": round(_percentile(lags_ms, 99), 3),
+        "lag_mean_ms": round(statistics.fmean(lags_ms), 3) if lags_ms else 0.0,
+    }
+
+
+def _parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="MemoryMonitorService 读写竞争基准")
+    parser.add_argument("--devices", type=int, default=50, help="模拟设备数量")
+    parser.add_argument("--readers", type=int, default=4, help="并发读取 get_status 的线程数")
+    parser.add_argument("--duration", type=float, default=5.0, help="每个阶段的测量时长（秒）")
+    parser.add_argument("--read-interval", type=float, default=0.002, help="每个读取线程两次请求之间的间隔（秒）")
+    parser.add_argument("--warmup", type=float, default=1.0, help="测量前的预热时长（秒）")
+    parser.add_argument("--history", type=int, default=300, help="每台设备保留的历史点数")
+    parser.add_argument("--collect-delay", type=float, default=0.005, help="模拟单次 adb 采集耗时（秒）")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = _parse_args(argv)
+    idle = run_phase(args, readers=0)
+    loaded = run_phase(args, readers=args.readers)
+    report = {
+        "devices": args.devices,
+        "history_points": args.history,
+        "idle": idle,
+        "loaded": loaded,
+        "sampling_ratio": round(loaded["samples_per_sec"] / idle["samples_per_sec"], 3)
+        if idle["samples_per_sec"]
+        else 0.0,
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
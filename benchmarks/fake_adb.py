@@ -0,0 +1,180 @@
+"""
+本地 adb 替身，供负载基准放在 PATH 上替代真实 adb。
+
+支持的命令：devices / connect / root / remount / -s <设备> shell dumpsys meminfo <包名> /
+shell am dumpheap <包名> <路径> / shell rm -rf <路径> / pull <远端> <本地>。
+行为通过环境变量配置：
+
+  FAKE_ADB_DEVICES        模拟设备数量（默认 10），序列号为 fake-0000 ...
+  FAKE_ADB_STATE_DIR      保存“设备端”文件和起始时间的目录
+  FAKE_ADB_LATENCY        每条命令的基础耗时（秒，默认 0.05）
+  FAKE_ADB_JITTER         在基础耗时上叠加的均匀抖动上限（秒，默认 0.02）
+  FAKE_ADB_FAILURE_RATE   dumpsys 失败概率（默认 0）
+  FAKE_ADB_BASE_MB / FAKE_ADB_PEAK_MB / FAKE_ADB_PERIOD
+                          内存按锯齿波在 base 和 peak 之间循环，周期 period 秒，各设备相位错开
+  FAKE_ADB_HPROF_MB       am dumpheap 生成的合成 hprof 大小（MB，默认 1）
+"""
+
+import os
+import random
+import shutil
+import struct
+import sys
+import time
+import zlib
+from pathlib import Path
+from typing import List
+
+CHUNK = 1024 * 1024
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.environ.get(name, default))
+
+
+def _state_dir() -> Path:
+    path = Path(os.environ.get("FAKE_ADB_STATE_DIR", "./tmp/fake_adb"))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _devices() -> List[str]:
+    return [f"fake-{idx:04d}" for idx in range(int(os.environ.get("FAKE_ADB_DEVICES", "10")))]
+
+
+def _epoch(state_dir: Path) -> float:
+    marker = state_dir / "epoch"
+    try:
+        return float(marker.read_text())
+    except (OSError, ValueError):
+        now = time.time()
+        marker.write_text(str(now))
+        return now
+
+
+def _simulate_latency() -> None:
+    latency = _env_float("FAKE_ADB_LATENCY", 0.05) + random.uniform(0, _env_float("FAKE_ADB_JITTER", 0.02))
+    if latency > 0:
+        time.sleep(latency)
+
+
+def _remote_path(state_dir: Path, device: str, remote: str) -> Path:
+    return state_dir / device / remote.strip("/").replace("/", "_")
+
+
+def meminfo_text(package: str, total_kb: int, pid: int = 4321) -> str:
+    """生成与 Android 10+ dumpsys meminfo 形状一致的输出。"""
+    native = total_kb // 5
+    dalvik = total_kb // 4
+    return (
+        "Applications Memory Usage (in Kilobytes):\n"
+        f"Uptime: {pid * 1000} Realtime: {pid * 1000}\n\n"
+        f"** MEMINFO in pid {pid} [{package}] **\n"
+        "                   Pss  Private  Private  SwapPss      Rss     Heap     Heap     Heap\n"
+        "                 Total    Dirty    Clean    Dirty    Total     Size    Alloc     Free\n"
+        "                ------   ------   ------   ------   ------   ------   ------   ------\n"
+        f"  Native Heap    {native:6d}   {native - 100:6d}        0       12   {native + 900:6d}    65536    40210    25325\n"
+        f"  Dalvik Heap    {dalvik:6d}   {dalvik - 200:6d}        0        8   {dalvik + 700:6d}    30720    15360    15360\n"
+        "        Stack       52       52        0        0       56\n"
+        "       Ashmem        2        0        0        0        8\n"
+        "      .so mmap     8964      236     4144       64    41312\n"
+        "     .apk mmap     2715        0      784        0    26208\n"
+        "       Unknown     1024     1020        0        4     1032\n"
+        f"        TOTAL   {total_kb:6d}   {total_kb - 9000:6d}    12000      100   {total_kb + 40000:6d}    96256    55570    40685\n\n"
+        " App Summary\n"
+        "                       Pss(KB)                        Rss(KB)\n"
+        "                        ------                         ------\n"
+        f"           Java Heap:    {dalvik:6d}                          {dalvik + 700:6d}\n"
+        f"         Native Heap:    {native:6d}                          {native + 900:6d}\n"
+        f"           TOTAL PSS:   {total_kb:6d}            TOTAL RSS:   {total_kb + 40000:6d}       TOTAL SWAP PSS:      100\n"
+    )
+
+
+def write_synthetic_hprof(path: Path, size_bytes: int) -> None:
+    """写出带合法 hprof 文件头的合成文件：头 + 一条 STRING 记录 + 若干 HEAP_DUMP_SEGMENT。"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as fh:
+        fh.write(b"JAVA PROFILE 1.0.3\0")
+        fh.write(struct.pack(">IQ", 4, int(time.time() * 1000)))
+        name = b"fake.Object"
+        fh.write(struct.pack(">BII", 0x01, 0, 4 + len(name)) + struct.pack(">I", 1) + name)
+        written = fh.tell()
+        block = bytes(CHUNK)
+        while written < size_bytes:
+            body = min(CHUNK, size_bytes - written - 9)
+            if body <= 0:
+                break
+            fh.write(struct.pack(">BII", 0x1C, 0, body))
+            fh.write(block[:body])
+            written += 9 + body
+
+
+def _cmd_meminfo(device: str, package: str) -> int:
+    if random.random() < _env_float("FAKE_ADB_FAILURE_RATE", 0.0):
+        sys.stderr.write(f"error: device '{device}' not found\n")
+        return 1
+    state_dir = _state_dir()
+    base = _env_float("FAKE_ADB_BASE_MB", 150.0)
+    peak = _env_float("FAKE_ADB_PEAK_MB", 300.0)
+    period = _env_float("FAKE_ADB_PERIOD", 120.0)
+    phase = (zlib.crc32(device.encode()) % 1000) / 1000
+    position = ((time.time() - _epoch(state_dir)) / period + phase) % 1.0
+    total_kb = int((base + (peak - base) * position) * 1024)
+    sys.stdout.write(meminfo_text(package, total_kb))
+    return 0
+
+
+def _cmd_shell(device: str, args: List[str]) -> int:
+    if args[:2] == ["dumpsys", "meminfo"] and len(args) >= 3:
+        return _cmd_meminfo(device, args[2])
+    state_dir = _state_dir()
+    if args[:2] == ["am", "dumpheap"] and len(args) >= 4:
+        size = int(_env_float("FAKE_ADB_HPROF_MB", 1.0) * CHUNK)
+        write_synthetic_hprof(_remote_path(state_dir, device, args[3]), size)
+        return 0
+    if args[:1] == ["rm"]:
+        for target in args[1:]:
+            if not target.startswith("-"):
+                _remote_path(state_dir, device, target).unlink(missing_ok=True)
+        return 0
+    sys.stderr.write(f"fake adb: unsupported shell command: {' '.join(args)}\n")
+    return 1
+
+
+def main(argv: List[str]) -> int:
+    device = _devices()[0] if _devices() else ""
+    if len(argv) >= 2 and argv[0] == "-s":
+        device, argv = argv[1], argv[2:]
+    if not argv:
+        return 1
+
+    command, args = argv[0], argv[1:]
+    if command == "devices":
+        lines = ["List of devices attached"] + [f"{serial}\tdevice" for serial in _devices()]
+        sys.stdout.write("\n".join(lines) + "\n\n")
+        return 0
+    if command in ("root", "remount", "start-server", "kill-server"):
+        return 0
+
+    _simulate_latency()
+    if command == "connect":
+        sys.stdout.write(f"connected to {args[0] if args else ''}\n")
+        return 0
+    if command == "shell":
+        # 兼容 adb shell "cmd arg" 这种整体传参的写法
+        if len(args) == 1:
+            args = args[0].split()
+        return _cmd_shell(device, args)
+    if command == "pull" and len(args) >= 2:
+        source = _remote_path(_state_dir(), device, args[0])
+        if not source.exists():
+            sys.stderr.write(f"adb: error: remote object '{args[0]}' does not exist\n")
+            return 1
+        shutil.copyfile(source, args[1])
+        return 0
+    sys.stderr.write(f"fake adb: unsupported command: {' '.join(argv)}\n")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,276 @@
+"""
+MemoryMonitorService / server.py / heapdump 路径的规模化负载基准。
+
+把 benchmarks/fake_adb.py 包装成 PATH 上的 adb，按设备数量逐档启动独立子进程运行完整的 server.py，
+测量采样吞吐、调度延迟、主机 CPU/RSS 以及 API 延迟分位数，结果输出为 JSON，可作为回归基线：
+
+  python -m benchmarks.load --devices 10,100,1000 --duration 30 --output baseline.json
+  python -m benchmarks.load --devices 10,100 --baseline baseline.json --tolerance 0.2
+"""
+
+import argparse
+import json
+import os
+import stat
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+FAKE_ADB = Path(__file__).resolve().parent / "fake_adb.py"
+API_ENDPOINTS = ("/api/status", "/api/heapdumps", "/metrics")
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+    ordered = sorted(values)
+
+    def pick(pct: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))], 3)
+
+    return {"p50": pick(50), "p95": pick(95), "p99": pick(99)}
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/status", encoding="utf-8") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    import resource
+
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def install_shim(directory: Path) -> Path:
+    """在 directory 下生成 adb 可执行入口，转发给 fake_adb.py。"""
+    directory.mkdir(parents=True, exist_ok=True)
+    posix = directory / "adb"
+    posix.write_text(f'#!/bin/sh\nexec "{sys.executable}" -S "{FAKE_ADB}" "$@"\n', encoding="utf-8")
+    posix.chmod(posix.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    (directory / "adb.cmd").write_text(f'@"{sys.executable}" -S "{FAKE_ADB}" %*\n', encoding="utf-8")
+    return directory
+
+
+# --------------------------------------------------------------------- #
+# 子进程：加载 server.py，施加 API 负载并采集指标
+# --------------------------------------------------------------------- #
+def run_child(args) -> Dict[str, object]:
+    sys.path.insert(0, str(REPO_ROOT))
+    import server  # noqa: E402
+
+    # 环境变量已由父进程设置
+    app = server.create_app()
+    service = app.extensions["memory_monitor"]
+    metrics = service.metrics
+    time.sleep(args.warmup)
+
+    samples_before = metrics.samples.total()
+    cpu_before = os.times()
+    latencies: Dict[str, List[float]] = {endpoint: [] for endpoint in API_ENDPOINTS}
+    stop = threading.Event()
+
+    def client() -> None:
+        test_client = app.test_client()
+        while not stop.is_set():
+            for endpoint in API_ENDPOINTS:
+                started = time.perf_counter()
+                response = test_client.get(endpoint)
+                response.get_data()
+                latencies[endpoint].append((time.perf_counter() - started) * 1000)
+            time.sleep(args.api_interval)
+
+    clients = [threading.Thread(target=client, daemon=True) for _ in range(args.api_clients)]
+    for thread in clients:
+        thread.start()
+
+    begin = time.perf_counter()
+    time.sleep(args.duration)
+    elapsed = time.perf_counter() - begin
+    cpu_after = os.times()
+    samples = metrics.samples.total() - samples_before
+    stop.set()
+    for thread in clients:
+        thread.join(timeout=5)
+    server.shutdown_app(app)
+
+    devices = len(service.devices)
+    expected_rate = devices / (service.interval + args.latency + args.jitter / 2) if devices else 0.0
+    cpu_self = (cpu_after.user - cpu_before.user) + (cpu_after.system - cpu_before.system)
+    cpu_children = (cpu_after.children_user - cpu_before.children_user) + (
+        cpu_after.children_system - cpu_before.children_system
+    )
+    return {
+        "devices": devices,
+        "duration_s": round(elapsed, 2),
+        "samples_per_sec": round(samples / elapsed, 2),
+        "expected_samples_per_sec": round(expected_rate, 2),
+        "sample_errors": metrics.sample_errors.total(),
+        "schedule_lag_ms": {
+            "p50": round(metrics.schedule_lag.quantile(0.5) * 1000, 3),
+            "p95": round(metrics.schedule_lag.quantile(0.95) * 1000, 3),
+            "p99": round(metrics.schedule_lag.quantile(0.99) * 1000, 3),
+        },
+        "threshold_events": metrics.threshold_events.total(),
+        "heapdumps": metrics.heapdumps.total(),
+        "heapdump_bytes": metrics.heapdump_bytes.total(),
+        "cpu_percent": round(cpu_self / elapsed * 100, 1),
+        "adb_cpu_percent": round(cpu_children / elapsed * 100, 1),
+        "rss_mb": _rss_mb(),
+        "api_latency_ms": {endpoint: _percentiles(values) for endpoint, values in latencies.items()},
+        "api_requests_per_sec": round(sum(len(v) for v in latencies.values()) / elapsed, 1),
+    }
+
+
+# --------------------------------------------------------------------- #
+# 父进程：逐档启动子进程并汇总
+# --------------------------------------------------------------------- #
+def run_tier(args, devices: int, workdir: Path, shim_dir: Path) -> Dict[str, object]:
+    tier_dir = workdir / f"devices_{devices}"
+    env = dict(os.environ)
+    env.update(
+        {
+            "PATH": f"{shim_dir}{os.pathsep}{env.get('PATH', '')}",
+            "FAKE_ADB_DEVICES": str(devices),
+            "FAKE_ADB_STATE_DIR": str(tier_dir / "device"),
+            "FAKE_ADB_LATENCY": str(args.latency),
+            "FAKE_ADB_JITTER": str(args.jitter),
+            "FAKE_ADB_FAILURE_RATE": str(args.failure_rate),
+            "FAKE_ADB_PERIOD": str(args.period),
+            "FAKE_ADB_HPROF_MB": str(args.hprof_mb),
+            "MONITOR_PROCESS": "bench.fake.process",
+            "MONITOR_CONNECT_LIST": "127.0.0.1:5555",
+            "MONITOR_INTERVAL": str(args.interval),
+            "MONITOR_THRESHOLD_MB": str(args.threshold),
+            "MONITOR_WORKERS": str(args.workers),
+            "HEAPDUMP_SCRIPT": str(REPO_ROOT / "heapdump.py"),
+            "HEAPDUMP_OUTPUT": str(tier_dir / "heapdump"),
+        }
+    )
+    env.pop("MONITOR_DEVICES", None)
+    result_file = tier_dir / "result.json"
+    tier_dir.mkdir(parents=True, exist_ok=True)
+    cmd = [
+        sys.executable,
+        "-m",
+        "benchmarks.load",
+        "--child",
+        str(result_file),
+        "--duration",
+        str(args.duration),
+        "--warmup",
+        str(args.warmup),
+        "--api-clients",
+        str(args.api_clients),
+        "--api-interval",
+        str(args.api_interval),
+        "--latency",
+        str(args.latency),
+        "--jitter",
+        str(args.jitter),
+    ]
+    log_file = tier_dir / "server.log"
+    with open(log_file, "w", encoding="utf-8") as log:
+        subprocess.run(cmd, cwd=REPO_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT, check=True)
+    return json.loads(result_file.read_text(encoding="utf-8"))
+
+
+def compare(report: Dict[str, object], baseline: Dict[str, object], tolerance: float) -> List[str]:
+    regressions: List[str] = []
+    previous = {run["devices"]: run for run in baseline.get("runs", [])}
+    for run in report["runs"]:
+        old = previous.get(run["devices"])
+        if not old:
+            continue
+        if run["samples_per_sec"] < old["samples_per_sec"] * (1 - tolerance):
+            regressions.append(
+                f"{run['devices']} devices: samples/s {old['samples_per_sec']} -> {run['samples_per_sec']}"
+            )
+        for endpoint, stats in run["api_latency_ms"].items():
+            old_p95 = old["api_latency_ms"].get(endpoint, {}).get("p95")
+            if old_p95 and stats["p95"] > old_p95 * (1 + tolerance):
+                regressions.append(f"{run['devices']} devices: {endpoint} p95 {old_p95}ms -> {stats['p95']}ms")
+    return regressions
+
+
+def _parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="MemoryMonitorService 规模化负载基准（fake adb）")
+    parser.add_argument("--devices", default="10,100,1000", help="逗号分隔的设备数量档位")
+    parser.add_argument("--duration", type=float, default=30.0, help="每档测量时长（秒）")
+    parser.add_argument("--warmup", type=float, default=5.0, help="每档预热时长（秒）")
+    parser.add_argument("--interval", type=int, default=3, help="MONITOR_INTERVAL")
+    parser.add_argument("--threshold", type=float, default=250.0, help="MONITOR_THRESHOLD_MB")
+    parser.add_argument("--workers", type=int, default=0, help="MONITOR_WORKERS，大于 1 时使用多进程分片采样")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake adb 基础耗时（秒）")
+    parser.add_argument("--jitter", type=float, default=0.02, help="fake adb 抖动上限（秒）")
+    parser.add_argument("--failure-rate", type=float, default=0.01, help="dumpsys 失败概率")
+    parser.add_argument("--period", type=float, default=120.0, help="模拟内存锯齿波周期（秒）")
+    parser.add_argument("--hprof-mb", type=float, default=1.0, help="合成 hprof 大小（MB）")
+    parser.add_argument("--api-clients", type=int, default=4, help="并发 API 客户端数")
+    parser.add_argument("--api-interval", type=float, default=0.1, help="每个客户端一轮请求后的间隔（秒）")
+    parser.add_argument("--workdir", help="保存 fake 设备文件、heapdump 和日志的目录，默认临时目录")
+    parser.add_argument("--output", help="结果 JSON 输出路径，默认打印到标准输出")
+    parser.add_argument("--baseline", help="对比的基线 JSON，出现回归时以非零状态退出")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的相对回归幅度")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = _parse_args(argv)
+    if args.child:
+        result = run_child(args)
+        Path(args.child).write_text(json.dumps(result), encoding="utf-8")
+        return 0
+
+    tiers = [int(item) for item in args.devices.split(",") if item.strip()]
+    workdir = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix="monitor_load_"))
+    shim_dir = install_shim(workdir / "bin")
+
+    runs = []
+    for devices in tiers:
+        print(f"运行 {devices} 台模拟设备 ...", file=sys.stderr)
+        runs.append(run_tier(args, devices, workdir, shim_dir))
+
+    report = {
+        "config": {
+            key: getattr(args, key)
+            for key in (
+                "duration",
+                "interval",
+                "threshold",
+                "latency",
+                "jitter",
+                "failure_rate",
+                "period",
+                "hprof_mb",
+                "api_clients",
+                "api_interval",
+            )
+        },
+        "host": {"cpus": os.cpu_count(), "python": sys.version.split()[0], "platform": sys.platform},
+        "runs": runs,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+
+    if args.baseline:
+        regressions = compare(report, json.loads(Path(args.baseline).read_text(encoding="utf-8")), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION: {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,180 @@
+"""
+文本解析器微基准：meminfo、top、dumpsys package、crash/OOM 文件名和 heapdump 目录扫描。
+
+每个解析器在 benchmarks/fixtures 的样本上单独计时，输出每次解析的纳秒数与峰值分配字节数；
+给定基线时，任一用例变慢超过容差即以非零状态退出：
+
+  python -m benchmarks.parsers --baseline                # 对比仓库中的 benchmarks/parsers_baseline.json
+  python -m benchmarks.parsers --baseline other.json --tolerance 0.25
+
+纳秒数与机器相关：CI 机器更换或解析器有意变更后，在 CI 机器上重新生成并提交基线：
+
+  python -m benchmarks.parsers --save-baseline benchmarks/parsers_baseline.json
+"""
+
+import argparse
+import atexit
+import json
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from heapdump_retention import scan_dumps
+from monitor_service import parse_meminfo_total
+from top_collector import TopFrameParser
+from util import parseApkVersion, parseCrashOOMFileNames, parseTopPid
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "parsers_baseline.json"
+
+
+class Case(NamedTuple):
+    name: str
+    func: Callable[[], object]
+
+
+def _text(name: str) -> str:
+    return (FIXTURES / name).read_text(encoding="utf-8")
+
+
+def _lines(name: str) -> List[str]:
+    return [line for line in _text(name).splitlines() if line.strip()]
+
+
+def _heapdump_dir(name: str) -> Path:
+    # scan_dumps 读的是目录项和 stat，按样本中的文件名建空文件，进程退出时删除
+    directory = Path(tempfile.mkdtemp(prefix="parsers-heapdump-"))
+    atexit.register(shutil.rmtree, directory, True)
+    for file_name in _lines(name):
+        (directory / file_name).touch()
+    return directory
+
+
+def build_cases() -> List[Case]:
+    cases: List[Case] = []
+    for fixture in (
+        "meminfo_android8.txt",
+        "meminfo_android10.txt",
+        "meminfo_android13_summary.txt",
+        "meminfo_not_found.txt",
+    ):
+        output = _text(fixture)
+        cases.append(Case(f"meminfo/{fixture}", lambda output=output: parse_meminfo_total(output)))
+
+    top_lines = _lines("top_grep.log")
+    cases.append(Case("top/getTopPid[top_grep.log]", lambda: [parseTopPid(line) for line in top_lines]))
+
+    def parse_frames(lines: List[str]) -> int:
+        parser = TopFrameParser()
+        frames = sum(1 for line in lines if parser.feed(line) is not None)
+        return frames + (parser.flush() is not None)
+
+    toybox_lines = _text("top_toybox.log").splitlines()
+    cases.append(Case("top/TopFrameParser[top_toybox.log]", lambda: parse_frames(toybox_lines)))
+
+    for fixture in ("dumpsys_package_version.txt", "dumpsys_package_version_single.txt"):
+        result = _text(fixture)
+        cases.append(Case(f"apk_version/{fixture}", lambda result=result: parseApkVersion(result)))
+
+    crash_files = _lines("crash_files.txt")
+    dump_files = _lines("dump_files.txt")
+    cases.append(Case("crash_oom/file_names", lambda: parseCrashOOMFileNames(crash_files, dump_files)))
+
+    heapdump_dir = _heapdump_dir("heapdump_names.txt")
+    cases.append(Case("heapdump/scan_dumps[heapdump_names.txt]", lambda: scan_dumps(heapdump_dir)))
+    return cases
+
+
+def _time_case(case: Case, min_batch: float, repeats: int) -> float:
+    loops = 1
+    while True:
+        started = time.perf_counter_ns()
+        for _ in range(loops):
+            case.func()
+        elapsed = time.perf_counter_ns() - started
+        if elapsed >= min_batch * 1e9:
+            break
+        loops *= 2
+
+    best = elapsed / loops
+    for _ in range(repeats - 1):
+        started = time.perf_counter_ns()
+        for _ in range(loops):
+            case.func()
+        best = min(best, (time.perf_counter_ns() - started) / loops)
+    return best
+
+
+def _peak_alloc(case: Case) -> int:
+    case.func()
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        case.func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return max(0, peak - baseline)
+
+
+def run(min_batch: float = 0.05, repeats: int = 5, only: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+    for case in build_cases():
+        if only and only not in case.name:
+            continue
+        results[case.name] = {
+            "ns_per_parse": round(_time_case(case, min_batch, repeats), 1),
+            "peak_alloc_bytes": _peak_alloc(case),
+        }
+    return results
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    regressions = []
+    for name, stats in results.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        if stats["ns_per_parse"] > old["ns_per_parse"] * (1 + tolerance):
+            regressions.append(f"{name}: {old['ns_per_parse']}ns -> {stats['ns_per_parse']}ns")
+    return regressions
+
+
+def _parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="解析器微基准")
+    parser.add_argument("--filter", help="只运行名称包含该字符串的用例")
+    parser.add_argument("--min-batch", type=float, default=0.05, help="单批最少计时（秒）")
+    parser.add_argument("--repeats", type=int, default=5, help="重复批次，取最快的一次")
+    parser.add_argument(
+        "--baseline", nargs="?", const=str(DEFAULT_BASELINE), help=f"对比的基线 JSON，省略路径时使用 {DEFAULT_BASELINE.name}"
+    )
+    parser.add_argument("--tolerance", type=float, default=0.25, help="允许的相对变慢幅度")
+    parser.add_argument("--save-baseline", help="把本次结果写为基线 JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = _parse_args(argv)
+    results = run(args.min_batch, args.repeats, args.filter)
+    width = max((len(name) for name in results), default=0)
+    for name, stats in results.items():
+        print(f"{name:<{width}}  {stats['ns_per_parse']:>12.1f} ns  {stats['peak_alloc_bytes']:>8d} B")
+
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION: {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
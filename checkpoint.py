@@ -0,0 +1,259 @@
+import os
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from sketch import DDSketch
+
+# 文件布局：头部 (magic, 版本, 保留, 生成时间, 正文长度, 正文 CRC32) + zlib 压缩的正文
+MAGIC = b"MMCK"
+CHECKPOINT_VERSION = 1
+_HEADER = struct.Struct("<4sHHdII")
+_U8 = struct.Struct("<B")
+_U32 = struct.Struct("<I")
+_F64 = struct.Struct("<d")
+_POINT = struct.Struct("<dd")
+_SKETCH = struct.Struct("<qdQQddd")
+
+
+class CheckpointError(Exception):
+    pass
+
+
+class DeviceCheckpoint(NamedTuple):
+    device: str
+    status: str
+    heapdump_cooldown: bool
+    # (Unix 时间戳, MB)，按时间升序
+    points: List[Tuple[float, float]]
+
+
+class SketchCheckpoint(NamedTuple):
+    device: str
+    metric: str
+    bucket: int
+    sketch: DDSketch
+
+
+class ServiceCheckpoint(NamedTuple):
+    created: float
+    devices: List[DeviceCheckpoint]
+    events: List[Dict[str, object]]
+    sketches: List[SketchCheckpoint]
+
+
+class _Writer:
+    def __init__(self) -> None:
+        self.parts: List[bytes] = []
+
+    def u8(self, value: int) -> None:
+        self.parts.append(_U8.pack(value))
+
+    def u32(self, value: int) -> None:
+        self.parts.append(_U32.pack(value))
+
+    def f64(self, value: float) -> None:
+        self.parts.append(_F64.pack(value))
+
+    def text(self, value: str) -> None:
+        encoded = value.encode("utf-8")
+        self.u32(len(encoded))
+        self.parts.append(encoded)
+
+    def raw(self, data: bytes) -> None:
+        self.parts.append(data)
+
+
+class _Reader:
+    def __init__(self, data: bytes) -> None:
+        self.data = memoryview(data)
+        self.offset = 0
+
+    def unpack(self, fmt: struct.Struct) -> tuple:
+        values = fmt.unpack_from(self.data, self.offset)
+        self.offset += fmt.size
+        return values
+
+    def u8(self) -> int:
+        return self.unpack(_U8)[0]
+
+    def u32(self) -> int:
+        return self.unpack(_U32)[0]
+
+    def f64(self) -> float:
+        return self.unpack(_F64)[0]
+
+    def text(self) -> str:
+        length = self.u32()
+        value = bytes(self.data[self.offset : self.offset + length]).decode("utf-8")
+        self.offset += length
+        return value
+
+    def array(self, code: str, count: int) -> tuple:
+        fmt = struct.Struct(f"<{count}{code}")
+        return self.unpack(fmt)
+
+
+def _encode(state: ServiceCheckpoint) -> bytes:
+    out = _Writer()
+    out.u32(len(state.devices))
+    for device in state.devices:
+        out.text(device.device)
+        out.text(device.status)
+        out.u8(1 if device.heapdump_cooldown else 0)
+        out.u32(len(device.points))
+        out.raw(b"".join(_POINT.pack(epoch, value) for epoch, value in device.points))
+    out.u32(len(state.events))
+    for event in state.events:
+        out.text(str(event["device"]))
+        out.text(str(event["time"]))
+        out.f64(float(event["value_mb"]))
+    out.u32(len(state.sketches))
+    for item in state.sketches:
+        sketch = item.sketch
+        out.text(item.device)
+        out.text(item.metric)
+        out.raw(
+            _SKETCH.pack(
+                item.bucket, sketch.relative_accuracy, sketch.zero_count, sketch.count, sketch.sum, sketch.min, sketch.max
+            )
+        )
+        indices = sorted(sketch.bins)
+        out.u32(len(indices))
+        out.raw(struct.pack(f"<{len(indices)}i", *indices))
+        out.raw(struct.pack(f"<{len(indices)}Q", *(sketch.bins[index] for index in indices)))
+    return b"".join(out.parts)
+
+
+def _decode(created: float, payload: bytes) -> ServiceCheckpoint:
+    data = _Reader(payload)
+    devices = []
+    for _ in range(data.u32()):
+        device, status, cooldown = data.text(), data.text(), bool(data.u8())
+        count = data.u32()
+        flat = data.array("d", count * 2)
+        devices.append(DeviceCheckpoint(device, status, cooldown, list(zip(flat[0::2], flat[1::2]))))
+    events = []
+    for _ in range(data.u32()):
+        events.append({"device": data.text(), "time": data.text(), "value_mb": data.f64()})
+    sketches = []
+    for _ in range(data.u32()):
+        device, metric = data.text(), data.text()
+        bucket, accuracy, zero_count, count, total, minimum, maximum = data.unpack(_SKETCH)
+        bins = data.u32()
+        indices = data.array("i", bins)
+        counts = data.array("Q", bins)
+        sketch = DDSketch(accuracy)
+        sketch.bins = dict(zip(indices, counts))
+        sketch.zero_count, sketch.count, sketch.sum = zero_count, count, total
+        sketch.min, sketch.max = minimum, maximum
+        sketches.append(SketchCheckpoint(device, metric, bucket, sketch))
+    return ServiceCheckpoint(created, devices, events, sketches)
+
+
+def write_checkpoint(path: str, state: ServiceCheckpoint) -> int:
+    """
+    原子写入：先写同目录临时文件并 fsync，再 os.replace 覆盖旧文件并 fsync 目录。
+    任何时刻崩溃，磁盘上要么是完整的旧检查点，要么是完整的新检查点。返回写入的字节数。
+    """
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    payload = zlib.compress(_encode(state), 6)
+    header = _HEADER.pack(MAGIC, CHECKPOINT_VERSION, 0, state.created, len(payload), zlib.crc32(payload))
+    tmp = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp, "wb") as handle:
+            handle.write(header)
+            handle.write(payload)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp, target)
+    except OSError:
+        tmp.unlink(missing_ok=True)
+        raise
+    _fsync_directory(target.parent)
+    return len(header) + len(payload)
+
+
+def read_checkpoint(path: str) -> Optional[ServiceCheckpoint]:
+    """文件不存在时返回 None；文件损坏或版本不符时抛出 CheckpointError。"""
+    try:
+        with open(path, "rb") as handle:
+            data = handle.read()
+    except FileNotFoundError:
+        return None
+    if len(data) < _HEADER.size:
+        raise CheckpointError(f"{path} 长度不足")
+    magic, version, _, created, length, crc = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise CheckpointError(f"{path} 不是检查点文件")
+    if version != CHECKPOINT_VERSION:
+        raise CheckpointError(f"{path} 的检查点版本 {version} 不受支持")
+    payload = data[_HEADER.size : _HEADER.size + length]
+    if len(payload) != length or zlib.crc32(payload) != crc:
+        raise CheckpointError(f"{path} 校验失败")
+    try:
+        return _decode(created, zlib.decompress(payload))
+    except (zlib.error, struct.error, UnicodeDecodeError) as exc:
+        raise CheckpointError(f"{path} 解析失败：{exc}") from exc
+
+
+def _fsync_directory(directory: Path) -> None:
+    # Windows 不能以只读方式打开目录，rename 的持久化由文件系统保证
+    if os.name != "posix":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class Checkpointer:
+    """后台线程每隔 interval 秒调用 collect() 取得服务状态并写入检查点；stop() 时再写一次。"""
+
+    def __init__(self, path: str, collect: Callable[[], ServiceCheckpoint], interval: float = 30.0) -> None:
+        self.path = path
+        self.collect = collect
+        self.interval = interval
+        self.written = 0
+        self.last_bytes = 0
+        self.last_duration = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="checkpoint", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        # 未启动（如服务因没有设备而未运行）时不写，避免用空状态覆盖上一次的检查点
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=10)
+        self._thread = None
+        self.write()
+
+    def write(self) -> bool:
+        with self._lock:
+            started = time.perf_counter()
+            try:
+                self.last_bytes = write_checkpoint(self.path, self.collect())
+            except OSError as exc:
+                print(f"Checkpointer: 写入 {self.path} 失败：{exc}")
+                return False
+            self.last_duration = time.perf_counter() - started
+            self.written += 1
+            return True
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.write()
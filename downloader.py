@@ -0,0 +1,226 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+BUFFER_SIZE = 1024 * 1024
+DEFAULT_SEGMENT_SIZE = 32 * 1024 * 1024
+DEFAULT_WORKERS = 8
+MANIFEST_SUFFIX = ".part.json"
+# Artifactory 在响应头中给出制品的校验和，优先使用强度最高的
+CHECKSUM_HEADERS = (
+    ("X-Checksum-Sha256", "sha256"),
+    ("X-Checksum-Sha1", "sha1"),
+    ("X-Checksum-Md5", "md5"),
+)
+
+
+class DownloadError(Exception):
+    pass
+
+
+class RangeDownloader:
+    """
+    基于 HTTP Range 的分段并发下载器。
+
+    大文件被切成若干段，在同一个 requests.Session 上并发拉取（未传入会话时自建一个连接池与并发数相同的会话），每段以 1MB 缓冲写入预分配文件的对应位置；
+    进度记录在 <文件>.part.json 中，中断后再次调用会跳过已完成的字节继续下载。
+    全部完成后校验文件大小和校验和（显式传入或取自 X-Checksum-* 响应头），通过后删除 manifest。
+    服务器不支持 Range 时退化为单连接流式下载。
+    """
+
+    def __init__(
+        self,
+        session: Optional[requests.Session] = None,
+        workers: int = DEFAULT_WORKERS,
+        segment_size: int = DEFAULT_SEGMENT_SIZE,
+        timeout: float = 60.0,
+        retries: int = 3,
+    ) -> None:
+        self.workers = max(1, workers)
+        self.segment_size = segment_size
+        self.timeout = timeout
+        self.retries = retries
+        if session is None:
+            # 只给自己创建的会话配置连接池；调用方传入的会话保留其适配器（重试、代理、证书等）
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.workers, pool_maxsize=self.workers)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+        self._manifest_lock = threading.Lock()
+
+    # --------------------------------------------------------------------- #
+    # Public API
+    # --------------------------------------------------------------------- #
+    def download(self, url: str, target: str, checksum: Optional[str] = None, algorithm: str = "sha256") -> Path:
+        target_path = Path(target)
+        target_path.parent.mkdir(parents=True, exist_ok=True)
+        manifest_path = target_path.with_name(target_path.name + MANIFEST_SUFFIX)
+
+        size, accepts_ranges, remote_checksum = self._probe(url)
+        if checksum is None and remote_checksum is not None:
+            algorithm, checksum = remote_checksum
+
+        manifest = self._load_manifest(manifest_path, url, size)
+        if manifest is None or not target_path.exists():
+            manifest = self._new_manifest(url, size, accepts_ranges)
+            with open(target_path, "wb") as fh:
+                if size:
+                    fh.truncate(size)
+            self._save_manifest(manifest_path, manifest)
+
+        if manifest["segments"] and accepts_ranges:
+            self._download_segments(url, target_path, manifest_path, manifest)
+        else:
+            self._download_stream(url, target_path)
+
+        try:
+            self._verify(target_path, size, checksum, algorithm)
+        except DownloadError:
+            # 校验失败的数据不能再用于续传，下次从头下载
+            manifest_path.unlink(missing_ok=True)
+            target_path.unlink(missing_ok=True)
+            raise
+        manifest_path.unlink(missing_ok=True)
+        return target_path
+
+    # --------------------------------------------------------------------- #
+    # Internal helpers
+    # --------------------------------------------------------------------- #
+    def _probe(self, url: str):
+        response = self.session.get(url, headers={"Range": "bytes=0-0"}, stream=True, timeout=self.timeout)
+        try:
+            if response.status_code == 206:
+                content_range = response.headers.get("Content-Range", "")
+                total = content_range.rsplit("/", 1)[-1]
+                size = int(total) if total.isdigit() else None
+                accepts_ranges = size is not None
+            elif response.status_code == 200:
+                length = response.headers.get("Content-Length")
+                size = int(length) if length and length.isdigit() else None
+                accepts_ranges = False
+            else:
+                raise DownloadError(f"下载失败：{url} 返回 {response.status_code}")
+            remote_checksum = None
+            for header, algorithm in CHECKSUM_HEADERS:
+                if response.headers.get(header):
+                    remote_checksum = (algorithm, response.headers[header].strip().lower())
+                    break
+            return size, accepts_ranges, remote_checksum
+        finally:
+            response.close()
+
+    def _new_manifest(self, url: str, size: Optional[int], accepts_ranges: bool) -> Dict[str, object]:
+        segments: List[Dict[str, int]] = []
+        if accepts_ranges and size:
+            for start in range(0, size, self.segment_size):
+                end = min(start + self.segment_size, size) - 1
+                segments.append({"start": start, "end": end, "done": 0})
+        return {"url": url, "size": size, "segments": segments}
+
+    @staticmethod
+    def _load_manifest(path: Path, url: str, size: Optional[int]) -> Optional[Dict[str, object]]:
+        if not path.exists():
+            return None
+        try:
+            manifest = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        # 远端文件已变化时不能续传
+        if manifest.get("url") != url or manifest.get("size") != size:
+            return None
+        return manifest
+
+    def _save_manifest(self, path: Path, manifest: Dict[str, object]) -> None:
+        with self._manifest_lock:
+            tmp = path.with_name(path.name + ".tmp")
+            tmp.write_text(json.dumps(manifest), encoding="utf-8")
+            os.replace(tmp, path)
+
+    def _download_segments(self, url: str, target: Path, manifest_path: Path, manifest: Dict[str, object]) -> None:
+        pending = [seg for seg in manifest["segments"] if seg["start"] + seg["done"] <= seg["end"]]
+        if not pending:
+            return
+        completed = sum(seg["done"] for seg in manifest["segments"])
+        print(f"正在下载 {target}：{len(pending)} 段待下载，已完成 {completed / BUFFER_SIZE:.1f} MB")
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="download") as pool:
+            futures = [
+                pool.submit(self._download_segment, url, target, manifest_path, manifest, seg) for seg in pending
+            ]
+            for future in futures:
+                future.result()
+
+    def _download_segment(
+        self, url: str, target: Path, manifest_path: Path, manifest: Dict[str, object], segment: Dict[str, int]
+    ) -> None:
+        attempt = 0
+        while True:
+            start = segment["start"] + segment["done"]
+            if start > segment["end"]:
+                return
+            try:
+                headers = {"Range": f"bytes={start}-{segment['end']}"}
+                with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+                    if response.status_code != 206:
+                        raise DownloadError(f"分段请求 {headers['Range']} 返回 {response.status_code}")
+                    with open(target, "r+b", buffering=BUFFER_SIZE) as fh:
+                        fh.seek(start)
+                        saved = time.monotonic()
+                        unflushed = 0
+                        for chunk in response.iter_content(chunk_size=BUFFER_SIZE):
+                            fh.write(chunk)
+                            unflushed += len(chunk)
+                            if time.monotonic() - saved > 1.0:
+                                # 先落盘再记录进度，保证 manifest 中的进度不超过已写入的数据
+                                fh.flush()
+                                segment["done"] += unflushed
+                                unflushed = 0
+                                self._save_manifest(manifest_path, manifest)
+                                saved = time.monotonic()
+                        fh.flush()
+                        segment["done"] += unflushed
+                self._save_manifest(manifest_path, manifest)
+                if segment["start"] + segment["done"] <= segment["end"]:
+                    raise DownloadError(f"分段 {headers['Range']} 提前结束")
+                return
+            except (requests.RequestException, DownloadError) as exc:
+                attempt += 1
+                self._save_manifest(manifest_path, manifest)
+                if attempt > self.retries:
+                    raise DownloadError(f"分段下载失败：{exc}") from exc
+                time.sleep(min(2**attempt, 30))
+
+    def _download_stream(self, url: str, target: Path) -> None:
+        print(f"正在下载 {target}（服务器不支持分段，单连接下载）")
+        with self.session.get(url, stream=True, timeout=self.timeout) as response:
+            if response.status_code != 200:
+                raise DownloadError(f"下载失败：{url} 返回 {response.status_code}")
+            with open(target, "wb", buffering=BUFFER_SIZE) as fh:
+                for chunk in response.iter_content(chunk_size=BUFFER_SIZE):
+                    fh.write(chunk)
+
+    @staticmethod
+    def _verify(target: Path, size: Optional[int], checksum: Optional[str], algorithm: str) -> None:
+        actual_size = target.stat().st_size
+        if size is not None and actual_size != size:
+            raise DownloadError(f"{target} 大小不符：期望 {size}，实际 {actual_size}")
+        if not checksum:
+            return
+        digest = hashlib.new(algorithm)
+        with open(target, "rb") as fh:
+            for block in iter(lambda: fh.read(BUFFER_SIZE), b""):
+                digest.update(block)
+        if digest.hexdigest() != checksum.lower():
+            raise DownloadError(f"{target} {algorithm} 校验失败")
+
+
+def download_file(session: Optional[requests.Session], url: str, target: str, **kwargs) -> Path:
+    return RangeDownloader(session, **kwargs).download(url, target)
@@ -0,0 +1,77 @@
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+# 指定时间范围但未给出 max_points 时的默认点数上限
+DEFAULT_MAX_POINTS = 1000
+MAX_POINTS_LIMIT = 10000
+# 与 MemoryMonitorService 的冷却规则一致：回落到阈值的 90% 以下才算下一次越过阈值
+REARM_RATIO = 0.9
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets 降采样，返回保留点的下标（升序，含首尾两点）。
+    首尾之外的点均分为 max_points - 2 个桶，每个桶保留与“上一个已选点”和“下一个桶均值点”
+    构成三角形面积最大的点。桶均值用 reduceat 一次算出，桶内面积按数组整体计算。
+    """
+    n = len(x)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+
+    buckets = max_points - 2
+    every = (n - 2) / buckets
+    edges = (np.floor(np.arange(buckets + 1) * every) + 1).astype(np.intp)
+    edges[-1] = n - 1
+    counts = np.diff(edges)
+    avg_x = np.add.reduceat(x[: n - 1], edges[:-1]) / counts
+    avg_y = np.add.reduceat(y[: n - 1], edges[:-1]) / counts
+    # 第 i 个桶参考第 i+1 个桶的均值，最后一个桶参考末尾点
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(max_points, dtype=np.intp)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(buckets):
+        start, end = edges[i], edges[i + 1]
+        xa, ya = x[a], y[a]
+        area = np.abs((xa - next_x[i]) * (y[start:end] - ya) - (xa - x[start:end]) * (next_y[i] - ya))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def crossing_indices(y: np.ndarray, threshold: float, rearm_ratio: float = REARM_RATIO) -> np.ndarray:
+    """
+    越过阈值的点（及其前一个点）的下标。与 MemoryMonitorService 的触发规则一致：达到阈值时触发，
+    回落到 threshold * rearm_ratio 以下才重新计数，阈值附近的抖动不会产生大量穿越点。
+    """
+    n = len(y)
+    if n == 0:
+        return np.empty(0, dtype=np.intp)
+    marks = np.full(n, -1, dtype=np.int8)
+    marks[y < threshold * rearm_ratio] = 0
+    marks[y >= threshold] = 1
+    # 把最近一次明确的“高于阈值 / 已重新计数”状态向后填充
+    last = np.maximum.accumulate(np.where(marks >= 0, np.arange(n), -1))
+    state = np.where(last >= 0, marks[last], 0)
+    previous = np.concatenate(([0], state[:-1]))
+    fired = np.nonzero((state == 1) & (previous == 0))[0]
+    return np.union1d(np.maximum(fired - 1, 0), fired)
+
+
+def downsample_indices(
+    times: Sequence[float], values: Sequence[float], max_points: int, threshold: Optional[float] = None
+) -> List[int]:
+    """
+    在 max_points 的预算内选出要返回的点：阈值穿越点总是保留，剩余预算交给 LTTB。
+    穿越点本身超过预算时（阈值附近剧烈抖动）仍全部保留。
+    """
+    x = np.asarray(times, dtype=np.float64)
+    y = np.asarray(values, dtype=np.float64)
+    if len(x) <= max_points:
+        return list(range(len(x)))
+    keep = crossing_indices(y, threshold) if threshold is not None else np.empty(0, dtype=np.intp)
+    budget = max(3, max_points - len(keep))
+    return np.union1d(lttb_indices(x, y, budget), keep).tolist()
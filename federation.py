@@ -0,0 +1,318 @@
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from metrics import FederationMetrics
+from sketch import DEFAULT_QUANTILES, RELATIVE_ACCURACY, DDSketch, merge_all, summarize
+
+# 与单机服务保持一致：只返回最近的阈值事件
+MAX_EVENTS = 50
+
+
+class Node(NamedTuple):
+    name: str
+    url: str
+
+
+class NodeResult(NamedTuple):
+    node: Node
+    payload: Optional[Dict[str, object]]
+    error: Optional[str]
+    latency: float
+
+
+def parse_nodes(spec: str) -> List[Node]:
+    """MONITOR_NODES 格式：逗号分隔的 [名称=]URL，未给名称时使用 URL 的 host:port。"""
+    nodes = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, url = item.partition("=") if "=" in item.split("://", 1)[0] else ("", "", item)
+        url = url.rstrip("/")
+        nodes.append(Node(name or urllib.parse.urlsplit(url).netloc, url))
+    return nodes
+
+
+class _TTLCache:
+    """
+    结果短期缓存。同一个 key 过期后只有一个请求去各节点取数据，其余请求等待它的结果，
+    多个浏览器同时轮询时节点看到的请求数与客户端数量无关。
+    """
+
+    def __init__(self, ttl: float) -> None:
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple, Tuple[float, object]] = {}
+        self._loading: Dict[Tuple, threading.Lock] = {}
+
+    def get_or_load(self, key: Tuple, loader: Callable[[], object]) -> Tuple[object, bool]:
+        """返回 (值, 是否命中缓存)。"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return entry[1], True
+            key_lock = self._loading.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > time.monotonic():
+                    return entry[1], True
+            value = loader()
+            with self._lock:
+                self._entries[key] = (time.monotonic() + self.ttl, value)
+                # 带时间范围的查询 key 各不相同，顺带清理过期项
+                now = time.monotonic()
+                for stale in [k for k, (expires, _) in self._entries.items() if expires <= now]:
+                    del self._entries[stale]
+                    self._loading.pop(stale, None)
+            return value, False
+
+
+class FederatedMonitorService:
+    """
+    聚合模式：不直接采样，而是把多台运行 server.py 的监控主机（节点）汇总成一个视图。
+
+    - /api/status、/api/heapdumps 等查询并发发往所有节点，每个节点单独超时，慢节点不会拖住整体；
+    - 合并结果缓存 cache_ttl 秒，缓存期内的请求不再访问节点；
+    - 节点失败时沿用它上一次成功的数据并标记 stale，状态中的 nodes 列表给出每个节点的可用性和耗时；
+    - 设备条目增加 node 字段，heapdump 的下载链接直接指向所在节点。
+
+    对外接口与 MemoryMonitorService 的查询部分一致，server.py 的路由无需区分。
+    """
+
+    def __init__(
+        self,
+        nodes: List[Node],
+        timeout: float = 3.0,
+        cache_ttl: float = 2.0,
+    ) -> None:
+        if not nodes:
+            raise ValueError("聚合模式至少需要一个节点")
+        self.nodes = nodes
+        self.timeout = timeout
+        self.cache = _TTLCache(cache_ttl)
+        self.metrics = FederationMetrics()
+        # 聚合节点本身没有采样数据和 heapdump 目录
+        self.sample_store = None
+        self.heapdump_output = None
+        self.threshold_mb: Optional[float] = None
+        self._pool = ThreadPoolExecutor(max_workers=min(32, len(nodes) * 2), thread_name_prefix="federation")
+        self._last_good: Dict[Tuple[str, str], Dict[str, object]] = {}
+        self._device_nodes: Dict[str, Node] = {}
+        self._start_time = datetime.now()
+
+    # --------------------------------------------------------------------- #
+    # Public API
+    # --------------------------------------------------------------------- #
+    def start(self) -> None:
+        print(f"FederatedMonitorService: 聚合 {len(self.nodes)} 个节点：{', '.join(n.url for n in self.nodes)}")
+
+    def stop(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def get_snapshots(self) -> list:
+        return []
+
+    def get_status(
+        self,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        max_points: Optional[int] = None,
+    ) -> Dict[str, object]:
+        query = _query(start=start, end=end, max_points=max_points)
+        status, hit = self.cache.get_or_load(("status", query), lambda: self._merge_status(query))
+        if hit:
+            self.metrics.cache_hits.inc()
+        return status
+
+    def get_history(
+        self,
+        device_id: str,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        max_points: Optional[int] = None,
+    ) -> Optional[List[Dict[str, object]]]:
+        node = self._device_nodes.get(device_id)
+        if node is None:
+            # 还没有取过状态时先刷新一次设备归属
+            self.get_status()
+            node = self._device_nodes.get(device_id)
+        if node is None:
+            return None
+        path = f"/api/devices/{urllib.parse.quote(device_id, safe='')}/history"
+        result = self._fetch(node, path + _query(start=start, end=end, max_points=max_points))
+        if result.payload is None:
+            return None
+        return result.payload.get("history")
+
+    def get_percentiles(
+        self,
+        devices: Optional[List[str]] = None,
+        metric: str = "memory",
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        quantiles: Sequence[float] = DEFAULT_QUANTILES,
+        include_sketch: bool = False,
+    ) -> Dict[str, object]:
+        """向各节点取序列化的草图，在本地合并后计算百分位，整个机群的分位数与单机口径一致。"""
+        params = {"metric": metric, "sketch": 1, "from": start, "to": end}
+        if devices:
+            params["device"] = ",".join(devices)
+        path = "/api/percentiles?" + urllib.parse.urlencode({k: v for k, v in params.items() if v is not None})
+        sketches: Dict[str, DDSketch] = {}
+        nodes = []
+        result: Dict[str, object] = {"metric": metric, "from": start, "to": end}
+        for node_result in self._fan_out(path):
+            nodes.append({"name": node_result.node.name, "ok": node_result.error is None, "error": node_result.error})
+            if node_result.payload is None:
+                continue
+            for key in ("bucket_seconds", "relative_accuracy"):
+                result.setdefault(key, node_result.payload.get(key))
+            for device, data in node_result.payload.get("sketches", {}).items():
+                sketch = DDSketch.from_dict(data)
+                # 同名设备出现在多个节点时按设备合并
+                if device in sketches:
+                    sketches[device].merge(sketch)
+                else:
+                    sketches[device] = sketch
+        accuracy = float(result.get("relative_accuracy") or RELATIVE_ACCURACY)
+        result["devices"] = {device: summarize(sketch, quantiles) for device, sketch in sketches.items()}
+        result["fleet"] = summarize(merge_all(sketches.values(), accuracy), quantiles)
+        result["nodes"] = nodes
+        if include_sketch:
+            result["sketches"] = {device: sketch.to_dict() for device, sketch in sketches.items()}
+        return result
+
+    def get_heapdumps(self, limit: int = 10) -> List[Dict[str, object]]:
+        files, hit = self.cache.get_or_load(("heapdumps", limit), lambda: self._merge_heapdumps(limit))
+        if hit:
+            self.metrics.cache_hits.inc()
+        return [dict(item) for item in files]
+
+    # --------------------------------------------------------------------- #
+    # Internal helpers
+    # --------------------------------------------------------------------- #
+    def _fetch(self, node: Node, path: str) -> NodeResult:
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(node.url + path, timeout=self.timeout) as response:
+                payload = json.load(response)
+        except (urllib.error.URLError, OSError, ValueError) as exc:
+            latency = time.perf_counter() - started
+            self.metrics.observe_request(node.name, False, latency)
+            return NodeResult(node, None, str(getattr(exc, "reason", exc)), latency)
+        latency = time.perf_counter() - started
+        self.metrics.observe_request(node.name, True, latency)
+        return NodeResult(node, payload, None, latency)
+
+    def _fan_out(self, path: str) -> List[NodeResult]:
+        """并发请求所有节点。urlopen 的超时只约束单次读写，这里再对整体等待设上限。"""
+        futures = {self._pool.submit(self._fetch, node, path): node for node in self.nodes}
+        done, _ = wait(futures, timeout=self.timeout + 0.5)
+        results = []
+        for future, node in futures.items():
+            if future in done:
+                results.append(future.result())
+            else:
+                future.cancel()
+                results.append(NodeResult(node, None, "timeout", self.timeout))
+        return results
+
+    def _with_fallback(self, kind: str, result: NodeResult) -> Tuple[Optional[Dict[str, object]], bool]:
+        """返回 (数据, 是否为旧数据)。"""
+        key = (kind, result.node.url)
+        if result.payload is not None:
+            self._last_good[key] = result.payload
+            return result.payload, False
+        return self._last_good.get(key), True
+
+    def _merge_status(self, query: str) -> Dict[str, object]:
+        results = self._fan_out("/api/status" + query)
+        devices: List[Dict[str, object]] = []
+        events: List[Dict[str, object]] = []
+        nodes: List[Dict[str, object]] = []
+        device_nodes: Dict[str, Node] = {}
+        first: Optional[Dict[str, object]] = None
+        start_times = []
+        monitored = 0
+        for result in results:
+            # 带时间范围的查询各不相同，只有默认状态沿用节点上一次的数据
+            payload, stale = self._with_fallback("status", result) if not query else (result.payload, False)
+            nodes.append(
+                {
+                    "name": result.node.name,
+                    "url": result.node.url,
+                    "ok": result.error is None,
+                    "error": result.error,
+                    "latency_ms": round(result.latency * 1000, 1),
+                    "devices": len(payload.get("devices", [])) if payload else 0,
+                }
+            )
+            if payload is None:
+                continue
+            first = first or payload
+            start_times.append(payload.get("start_time", ""))
+            monitored += int(payload.get("devices_monitored", 0))
+            for device in payload.get("devices", []):
+                device = dict(device, node=result.node.name, stale=stale)
+                device_nodes[device["device"]] = result.node
+                devices.append(device)
+            events.extend(dict(event, node=result.node.name) for event in payload.get("events", []))
+
+        self._device_nodes.update(device_nodes)
+        events.sort(key=lambda event: event.get("time", ""))
+        if first is not None:
+            self.threshold_mb = first.get("threshold")
+        return {
+            "process": first.get("process") if first else None,
+            "threshold": first.get("threshold") if first else None,
+            "devices": devices,
+            "events": events[-MAX_EVENTS:],
+            "start_time": min(start_times) if start_times else self._start_time.isoformat(),
+            "devices_monitored": monitored,
+            "interval": first.get("interval") if first else None,
+            "nodes": nodes,
+        }
+
+    def _merge_heapdumps(self, limit: int) -> List[Dict[str, object]]:
+        files: List[Dict[str, object]] = []
+        for result in self._fan_out("/api/heapdumps"):
+            payload, stale = self._with_fallback("heapdumps", result)
+            if payload is None:
+                continue
+            for item in payload.get("files", []):
+                item = dict(item, node=result.node.name, stale=stale)
+                # 节点返回的是相对链接，下载直接访问节点，不经聚合节点中转
+                item["url"] = urllib.parse.urljoin(result.node.url + "/", item.get("url", ""))
+                files.append(item)
+        files.sort(key=lambda item: item.get("modified", ""), reverse=True)
+        return files[:limit]
+
+
+def _query(**params) -> str:
+    items = {key: value for key, value in params.items() if value is not None}
+    if "start" in items:
+        items["from"] = items.pop("start")
+    if "end" in items:
+        items["to"] = items.pop("end")
+    return "?" + urllib.parse.urlencode(items) if items else ""
+
+
+def build_federation_from_env() -> Optional[FederatedMonitorService]:
+    """设置了 MONITOR_NODES 时以聚合模式运行，否则返回 None。"""
+    nodes = parse_nodes(os.environ.get("MONITOR_NODES", ""))
+    if not nodes:
+        return None
+    return FederatedMonitorService(
+        nodes,
+        timeout=float(os.environ.get("MONITOR_NODE_TIMEOUT", "3")),
+        cache_ttl=float(os.environ.get("MONITOR_NODE_CACHE_TTL", "2")),
+    )
@@ -0,0 +1,177 @@
+import gzip
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+from flask import Response, request
+from werkzeug.datastructures import ContentRange
+from werkzeug.http import is_resource_modified
+
+try:
+    import brotli
+except ImportError:  # 可选依赖：未安装时只使用 gzip
+    brotli = None
+
+# 每次读取 / 压缩的块大小；每个下载连接占用的内存不超过几个块
+CHUNK_SIZE = 1024 * 1024
+# 动态响应压缩：小于 COMPRESS_MIN_SIZE 的响应不压缩；级别偏向速度，静态文件另行使用最高级别预压缩
+COMPRESS_MIN_SIZE = 1024
+COMPRESSIBLE_MIMETYPES = ("application/json", "text/plain")
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def accepts_gzip() -> bool:
+    return request.accept_encodings["gzip"] > 0
+
+
+def negotiate_encoding(available: Tuple[str, ...] = ("br", "gzip")) -> Optional[str]:
+    """按 Accept-Encoding 从 available 中选择内容编码，brotli（已安装时）优先；都不接受时返回 None。"""
+    for encoding in available:
+        if encoding == "br" and brotli is None:
+            continue
+        if request.accept_encodings[encoding] > 0:
+            return encoding
+    return None
+
+
+def compress_bytes(data: bytes, encoding: str, best: bool = False) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=11 if best else BROTLI_QUALITY)
+    # mtime=0：相同内容得到相同字节，便于缓存和 ETag
+    return gzip.compress(data, compresslevel=9 if best else GZIP_LEVEL, mtime=0)
+
+
+def compress_response(response: Response) -> Response:
+    """
+    after_request 钩子：按客户端能力用 brotli 或 gzip 压缩 JSON / 文本响应。
+    流式响应（导出、heapdump 下载）和已带 Content-Encoding 的响应保持原样。
+    """
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+    response.vary.add("Accept-Encoding")
+    data = response.get_data()
+    encoding = negotiate_encoding() if len(data) >= COMPRESS_MIN_SIZE else None
+    if encoding is None:
+        return response
+    response.set_data(compress_bytes(data, encoding))
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def _iter_range(fh: BinaryIO, length: int) -> Iterator[bytes]:
+    try:
+        while length > 0:
+            chunk = fh.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        fh.close()
+
+
+def _if_range_matches(etag: str, last_modified: datetime) -> bool:
+    """没有 If-Range 时按 Range 处理；有 If-Range 时只有 ETag 或修改时间与当前文件一致才续传。"""
+    if "If-Range" not in request.headers:
+        return True
+    if_range = request.if_range
+    if if_range.etag is not None:
+        return if_range.etag == etag
+    return if_range.date is not None and if_range.date == last_modified
+
+
+def _attachment(response: Response, download_name: str) -> Response:
+    response.headers.set("Content-Disposition", "attachment", filename=download_name)
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def send_file_range(path: Path, download_name: str, content_encoding: Optional[str] = None) -> Response:
+    """
+    发送磁盘上的大文件，支持：
+    - 条件请求：ETag（inode + 大小 + mtime）与 Last-Modified，命中 If-None-Match / If-Modified-Since 时返回 304；
+    - 断点续传：单个 Range 返回 206，If-Range 不匹配时返回完整文件，范围无效时返回 416，多段 Range 按完整文件处理；
+    - 零拷贝：文件定位到范围起点后交给 WSGI 服务器的 wsgi.file_wrapper（如 gunicorn 用 sendfile 按
+      Content-Length 发送），没有 file_wrapper 时按块流式读取。
+    content_encoding 用于磁盘上已经是压缩格式的文件（如 .hprof.gz 以 gzip 编码发送），Range 作用于压缩后的字节。
+    """
+    stat = path.stat()
+    size = stat.st_size
+    etag = f"{stat.st_ino:x}-{size:x}-{stat.st_mtime_ns:x}" + (f"-{content_encoding}" if content_encoding else "")
+    last_modified = datetime.fromtimestamp(int(stat.st_mtime), timezone.utc)
+
+    response = Response(mimetype="application/octet-stream", direct_passthrough=True)
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.accept_ranges = "bytes"
+    if content_encoding:
+        response.content_encoding = content_encoding
+    _attachment(response, download_name)
+
+    environ = request.environ
+    if not is_resource_modified(environ, etag=etag, last_modified=last_modified):
+        response.status_code = 304
+        return response
+
+    start, length = 0, size
+    requested = request.range
+    if (
+        requested is not None
+        and requested.units == "bytes"
+        and len(requested.ranges) == 1
+        and _if_range_matches(etag, last_modified)
+    ):
+        bounds = requested.range_for_length(size)
+        if bounds is None:
+            response.status_code = 416
+            response.content_range = ContentRange("bytes", None, None, size)
+            return response
+        start, stop = bounds
+        length = stop - start
+        response.status_code = 206
+        response.content_range = ContentRange("bytes", start, stop, size)
+
+    fh = open(path, "rb")
+    fh.seek(start)
+    file_wrapper = environ.get("wsgi.file_wrapper")
+    # PEP 3333 要求服务器发送的字节数不超过 Content-Length，部分范围同样可以交给 file_wrapper
+    response.response = file_wrapper(fh, CHUNK_SIZE) if file_wrapper is not None else _iter_range(fh, length)
+    response.content_length = length
+    return response
+
+
+def _gzip_chunks(path: Path) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(CHUNK_SIZE), b""):
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+    yield compressor.flush()
+
+
+def _gunzip_chunks(path: Path) -> Iterator[bytes]:
+    with gzip.open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(CHUNK_SIZE), b""):
+            yield chunk
+
+
+def send_gzip_stream(path: Path, download_name: str) -> Response:
+    """边读边压缩，以 Content-Encoding: gzip 发送。长度事先未知，不支持 Range。"""
+    response = Response(_gzip_chunks(path), mimetype="application/octet-stream", direct_passthrough=True)
+    response.content_encoding = "gzip"
+    return _attachment(response, download_name)
+
+
+def send_gunzip_stream(path: Path, download_name: str) -> Response:
+    """磁盘上为 .gz、客户端不接受 gzip 时边解压边发送。"""
+    response = Response(_gunzip_chunks(path), mimetype="application/octet-stream", direct_passthrough=True)
+    return _attachment(response, download_name)
@@ -1,6 +1,16 @@
+// 轮询间隔；上一次请求未完成时不会发起下一次
+const POLL_INTERVAL = 5000;
+// 每张卡片在浏览器中保留的点数，超出后丢弃最早的点
+const MAX_POINTS = 600;
+
 const state = {
-    charts: new Map(),
-    polling: null,
+    // 设备 key -> { device, points, lastTime, card, chart, visible, dirty }
+    devices: new Map(),
+    // heapdump 下载链接 -> 表格行
+    heapdumpRows: new Map(),
+    pollTimer: null,
+    polling: false,
+    observer: null,
 };
 
 const devicesEl = document.getElementById("devices");
@@ -8,59 +18,69 @@ const summaryEl = document.getElementById("summary");
 const heapdumpTable = document.getElementById("heapdump-table");
 
 const deviceIdToDomId = (device) => device.replace(/[^a-zA-Z0-9]/g, "_");
+// 聚合模式下不同节点可能有同名设备，卡片按 节点 + 设备 区分
+const deviceKey = (device) => (device.node ? `${device.node}/${device.device}` : device.device);
+
+function renderNodes(nodes) {
+    if (!nodes) {
+        return "";
+    }
+    const items = nodes
+        .map((node) => {
+            const cls = node.ok ? "status-success" : "status-error";
+            const detail = node.ok ? `${node.latency_ms} ms` : node.error;
+            return `<span class="node" title="${node.url}"><span class="status-dot ${cls}"></span>${node.name}（${node.devices} 台，${detail}）</span>`;
+        })
+        .join("");
+    return `<div class="nodes">节点：${items}</div>`;
+}
 
 function renderSummary(payload) {
-    summaryEl.innerHTML = `
+    const html = `
         <div>进程：<strong>${payload.process}</strong></div>
         <div>采样周期：${payload.interval}s | 设备数量：${payload.devices_monitored}</div>
         <div>阈值：<span class="threshold">${payload.threshold} MB</span></div>
         <div>服务启动时间：${new Date(payload.start_time).toLocaleString()}</div>
+        ${renderNodes(payload.nodes)}
     `;
-}
-
-function ensureDeviceCard(device) {
-    const domId = deviceIdToDomId(device.device);
-    let card = document.getElementById(`card-${domId}`);
-    if (card) {
-        return card;
+    if (summaryEl.dataset.html !== html) {
+        summaryEl.dataset.html = html;
+        summaryEl.innerHTML = html;
     }
+}
 
-    card = document.createElement("article");
-    card.className = "card";
-    card.id = `card-${domId}`;
-    card.innerHTML = `
-        <header>
-            <div>
-                <div>${device.device}</div>
-                <span class="status-text"></span>
-            </div>
-            <span class="latest-value"></span>
-        </header>
-        <canvas id="chart-${domId}" height="160"></canvas>
-    `;
-    devicesEl.appendChild(card);
-
-    const ctx = card.querySelector("canvas").getContext("2d");
-    const chart = new Chart(ctx, {
+function createChart(entry) {
+    const ctx = entry.card.querySelector("canvas").getContext("2d");
+    return new Chart(ctx, {
         type: "line",
         data: {
-            labels: [],
             datasets: [
                 {
                     label: "Memory (MB)",
-                    data: [],
+                    data: entry.points,
                     fill: false,
                     borderColor: "rgba(56, 189, 248, 0.9)",
+                    borderWidth: 1.5,
+                    pointRadius: 0,
                     tension: 0.2,
                 },
             ],
         },
         options: {
             responsive: true,
+            maintainAspectRatio: false,
             animation: false,
+            // 数据已是 {x: 毫秒时间戳, y: MB}，跳过解析；decimation 要求 parsing: false
+            parsing: false,
+            normalized: true,
             scales: {
                 x: {
-                    ticks: { color: "#94a3b8" },
+                    type: "linear",
+                    ticks: {
+                        color: "#94a3b8",
+                        maxTicksLimit: 6,
+                        callback: (value) => new Date(value).toLocaleTimeString(),
+                    },
                 },
                 y: {
                     ticks: { color: "#94a3b8" },
@@ -68,66 +88,186 @@ function ensureDeviceCard(device) {
             },
             plugins: {
                 legend: { display: false },
+                // 点数多于画布像素时按 LTTB 抽稀后再绘制
+                decimation: { enabled: true, algorithm: "lttb", samples: 200 },
+                tooltip: {
+                    callbacks: {
+                        title: (items) => (items.length ? new Date(items[0].parsed.x).toLocaleTimeString() : ""),
+                    },
+                },
             },
         },
     });
-    state.charts.set(device.device, chart);
-    return card;
 }
 
-function updateDeviceCard(device, threshold) {
-    const card = ensureDeviceCard(device);
-    const chart = state.charts.get(device.device);
-    const statusText = card.querySelector(".status-text");
-    const latestValue = card.querySelector(".latest-value");
+function ensureDevice(device) {
+    const key = deviceKey(device);
+    let entry = state.devices.get(key);
+    if (entry) {
+        return entry;
+    }
+
+    const card = document.createElement("article");
+    card.className = "card";
+    card.id = `card-${deviceIdToDomId(key)}`;
+    card.dataset.key = key;
+    card.innerHTML = `
+        <header>
+            <div>
+                <div>${device.device}${device.node ? ` <span class="node-badge">${device.node}</span>` : ""}</div>
+                <span class="status-text"></span>
+            </div>
+            <span class="latest-value"></span>
+        </header>
+        <div class="chart-box"><canvas></canvas></div>
+    `;
+    devicesEl.appendChild(card);
+
+    entry = { device, points: [], lastTime: 0, card, chart: null, visible: false, dirty: true };
+    state.devices.set(key, entry);
+    state.observer.observe(card);
+    return entry;
+}
+
+function removeDevice(key) {
+    const entry = state.devices.get(key);
+    state.observer.unobserve(entry.card);
+    if (entry.chart) {
+        entry.chart.destroy();
+    }
+    entry.card.remove();
+    state.devices.delete(key);
+}
+
+// 只追加比上次更新的点；数组原地修改，图表与之共享同一份数据
+function appendHistory(entry, history) {
+    for (const item of history) {
+        const time = Date.parse(item.time);
+        if (time > entry.lastTime) {
+            entry.points.push({ x: time, y: item.value });
+            entry.lastTime = time;
+            entry.dirty = true;
+        }
+    }
+    if (entry.points.length > MAX_POINTS) {
+        entry.points.splice(0, entry.points.length - MAX_POINTS);
+    }
+}
 
+function renderCard(entry) {
+    const device = entry.device;
     const lastValue = device.latest_mb ? device.latest_mb.toFixed(1) : "--";
-    latestValue.textContent = `${lastValue} MB`;
+    entry.card.querySelector(".latest-value").textContent = `${lastValue} MB`;
 
-    const indicatorClass =
-        device.status === "success" ? "status-success" : "status-error";
-    statusText.innerHTML = `
+    const indicatorClass = device.status === "success" ? "status-success" : "status-error";
+    entry.card.querySelector(".status-text").innerHTML = `
         <span class="status-dot ${indicatorClass}"></span>
-        ${device.status}
-        ${
-            device.last_updated
-                ? " | 更新时间 " + new Date(device.last_updated).toLocaleTimeString()
-                : ""
-        }
+        ${device.status}${device.stale ? "（节点不可达，显示旧数据）" : ""}
+        ${device.last_updated ? " | 更新时间 " + new Date(device.last_updated).toLocaleTimeString() : ""}
     `;
 
-    if (device.history.length > 0) {
-        const history = device.history.slice(-15);
-        chart.data.labels = history.map((item) =>
-            new Date(item.time).toLocaleTimeString()
-        );
-        chart.data.datasets[0].data = history.map((item) => item.value);
-        chart.update("none");
+    if (!entry.chart) {
+        entry.chart = createChart(entry);
+    } else if (entry.points.length) {
+        entry.chart.update("none");
     }
+    entry.dirty = false;
 }
 
+// 卡片离开视口时销毁图表，重新进入时用缓存的点重建，同一时刻只有可见卡片占用 canvas
+function onVisibilityChange(observed) {
+    for (const item of observed) {
+        const entry = state.devices.get(item.target.dataset.key);
+        if (!entry) {
+            continue;
+        }
+        entry.visible = item.isIntersecting;
+        if (entry.visible) {
+            renderCard(entry);
+        } else if (entry.chart) {
+            entry.chart.destroy();
+            entry.chart = null;
+        }
+    }
+}
+
+function updateDevices(devices) {
+    const seen = new Set();
+    for (const device of devices) {
+        const entry = ensureDevice(device);
+        seen.add(deviceKey(device));
+        if (entry.device.last_updated !== device.last_updated || entry.device.status !== device.status) {
+            entry.dirty = true;
+        }
+        entry.device = device;
+        appendHistory(entry, device.history);
+        if (entry.visible && entry.dirty) {
+            renderCard(entry);
+        }
+    }
+    // 运行时移除的设备（/api/config）
+    for (const key of [...state.devices.keys()]) {
+        if (!seen.has(key)) {
+            removeDevice(key);
+        }
+    }
+}
+
+function heapdumpRowHtml(file) {
+    return `
+        <td>${file.node ? `<span class="node-badge">${file.node}</span> ` : ""}${file.name}</td>
+        <td>${file.size_mb} MB</td>
+        <td>${new Date(file.modified).toLocaleString()}</td>
+        <td><a class="btn" href="${file.url}" target="_blank" rel="noopener">下载</a></td>
+    `;
+}
+
+// 按下载链接对比新旧列表：只增删变化的行，内容变化时才改写单元格，顺序不对时才移动
 function renderHeapdumps(files) {
-    heapdumpTable.innerHTML = "";
+    const emptyRow = heapdumpTable.querySelector("tr.empty");
     if (!files.length) {
-        const row = document.createElement("tr");
-        const cell = document.createElement("td");
-        cell.colSpan = 4;
-        cell.textContent = "暂无数据";
-        heapdumpTable.appendChild(row);
-        row.appendChild(cell);
+        state.heapdumpRows.forEach((row) => row.remove());
+        state.heapdumpRows.clear();
+        if (!emptyRow) {
+            const row = document.createElement("tr");
+            row.className = "empty";
+            const cell = document.createElement("td");
+            cell.colSpan = 4;
+            cell.textContent = "暂无数据";
+            row.appendChild(cell);
+            heapdumpTable.appendChild(row);
+        }
         return;
     }
+    if (emptyRow) {
+        emptyRow.remove();
+    }
 
-    files.forEach((file) => {
-        const row = document.createElement("tr");
-        row.innerHTML = `
-            <td>${file.name}</td>
-            <td>${file.size_mb} MB</td>
-            <td>${new Date(file.modified).toLocaleString()}</td>
-            <td><a class="btn" href="${file.url}" target="_blank" rel="noopener">下载</a></td>
-        `;
-        heapdumpTable.appendChild(row);
+    const rows = new Map();
+    let previous = null;
+    for (const file of files) {
+        let row = state.heapdumpRows.get(file.url);
+        const html = heapdumpRowHtml(file);
+        if (!row) {
+            row = document.createElement("tr");
+        }
+        if (row.dataset.html !== html) {
+            row.dataset.html = html;
+            row.innerHTML = html;
+        }
+        const expected = previous ? previous.nextSibling : heapdumpTable.firstChild;
+        if (row !== expected) {
+            heapdumpTable.insertBefore(row, expected);
+        }
+        rows.set(file.url, row);
+        previous = row;
+    }
+    state.heapdumpRows.forEach((row, url) => {
+        if (!rows.has(url)) {
+            row.remove();
+        }
     });
+    state.heapdumpRows = rows;
 }
 
 async function fetchStatus() {
@@ -138,14 +278,42 @@ async function fetchStatus() {
     const status = await statusRes.json();
     const heapdumps = await heapdumpRes.json();
     renderSummary(status);
-    status.devices.forEach((device) => updateDeviceCard(device, status.threshold));
+    updateDevices(status.devices);
     renderHeapdumps(heapdumps.files || []);
 }
 
-async function init() {
-    await fetchStatus();
-    state.polling = setInterval(fetchStatus, 5000);
+// 串行轮询：本次请求结束后再计时下一次，慢响应不会叠加；页面隐藏时不再安排下一次
+async function poll() {
+    clearTimeout(state.pollTimer);
+    state.pollTimer = null;
+    if (state.polling || document.hidden) {
+        return;
+    }
+    state.polling = true;
+    try {
+        await fetchStatus();
+    } catch (err) {
+        console.warn("刷新失败", err);
+    } finally {
+        state.polling = false;
+    }
+    if (!document.hidden) {
+        state.pollTimer = setTimeout(poll, POLL_INTERVAL);
+    }
 }
 
-document.addEventListener("DOMContentLoaded", init);
+function init() {
+    state.observer = new IntersectionObserver(onVisibilityChange, { rootMargin: "200px 0px" });
+    // 切回页面时立即刷新一次并恢复轮询
+    document.addEventListener("visibilitychange", () => {
+        if (document.hidden) {
+            clearTimeout(state.pollTimer);
+            state.pollTimer = null;
+        } else {
+            poll();
+        }
+    });
+    poll();
+}
 
+document.addEventListener("DOMContentLoaded", init);
@@ -0,0 +1,258 @@
+import gzip
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Set
+
+# heapdump.memory_snapshot 的命名规则：heapdump.<设备>.<YYYYmmddHHMMSS>.hprof，压缩后追加 .gz
+_DUMP_RE = re.compile(r"^heapdump\.(?P<device>.+)\.(?P<stamp>\d{14})\.hprof(?P<gz>\.gz)?$")
+COMPRESSED_SUFFIX = ".gz"
+COPY_CHUNK = 1024 * 1024
+
+
+class DumpFile(NamedTuple):
+    path: Path
+    device: str
+    created: float
+    size: int
+    compressed: bool
+
+    @property
+    def name(self) -> str:
+        """对外展示的文件名，压缩与否都是 *.hprof。"""
+        return self.path.name[: -len(COMPRESSED_SUFFIX)] if self.compressed else self.path.name
+
+
+def scan_dumps(directory: Path) -> List[DumpFile]:
+    """列出目录中的 heapdump（含已压缩的），按生成时间升序。不符合命名规则的文件不受管理。"""
+    dumps = []
+    if not directory.exists():
+        return dumps
+    for path in directory.iterdir():
+        match = _DUMP_RE.match(path.name)
+        if match is None:
+            continue
+        try:
+            stat = path.stat()
+            created = datetime.strptime(match.group("stamp"), "%Y%m%d%H%M%S").timestamp()
+        except (FileNotFoundError, ValueError):
+            continue
+        dumps.append(DumpFile(path, match.group("device"), created, stat.st_size, bool(match.group("gz"))))
+    dumps.sort(key=lambda dump: dump.created)
+    return dumps
+
+
+def resolve_dump(directory: Path, name: str) -> Optional[Path]:
+    """按对外文件名查找实际文件：优先未压缩的，其次 .gz。"""
+    for candidate in (name, name + COMPRESSED_SUFFIX):
+        path = directory / candidate
+        if path.is_file():
+            return path
+    return None
+
+
+class HeapdumpRetention:
+    """
+    heapdump 目录的保留策略，在后台线程中周期执行（或由 request() 立即唤醒）：
+
+    - max_age：超过该秒数的 dump 删除；
+    - keep_per_device：每台设备最多保留的 dump 数量；
+    - quota_bytes：目录总大小上限，超出时从最旧的开始删除；
+    - 同一设备相邻两次 dump 间隔不超过 episode_gap 的视为同一次内存上涨过程（episode），
+      每个 episode 的第一个和最后一个 dump 优先保留，数量和配额超限时先删中间的；
+      仅靠删中间的仍超出配额时才删除受保护的 dump，但每台设备最新的 dump 始终保留；
+    - 生成超过 compress_after 秒的 dump 以 gzip 压缩（原子替换），压缩线程以最低优先级运行并限制读取速率。
+    参数为 0 / None 表示不限制。
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        quota_bytes: int = 0,
+        keep_per_device: int = 0,
+        max_age: float = 0,
+        compress_after: Optional[float] = 600.0,
+        episode_gap: float = 1800.0,
+        interval: float = 60.0,
+        compress_rate_mb: float = 20.0,
+    ) -> None:
+        self.directory = Path(directory)
+        self.quota_bytes = quota_bytes
+        self.keep_per_device = keep_per_device
+        self.max_age = max_age
+        self.compress_after = compress_after
+        self.episode_gap = episode_gap
+        self.interval = interval
+        self.compress_rate = compress_rate_mb * 1024 * 1024
+        self.deleted = 0
+        self.compressed = 0
+        self._wake = threading.Event()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    # --------------------------------------------------------------------- #
+    # Public API
+    # --------------------------------------------------------------------- #
+    def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="heapdump-retention", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._running = False
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def request(self) -> None:
+        """新 dump 写完后调用，立即执行一轮检查。"""
+        self._wake.set()
+
+    def enforce(self, now: Optional[float] = None) -> Dict[str, int]:
+        """执行一轮删除和压缩，返回本轮删除 / 压缩的文件数。"""
+        now = time.time() if now is None else now
+        dumps = scan_dumps(self.directory)
+        doomed = self._select_deletions(dumps, now)
+        for dump in doomed:
+            print(f"HeapdumpRetention: 删除 {dump.path.name}（{dump.size / (1024 * 1024):.1f} MB）")
+            dump.path.unlink(missing_ok=True)
+        self.deleted += len(doomed)
+
+        compressed = 0
+        if self.compress_after is not None:
+            for dump in dumps:
+                if not self._running and self._thread is not None:
+                    break
+                if dump in doomed or dump.compressed:
+                    continue
+                try:
+                    # 仍在写入（adb pull 中）的文件 mtime 会不断更新
+                    if now - dump.path.stat().st_mtime < self.compress_after:
+                        continue
+                except FileNotFoundError:
+                    continue
+                if self._compress(dump.path):
+                    compressed += 1
+        self.compressed += compressed
+        return {"deleted": len(doomed), "compressed": compressed}
+
+    # --------------------------------------------------------------------- #
+    # Internal helpers
+    # --------------------------------------------------------------------- #
+    def _run(self) -> None:
+        _lower_thread_priority()
+        while self._running:
+            try:
+                self.enforce()
+            except OSError as exc:
+                print(f"HeapdumpRetention: 执行失败：{exc}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def _protected(self, dumps: List[DumpFile]) -> Set[Path]:
+        protected: Set[Path] = set()
+        by_device: Dict[str, List[DumpFile]] = {}
+        for dump in dumps:
+            by_device.setdefault(dump.device, []).append(dump)
+        for device_dumps in by_device.values():
+            episode_start = device_dumps[0]
+            for previous, current in zip(device_dumps, device_dumps[1:]):
+                if current.created - previous.created > self.episode_gap:
+                    protected.update((episode_start.path, previous.path))
+                    episode_start = current
+            protected.update((episode_start.path, device_dumps[-1].path))
+        return protected
+
+    def _select_deletions(self, dumps: List[DumpFile], now: float) -> List[DumpFile]:
+        latest = {}
+        for dump in dumps:
+            latest[dump.device] = dump.path
+        newest = set(latest.values())
+        protected = self._protected(dumps)
+        doomed: List[DumpFile] = []
+
+        if self.max_age:
+            doomed.extend(dump for dump in dumps if now - dump.created > self.max_age and dump.path not in newest)
+        remaining = [dump for dump in dumps if dump not in doomed]
+
+        if self.keep_per_device:
+            counts: Dict[str, int] = {}
+            for dump in remaining:
+                counts[dump.device] = counts.get(dump.device, 0) + 1
+            for dump in remaining:
+                if counts[dump.device] > self.keep_per_device and dump.path not in protected:
+                    doomed.append(dump)
+                    counts[dump.device] -= 1
+            remaining = [dump for dump in remaining if dump not in doomed]
+
+        if self.quota_bytes:
+            total = sum(dump.size for dump in remaining)
+            # 先删未受保护的，再删受保护的，都按从旧到新
+            ordered = [dump for dump in remaining if dump.path not in protected] + [
+                dump for dump in remaining if dump.path in protected and dump.path not in newest
+            ]
+            for dump in ordered:
+                if total <= self.quota_bytes:
+                    break
+                doomed.append(dump)
+                total -= dump.size
+        return doomed
+
+    def _compress(self, path: Path) -> bool:
+        target = path.with_name(path.name + COMPRESSED_SUFFIX)
+        tmp = target.with_name(target.name + ".tmp")
+        try:
+            stat = path.stat()
+            with open(path, "rb") as source, gzip.open(tmp, "wb", compresslevel=6) as sink:
+                started = time.monotonic()
+                copied = 0
+                for chunk in iter(lambda: source.read(COPY_CHUNK), b""):
+                    sink.write(chunk)
+                    copied += len(chunk)
+                    # 限速，避免压缩大文件时占满磁盘带宽影响采样和下载
+                    if self.compress_rate:
+                        ahead = copied / self.compress_rate - (time.monotonic() - started)
+                        if ahead > 0:
+                            time.sleep(ahead)
+            os.utime(tmp, (stat.st_atime, stat.st_mtime))
+            os.replace(tmp, target)
+            try:
+                path.unlink()
+            except OSError:
+                # 原文件仍被占用（Windows 上正在被下载）时放弃本次压缩，避免同一个 dump 出现两份
+                target.unlink(missing_ok=True)
+                raise
+        except OSError as exc:
+            tmp.unlink(missing_ok=True)
+            print(f"HeapdumpRetention: 压缩 {path.name} 失败：{exc}")
+            return False
+        return True
+
+
+def _lower_thread_priority() -> None:
+    # 标准库没有设置 I/O 优先级的接口；Linux 上 nice 值按线程生效，I/O 调度器也会参考它
+    if sys.platform.startswith("linux"):
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except (AttributeError, OSError):
+            pass
+
+
+def build_retention_from_env(directory: str) -> HeapdumpRetention:
+    compress_after = float(os.environ.get("HEAPDUMP_COMPRESS_AFTER", "600"))
+    return HeapdumpRetention(
+        directory,
+        quota_bytes=int(float(os.environ.get("HEAPDUMP_QUOTA_MB", "0")) * 1024 * 1024),
+        keep_per_device=int(os.environ.get("HEAPDUMP_KEEP_PER_DEVICE", "0")),
+        max_age=float(os.environ.get("HEAPDUMP_MAX_AGE_HOURS", "0")) * 3600,
+        # 负数表示不压缩
+        compress_after=compress_after if compress_after >= 0 else None,
+        episode_gap=float(os.environ.get("HEAPDUMP_EPISODE_GAP", "1800")),
+    )
@@ -0,0 +1,117 @@
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Dict, List, Optional
+
+MAX_PROFILE_SECONDS = 60.0
+MIN_PROFILE_INTERVAL = 0.001
+MAX_PROFILE_INTERVAL = 1.0
+MAX_TRACEMALLOC_LIMIT = 500
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def sample_profile(seconds: float = 5.0, interval: float = 0.005) -> str:
+    """
+    通过周期性读取 sys._current_frames() 做统计采样，返回 collapsed stacks 文本
+    （每行 "线程;帧;帧... 次数"），可直接交给 flamegraph.pl / speedscope。
+    只在调用期间运行，不调用时没有任何开销。
+    """
+    seconds = max(0.0, min(seconds, MAX_PROFILE_SECONDS))
+    interval = max(MIN_PROFILE_INTERVAL, min(interval, MAX_PROFILE_INTERVAL))
+    own_ident = threading.get_ident()
+    stacks: Counter = Counter()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            labels: List[str] = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.append(names.get(ident, str(ident)))
+            stacks[";".join(reversed(labels))] += 1
+        time.sleep(interval)
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def tracemalloc_top(seconds: float = 5.0, limit: int = 20) -> Dict[str, object]:
+    """
+    返回当前进程的 tracemalloc 分配排行。若尚未开启跟踪，则临时开启 seconds 秒后关闭，
+    只统计窗口内仍存活的分配。
+    """
+    started_here = not tracemalloc.is_tracing()
+    if started_here:
+        tracemalloc.start(25)
+        time.sleep(max(0.0, min(seconds, MAX_PROFILE_SECONDS)))
+    try:
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        if started_here:
+            tracemalloc.stop()
+
+    snapshot = snapshot.filter_traces(
+        (
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        )
+    )
+    top = []
+    for stat in snapshot.statistics("lineno")[:limit]:
+        frame = stat.traceback[0]
+        top.append(
+            {
+                "file": frame.filename,
+                "line": frame.lineno,
+                "size_kb": round(stat.size / 1024, 1),
+                "count": stat.count,
+            }
+        )
+    return {
+        "window_seconds": seconds if started_here else None,
+        "traced_current_kb": round(current / 1024, 1),
+        "traced_peak_kb": round(peak / 1024, 1),
+        "top": top,
+    }
+
+
+def list_threads(service=None) -> List[Dict[str, Optional[object]]]:
+    """
+    列出存活线程及其当前栈顶位置。采样/heapdump/top 线程按 "monitor-<设备>" / "heapdump-<设备>" /
+    "top-<设备>" 命名，据此关联到设备的最新快照。
+    """
+    frames = sys._current_frames()
+    snapshots = {}
+    if service is not None:
+        snapshots = {snapshot.device: snapshot for snapshot in service.get_snapshots()}
+
+    threads = []
+    for thread in threading.enumerate():
+        frame = frames.get(thread.ident)
+        role, _, device = thread.name.partition("-")
+        if role not in ("monitor", "heapdump", "top"):
+            role, device = "other", ""
+        item: Dict[str, Optional[object]] = {
+            "name": thread.name,
+            "ident": thread.ident,
+            "daemon": thread.daemon,
+            "role": role,
+            "device": device or None,
+            "current": f"{_frame_label(frame)}:{frame.f_lineno}" if frame is not None else None,
+        }
+        snapshot = snapshots.get(device)
+        if snapshot is not None:
+            item["status"] = snapshot.status
+            item["last_updated"] = snapshot.last_updated
+        threads.append(item)
+    return threads
@@ -1,15 +1,267 @@
 import argparse
+import csv
+import json
+import os
 import subprocess
 import threading
 import time
-import re
 import sys
+import urllib.error
+import urllib.request
 from collections import defaultdict, deque
-from datetime import datetime
+from datetime import datetime, timezone
 from pathlib import Path
 from typing import Deque, Dict, List, Optional, Tuple
 
 import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from monitor_service import parse_meminfo_total
+
+# heapdump 目录的 mtime 只在增删文件时变化；正在 pull 的文件大小会变，因此再定期重新扫描一次
+HEAPDUMP_RESCAN_INTERVAL = 10.0
+# 无界面模式下 CSV 的追加周期：采样点在内存中只保留 history_points 个，需要在被挤出之前写盘
+CSV_FLUSH_INTERVAL = 10.0
+
+
+class _Series:
+    """
+    单台设备的曲线数据：预分配 2 倍容量的 float 数组，只追加新点，写满时才把窗口整体前移（均摊 O(1)），
+    xs / ys 返回当前窗口的视图，可直接交给 Line2D.set_data。
+    """
+
+    __slots__ = ("capacity", "x", "y", "start", "end")
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = max(1, capacity)
+        self.x = np.empty(self.capacity * 2)
+        self.y = np.empty(self.capacity * 2)
+        self.start = 0
+        self.end = 0
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    @property
+    def xs(self) -> np.ndarray:
+        return self.x[self.start : self.end]
+
+    @property
+    def ys(self) -> np.ndarray:
+        return self.y[self.start : self.end]
+
+    def extend(self, xs: List[float], ys: List[float]) -> None:
+        count = len(xs)
+        if count >= self.capacity:
+            xs, ys, count = xs[-self.capacity :], ys[-self.capacity :], self.capacity
+            self.start = self.end = 0
+        if self.end + count > len(self.x):
+            keep = min(self.end - self.start, self.capacity - count)
+            self.x[:keep] = self.x[self.end - keep : self.end]
+            self.y[:keep] = self.y[self.end - keep : self.end]
+            self.start, self.end = 0, keep
+        self.x[self.end : self.end + count] = xs
+        self.y[self.end : self.end + count] = ys
+        self.end += count
+        self.start = max(self.start, self.end - self.capacity)
+
+
+class DashboardFigure:
+    """
+    仪表盘图形（上方曲线、下方信息面板）。只创建一次，之后追加新点、按需调整坐标轴范围、
+    信息文本变化时才更新。rescale() / set_info() 返回 True 表示需要完整重绘，否则只需重画曲线。
+    headless=True 时不经过 pyplot，直接使用 Agg 画布，可以在后台线程中使用。
+    """
+
+    def __init__(
+        self,
+        devices: List[str],
+        process_name: str,
+        threshold_mb: float,
+        history_points: int,
+        headless: bool = False,
+    ) -> None:
+        self.threshold_mb = threshold_mb
+        if headless:
+            self.fig = Figure(figsize=(12, 8))
+            FigureCanvasAgg(self.fig)
+        else:
+            self.fig = plt.figure(figsize=(12, 8))
+        self.ax_chart, self.ax_info = self.fig.subplots(2, 1, gridspec_kw={"height_ratios": [3, 1]})
+        colors = plt.cm.tab10.colors
+        self.lines = {}
+        self.series: Dict[str, _Series] = {}
+        for idx, device_id in enumerate(devices):
+            (line,) = self.ax_chart.plot([], [], label=device_id, color=colors[idx % len(colors)])
+            self.lines[device_id] = line
+            self.series[device_id] = _Series(history_points)
+
+        self.ax_chart.set_ylabel("Memory (MB)")
+        self.ax_chart.set_xlabel("Minutes")
+        self.ax_chart.axhline(threshold_mb, color="red", linestyle="--", label="Threshold")
+        self.ax_chart.set_title(f"Memory usage for {process_name}")
+        self.ax_chart.legend(loc="upper left")
+        self.ax_chart.set_autoscale_on(False)
+        self.ax_chart.set_xlim(0, 1)
+        self.ax_chart.set_ylim(0, threshold_mb * 1.2)
+
+        self.ax_info.axis("off")
+        self.info_text: Optional[str] = None
+        self.info_artist = self.ax_info.text(0.01, 0.98, "", va="top", family="monospace")
+
+    def set_animated(self, animated: bool) -> None:
+        for line in self.lines.values():
+            line.set_animated(animated)
+
+    def append(self, device_id: str, minutes: List[float], values: List[float]) -> None:
+        series = self.series.get(device_id)
+        if series is None:
+            return
+        series.extend(minutes, values)
+        self.lines[device_id].set_data(series.xs, series.ys)
+
+    def draw_lines(self) -> None:
+        for line in self.lines.values():
+            self.ax_chart.draw_artist(line)
+
+    def rescale(self) -> bool:
+        active = [series for series in self.series.values() if len(series)]
+        if not active:
+            return False
+        changed = False
+        x_min = min(series.xs[0] for series in active)
+        x_max = max(series.xs[-1] for series in active)
+        left, right = self.ax_chart.get_xlim()
+        if x_max > right or x_min < left:
+            # 右侧预留 25% 的空间，避免每来一个点都要完整重绘
+            span = max(x_max - x_min, 1.0)
+            self.ax_chart.set_xlim(x_min, x_max + span * 0.25)
+            changed = True
+
+        y_min = min(float(series.ys.min()) for series in active)
+        y_max = max(float(series.ys.max()) for series in active)
+        low, high = min(y_min, self.threshold_mb), max(y_max, self.threshold_mb)
+        bottom, top = self.ax_chart.get_ylim()
+        # 数据超出范围时扩大，数据只占不到一半时收缩
+        if low < bottom or high > top or (high - low) < (top - bottom) * 0.5:
+            pad = max((high - low) * 0.1, 10.0)
+            self.ax_chart.set_ylim(low - pad, high + pad)
+            changed = True
+        return changed
+
+    def set_info(self, text: str) -> bool:
+        if text == self.info_text:
+            return False
+        self.info_text = text
+        self.info_artist.set_text(text)
+        return True
+
+
+class HeadlessExporter:
+    """
+    无界面导出：后台线程定期把新采样点追加到滚动 CSV（samples.csv，超过 csv_max_bytes 后轮转，
+    保留 csv_backups 个旧文件），每隔 export_interval 秒把同一个图形对象重新导出为 PNG/SVG，
+    原子替换 memory.<格式>。导出频率与采样周期无关，没有新数据时不重新渲染。
+    """
+
+    def __init__(
+        self,
+        monitor: "MultiDeviceMemoryMonitor",
+        output_dir: str,
+        export_interval: float = 60.0,
+        formats: Tuple[str, ...] = ("png",),
+        csv_max_bytes: int = 16 * 1024 * 1024,
+        csv_backups: int = 3,
+    ) -> None:
+        self.monitor = monitor
+        self.output_dir = Path(output_dir)
+        self.export_interval = export_interval
+        self.formats = formats
+        self.csv_max_bytes = csv_max_bytes
+        self.csv_backups = csv_backups
+        self.csv_path = self.output_dir / "samples.csv"
+        self.exports = 0
+        self._dashboard: Optional[DashboardFigure] = None
+        self._seen: Dict[str, int] = {}
+        self._dirty = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        monitor = self.monitor
+        self._dashboard = DashboardFigure(
+            monitor.devices, monitor.process_name, monitor.threshold_mb, monitor.history_points, headless=True
+        )
+        self._thread = threading.Thread(target=self._run, name="headless-export", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=30)
+            self._thread = None
+
+    def _run(self) -> None:
+        tick = min(self.export_interval, CSV_FLUSH_INTERVAL)
+        next_export = time.monotonic() + self.export_interval
+        while not self._stop.wait(tick):
+            self.collect()
+            if time.monotonic() >= next_export:
+                self.export()
+                next_export = time.monotonic() + self.export_interval
+        # 停止时把剩余数据写完并导出最后一帧
+        self.collect()
+        self.export()
+
+    def collect(self) -> None:
+        fresh = self.monitor.collect_new_points(self._seen)
+        if not fresh:
+            return
+        self.monitor.apply_new_points(self._dashboard, fresh)
+        self._write_csv(fresh)
+        self._dirty = True
+
+    def export(self) -> None:
+        if not self._dirty:
+            return
+        dashboard = self._dashboard
+        dashboard.rescale()
+        dashboard.set_info(self.monitor.compose_info_text())
+        for fmt in self.formats:
+            target = self.output_dir / f"memory.{fmt}"
+            tmp = target.with_name(f".{target.name}.tmp")
+            dashboard.fig.savefig(tmp, format=fmt)
+            os.replace(tmp, target)
+        self._dirty = False
+        self.exports += 1
+
+    def _write_csv(self, fresh: Dict[str, Tuple[List[datetime], List[float]]]) -> None:
+        if self.csv_path.exists() and self.csv_path.stat().st_size >= self.csv_max_bytes:
+            self._rotate_csv()
+        new_file = not self.csv_path.exists()
+        rows = sorted(
+            (ts, device_id, value)
+            for device_id, (timestamps, values) in fresh.items()
+            for ts, value in zip(timestamps, values)
+        )
+        with open(self.csv_path, "a", newline="", encoding="utf-8") as fh:
+            writer = csv.writer(fh)
+            if new_file:
+                writer.writerow(["time", "device", "value_mb"])
+            writer.writerows(
+                (ts.isoformat(timespec="seconds"), device_id, f"{value:.2f}") for ts, device_id, value in rows
+            )
+
+    def _rotate_csv(self) -> None:
+        for index in range(self.csv_backups, 0, -1):
+            source = self.csv_path if index == 1 else self.csv_path.with_name(f"{self.csv_path.name}.{index - 1}")
+            if source.exists():
+                os.replace(source, self.csv_path.with_name(f"{self.csv_path.name}.{index}"))
+        if self.csv_backups <= 0:
+            self.csv_path.unlink(missing_ok=True)
 
 
 class MultiDeviceMemoryMonitor:
@@ -39,12 +291,15 @@ class MultiDeviceMemoryMonitor:
                 "timestamps": deque(maxlen=self.history_points),
                 "values": deque(maxlen=self.history_points),
                 "status": "idle",
+                # 累计采样次数，绘图线程据此只取新增的点
+                "count": 0,
             }
         )
         self.data_lock = threading.Lock()
         self.threshold_events: Deque[Dict[str, str]] = deque(maxlen=50)
         self.heapdump_cooldown = defaultdict(bool)
         self.start_time: Optional[datetime] = None
+        self._heapdump_listing: Tuple[Optional[int], float, List[Tuple[str, str, str]]] = (None, 0.0, [])
 
     @staticmethod
     def get_connected_devices() -> List[str]:
@@ -65,18 +320,10 @@ class MultiDeviceMemoryMonitor:
         if result.returncode != 0:
             return {"status": result.stderr.strip() or "error", "value": 0.0}
 
-        output = result.stdout
-        total_match = re.search(r"TOTAL\s+([\d,]+)", output)
-        pss_match = re.search(r"TOTAL PSS:\s+([\d,]+)", output)
-
-        if total_match:
-            value_kb = int(total_match.group(1).replace(",", ""))
-        elif pss_match:
-            value_kb = int(pss_match.group(1).replace(",", ""))
-        else:
+        value_mb = parse_meminfo_total(result.stdout)
+        if value_mb is None:
             return {"status": "process_not_found", "value": 0.0}
-
-        return {"status": "success", "value": value_kb / 1024}
+        return {"status": "success", "value": value_mb}
 
     def monitor_single_device(self, device_id: str) -> None:
         while self.is_monitoring:
@@ -87,6 +334,7 @@ class MultiDeviceMemoryMonitor:
                 record["timestamps"].append(timestamp)
                 record["values"].append(info["value"])
                 record["status"] = info["status"]
+                record["count"] += 1
 
             if info["status"] == "success":
                 self.handle_threshold(device_id, info["value"], timestamp)
@@ -127,20 +375,28 @@ class MultiDeviceMemoryMonitor:
 
     def list_heapdump_files(self, limit: int = 6) -> List[Tuple[str, str, str]]:
         heapdump_dir = Path(self.heapdump_output)
-        if not heapdump_dir.exists():
+        try:
+            dir_mtime = heapdump_dir.stat().st_mtime_ns
+        except FileNotFoundError:
             return []
-
-        files = sorted(
-            heapdump_dir.glob("*.hprof"),
-            key=lambda f: f.stat().st_mtime,
-            reverse=True,
-        )[:limit]
-        listed: List[Tuple[str, str, str]] = []
-        for file in files:
-            mtime = datetime.fromtimestamp(file.stat().st_mtime).strftime("%m-%d %H:%M")
-            size_mb = file.stat().st_size / (1024 * 1024)
-            listed.append((file.name, mtime, f"{size_mb:.1f} MB"))
-        return listed
+        cached_mtime, scanned_at, listed = self._heapdump_listing
+        if dir_mtime == cached_mtime and time.monotonic() - scanned_at < HEAPDUMP_RESCAN_INTERVAL:
+            return listed[:limit]
+
+        stats = []
+        # 保留策略会把旧 dump 压缩为 .hprof.gz
+        for file in [*heapdump_dir.glob("*.hprof"), *heapdump_dir.glob("*.hprof.gz")]:
+            try:
+                stats.append((file.name, file.stat()))
+            except FileNotFoundError:
+                continue
+        stats.sort(key=lambda item: item[1].st_mtime, reverse=True)
+        listed = []
+        for name, stat in stats[: max(limit, 6)]:
+            mtime = datetime.fromtimestamp(stat.st_mtime).strftime("%m-%d %H:%M")
+            listed.append((name, mtime, f"{stat.st_size / (1024 * 1024):.1f} MB"))
+        self._heapdump_listing = (dir_mtime, time.monotonic(), listed)
+        return listed[:limit]
 
     def start_threads(self) -> List[threading.Thread]:
         threads = []
@@ -154,49 +410,64 @@ class MultiDeviceMemoryMonitor:
     def stop(self) -> None:
         self.is_monitoring = False
 
-    def render(self) -> None:
-        plt.ion()
-        fig, (ax_chart, ax_info) = plt.subplots(
-            2, 1, figsize=(12, 8), gridspec_kw={"height_ratios": [3, 1]}
-        )
-        colors = plt.cm.tab10.colors
-        lines = {}
-
-        for idx, device_id in enumerate(self.devices):
-            (line,) = ax_chart.plot([], [], label=device_id, color=colors[idx % len(colors)])
-            lines[device_id] = line
+    def collect_new_points(self, seen: Dict[str, int]) -> Dict[str, Tuple[List[datetime], List[float]]]:
+        """只在锁内复制上次之后新增的采样点，seen 记录每台设备已取到的累计采样次数。"""
+        fresh: Dict[str, Tuple[List[datetime], List[float]]] = {}
+        with self.data_lock:
+            for device_id, record in self.device_data.items():
+                new = min(record["count"] - seen.get(device_id, 0), len(record["timestamps"]))
+                if new <= 0:
+                    continue
+                timestamps, values = record["timestamps"], record["values"]
+                fresh[device_id] = (
+                    [timestamps[i] for i in range(-new, 0)],
+                    [values[i] for i in range(-new, 0)],
+                )
+                seen[device_id] = record["count"]
+        return fresh
 
-        ax_chart.set_ylabel("Memory (MB)")
-        ax_chart.set_xlabel("Minutes")
-        ax_chart.axhline(self.threshold_mb, color="red", linestyle="--", label="Threshold")
-        ax_chart.set_title(f"Memory usage for {self.process_name}")
-        ax_chart.legend(loc="upper left")
+    def apply_new_points(
+        self, dashboard: DashboardFigure, fresh: Dict[str, Tuple[List[datetime], List[float]]]
+    ) -> None:
+        for device_id, (timestamps, values) in fresh.items():
+            if not self.start_time:
+                self.start_time = timestamps[0]
+            minutes = [(ts - self.start_time).total_seconds() / 60 for ts in timestamps]
+            dashboard.append(device_id, minutes, values)
 
+    def render(self) -> None:
+        plt.ion()
+        dashboard = DashboardFigure(self.devices, self.process_name, self.threshold_mb, self.history_points)
+        fig, canvas = dashboard.fig, dashboard.fig.canvas
+        # 支持 blit 的后端只重画曲线；坐标轴范围或信息面板变化时才完整重绘
+        blit = canvas.supports_blit
+        dashboard.set_animated(blit)
+        background = None
+
+        def on_draw(_event) -> None:
+            nonlocal background
+            background = canvas.copy_from_bbox(dashboard.ax_chart.bbox)
+            dashboard.draw_lines()
+
+        if blit:
+            canvas.mpl_connect("draw_event", on_draw)
+        plt.show(block=False)
+        canvas.draw()
+
+        seen: Dict[str, int] = {}
         while self.is_monitoring and plt.fignum_exists(fig.number):
-            with self.data_lock:
-                for device_id, record in self.device_data.items():
-                    timestamps = list(record["timestamps"])
-                    values = list(record["values"])
-                    if not timestamps:
-                        continue
-                    if not self.start_time:
-                        self.start_time = timestamps[0]
-                    elapsed_minutes = [
-                        (ts - self.start_time).total_seconds() / 60 for ts in timestamps
-                    ]
-                    lines[device_id].set_data(elapsed_minutes, values)
-
-                ax_chart.relim()
-                ax_chart.autoscale_view()
-
-                info_text = self.compose_info_text()
-
-            ax_info.clear()
-            ax_info.axis("off")
-            ax_info.text(0.01, 0.98, info_text, va="top", family="monospace")
-
-            fig.canvas.draw()
-            fig.canvas.flush_events()
+            fresh = self.collect_new_points(seen)
+            self.apply_new_points(dashboard, fresh)
+            full_redraw = dashboard.rescale()
+            full_redraw |= dashboard.set_info(self.compose_info_text())
+
+            if full_redraw or not blit or background is None:
+                canvas.draw()
+            elif fresh:
+                canvas.restore_region(background)
+                dashboard.draw_lines()
+                canvas.blit(dashboard.ax_chart.bbox)
+            canvas.flush_events()
             time.sleep(self.refresh_interval)
 
     def compose_info_text(self) -> str:
@@ -219,7 +490,7 @@ class MultiDeviceMemoryMonitor:
 
         return "\n".join(file_lines + [""] + event_lines)
 
-    def run(self) -> None:
+    def run(self, exporter: Optional[HeadlessExporter] = None, duration: Optional[float] = None) -> None:
         if not self.devices:
             self.devices = self.get_connected_devices()
 
@@ -229,16 +500,140 @@ class MultiDeviceMemoryMonitor:
 
         print(f"开始监控 {len(self.devices)} 台设备：{', '.join(self.devices)}")
         threads = self.start_threads()
+        deadline = time.monotonic() + duration if duration else None
         try:
-            self.render()
+            if exporter is None:
+                self.render()
+            else:
+                exporter.start()
+                print(f"无界面模式：图表与 CSV 输出到 {exporter.output_dir}")
+                while self.is_monitoring and (deadline is None or time.monotonic() < deadline):
+                    time.sleep(1)
         except KeyboardInterrupt:
             print("\n停止监控...")
         finally:
             self.stop()
+            if exporter is not None:
+                exporter.stop()
             for thread in threads:
                 thread.join(timeout=1)
 
 
+def _service_time_to_local(value: str) -> datetime:
+    """MemoryMonitorService 的时间为不带时区的 UTC，本地图表使用本地时间。"""
+    return datetime.fromisoformat(value).replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+
+
+class ServiceAttachedMonitor(MultiDeviceMemoryMonitor):
+    """
+    --attach 模式：不再自己执行 adb，而是轮询同一批设备上已在运行的 MemoryMonitorService（server.py）的
+    /api/status 和 /api/heapdumps，把其中新增的采样点和阈值事件并入本地数据，绘图与无界面导出逻辑不变。
+    设备只被采样一次，阈值越界也只由服务触发一次 heapdump。阈值、进程名和采样周期以服务端为准。
+    """
+
+    def __init__(self, base_url: str, timeout: float = 5.0, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self._last_point: Dict[str, str] = {}
+        self._event_keys: set = set()
+        self._remote_heapdumps: List[Tuple[str, str, str]] = []
+        self._heapdumps_fetched = 0.0
+        self._last_error: Optional[str] = None
+
+    def fetch_json(self, path: str) -> Dict[str, object]:
+        with urllib.request.urlopen(f"{self.base_url}{path}", timeout=self.timeout) as response:
+            return json.load(response)
+
+    def get_connected_devices(self) -> List[str]:
+        try:
+            status = self.fetch_json("/api/status")
+        except (urllib.error.URLError, OSError, ValueError) as exc:
+            print(f"无法连接 {self.base_url}：{exc}")
+            return []
+        return [device["device"] for device in status.get("devices", [])]
+
+    def start_threads(self) -> List[threading.Thread]:
+        self.is_monitoring = True
+        # 先同步一次，使阈值、进程名在创建图形之前就与服务端一致
+        self.sync_once()
+        thread = threading.Thread(target=self._poll, name="attach-poll", daemon=True)
+        thread.start()
+        return [thread]
+
+    def _poll(self) -> None:
+        while self.is_monitoring:
+            time.sleep(self.interval)
+            self.sync_once()
+
+    def sync_once(self) -> None:
+        try:
+            status = self.fetch_json("/api/status")
+            if time.monotonic() - self._heapdumps_fetched >= HEAPDUMP_RESCAN_INTERVAL:
+                self._remote_heapdumps = [
+                    (
+                        item["name"],
+                        datetime.fromisoformat(item["modified"]).strftime("%m-%d %H:%M"),
+                        f"{item['size_mb']:.1f} MB",
+                    )
+                    for item in self.fetch_json("/api/heapdumps").get("files", [])
+                ]
+                self._heapdumps_fetched = time.monotonic()
+        except (urllib.error.URLError, OSError, ValueError) as exc:
+            message = str(exc)
+            if message != self._last_error:
+                print(f"从 {self.base_url} 获取数据失败：{message}")
+                self._last_error = message
+            return
+        self._last_error = None
+
+        self.process_name = status.get("process", self.process_name)
+        self.threshold_mb = float(status.get("threshold", self.threshold_mb))
+        self.interval = status.get("interval", self.interval)
+        wanted = set(self.devices)
+
+        # 时间转换在锁外完成，锁内只做追加
+        updates = []
+        for device in status.get("devices", []):
+            device_id = device["device"]
+            if device_id not in wanted:
+                continue
+            last = self._last_point.get(device_id, "")
+            # 服务端时间为同一格式的 ISO 字符串，可直接按字典序比较
+            new = [point for point in device.get("history", []) if point["time"] > last]
+            if new:
+                self._last_point[device_id] = new[-1]["time"]
+            timestamps = [_service_time_to_local(point["time"]) for point in new]
+            updates.append((device_id, timestamps, [point["value"] for point in new], device.get("status", "idle")))
+
+        with self.data_lock:
+            for device_id, timestamps, values, device_status in updates:
+                record = self.device_data[device_id]
+                record["timestamps"].extend(timestamps)
+                record["values"].extend(values)
+                record["count"] += len(values)
+                record["status"] = device_status
+
+        event_keys = set()
+        for event in status.get("events", []):
+            key = (event["device"], event["time"])
+            event_keys.add(key)
+            if key in self._event_keys or event["device"] not in wanted:
+                continue
+            self.threshold_events.append(
+                {
+                    "device": event["device"],
+                    "time": _service_time_to_local(event["time"]).strftime("%H:%M:%S"),
+                    "value": f"{float(event['value_mb']):.1f}",
+                }
+            )
+        # 服务端只保留最近的事件，只记住当前这一批即可
+        self._event_keys = event_keys
+
+    def list_heapdump_files(self, limit: int = 6) -> List[Tuple[str, str, str]]:
+        return self._remote_heapdumps[:limit]
+
+
 def parse_args(argv: Optional[List[str]] = None):
     parser = argparse.ArgumentParser(description="多设备 ADB 内存监控与 heapdump 触发工具")
     parser.add_argument("--process", default="technology.cariad.smartsystemdrivecube.cn", help="目标进程包名")
@@ -249,6 +644,18 @@ def parse_args(argv: Optional[List[str]] = None):
     parser.add_argument("--refresh", type=float, default=1.0, help="图表刷新频率（秒）")
     parser.add_argument("--heapdump-script", default="heapdump.py", help="heapdump 脚本路径")
     parser.add_argument("--output", default="./tmp/heapdump", help="heapdump 文件输出目录")
+    parser.add_argument("--headless", action="store_true", help="无界面模式：定期导出图表和 CSV，不打开窗口")
+    parser.add_argument("--export-dir", default="./tmp/monitor_export", help="无界面模式的输出目录")
+    parser.add_argument("--export-interval", type=float, default=60.0, help="无界面模式导出图表的周期（秒）")
+    parser.add_argument("--export-format", default="png", help="导出格式，逗号分隔，如 png,svg")
+    parser.add_argument("--csv-max-mb", type=float, default=16.0, help="单个 CSV 文件的大小上限（MB），超过后轮转")
+    parser.add_argument("--csv-backups", type=int, default=3, help="保留的轮转 CSV 数量")
+    parser.add_argument("--duration", type=float, help="运行指定秒数后退出，默认一直运行")
+    parser.add_argument(
+        "--attach",
+        metavar="URL",
+        help="连接已在运行的 server.py（如 http://127.0.0.1:8000），使用其采样数据，不再自行执行 adb",
+    )
     return parser.parse_args(argv)
 
 
@@ -258,7 +665,7 @@ def main(argv: Optional[List[str]] = None) -> None:
     if args.devices:
         devices = [dev for item in args.devices for dev in item.split(",") if dev]
 
-    monitor = MultiDeviceMemoryMonitor(
+    monitor_kwargs = dict(
         process_name=args.process,
         devices=devices,
         interval=args.interval,
@@ -268,7 +675,21 @@ def main(argv: Optional[List[str]] = None) -> None:
         heapdump_script=args.heapdump_script,
         heapdump_output=args.output,
     )
-    monitor.run()
+    if args.attach:
+        monitor = ServiceAttachedMonitor(args.attach, **monitor_kwargs)
+    else:
+        monitor = MultiDeviceMemoryMonitor(**monitor_kwargs)
+    exporter = None
+    if args.headless:
+        exporter = HeadlessExporter(
+            monitor,
+            args.export_dir,
+            export_interval=args.export_interval,
+            formats=tuple(fmt.strip() for fmt in args.export_format.split(",") if fmt.strip()),
+            csv_max_bytes=int(args.csv_max_mb * 1024 * 1024),
+            csv_backups=args.csv_backups,
+        )
+    monitor.run(exporter=exporter, duration=args.duration)
 
 
 if __name__ == "__main__":
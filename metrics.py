@@ -0,0 +1,283 @@
+import math
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sketch import SketchStore
+
+LabelValues = Tuple[str, ...]
+
+SAMPLE_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0)
+HEAPDUMP_DURATION_BUCKETS = (1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+SCHEDULE_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# adb 的 stderr 会被当作状态字符串，限制长度避免标签值无限膨胀
+MAX_LABEL_LENGTH = 120
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def normalize_status(status: str) -> str:
+    """把 adb 的多行错误输出压缩成单行的短标签值。"""
+    first_line = status.strip().splitlines()[0] if status.strip() else "error"
+    return first_line[:MAX_LABEL_LENGTH]
+
+
+class _Metric:
+    """
+    单个指标族。每个标签组合的输出行在更新时标记为脏，render 时只重新格式化变化过的行，
+    其余直接复用缓存文本，因此渲染开销与指标数成正比，与采样历史长度无关。
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[LabelValues, object] = {}
+        self._rendered: Dict[LabelValues, str] = {}
+        self._dirty: set = set()
+
+    def _key(self, labels: Sequence[str]) -> LabelValues:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} 需要标签 {self.labelnames}，实际传入 {tuple(labels)}")
+        return tuple(str(value) for value in labels)
+
+    def _render_child(self, key: LabelValues, value: object) -> str:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        with self._lock:
+            for key in self._dirty:
+                self._rendered[key] = self._render_child(key, self._values[key])
+            self._dirty.clear()
+            body = "".join(self._rendered[key] for key in sorted(self._rendered))
+        header = f"# HELP {self.name} {self.documentation}\n# TYPE {self.name} {self.kind}\n"
+        return header + body
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+            self._dirty.add(key)
+
+    def total(self) -> float:
+        with self._lock:
+            return sum(self._values.values())
+
+    def _render_child(self, key: LabelValues, value: object) -> str:
+        return f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}\n"
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, *labels: str, value: float) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+            self._dirty.add(key)
+
+    def _render_child(self, key: LabelValues, value: object) -> str:
+        return f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}\n"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = SAMPLE_LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, *labels: str, value: float) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = state[0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+            self._dirty.add(key)
+
+    def quantile(self, q: float) -> float:
+        """按桶线性插值估算所有标签合并后的分位数，与 PromQL histogram_quantile 口径一致。"""
+        with self._lock:
+            merged = [0] * len(self.buckets)
+            for counts, _, _ in self._values.values():
+                merged = [a + b for a, b in zip(merged, counts)]
+        total = sum(merged)
+        if not total:
+            return 0.0
+        rank = q * total
+        cumulative = 0
+        lower = 0.0
+        for bound, bucket_count in zip(self.buckets, merged):
+            if bucket_count and cumulative + bucket_count >= rank:
+                if math.isinf(bound):
+                    return lower
+                return lower + (bound - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+            lower = bound if not math.isinf(bound) else lower
+        return lower
+
+    def _render_child(self, key: LabelValues, value: object) -> str:
+        counts, total, count = value
+        names = self.labelnames + ("le",)
+        lines: List[str] = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            labels = _format_labels(names, key + (_format_value(bound),))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}\n")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}\n")
+        lines.append(f"{self.name}_count{labels} {count}\n")
+        return "".join(lines)
+
+
+class MonitorMetrics:
+    """
+    MemoryMonitorService 的指标集合，由采样线程和 heapdump 线程在热路径上直接更新，
+    /metrics 只负责拼接文本。sketches 按设备、按时间桶保存内存和采样耗时的分位数草图，供长时间窗口的百分位查询。
+    """
+
+    def __init__(self, start_time: Optional[float] = None, sketches: Optional[SketchStore] = None) -> None:
+        self.sketches = sketches or SketchStore()
+        self.memory_mb = Gauge(
+            "memory_monitor_device_memory_mb", "Latest memory usage of the monitored process", ("device",)
+        )
+        self.sample_duration = Histogram(
+            "memory_monitor_sample_duration_seconds",
+            "Wall time of one dumpsys meminfo collection",
+            ("device",),
+            SAMPLE_LATENCY_BUCKETS,
+        )
+        self.samples = Counter("memory_monitor_samples_total", "Collected samples by status", ("device", "status"))
+        self.sample_errors = Counter(
+            "memory_monitor_sample_errors_total",
+            "Failed collections (adb errors, timeouts, missing process) by status",
+            ("device", "status"),
+        )
+        self.schedule_lag = Histogram(
+            "memory_monitor_schedule_lag_seconds",
+            "Delay between the planned and actual start of a sampling cycle",
+            (),
+            SCHEDULE_LAG_BUCKETS,
+        )
+        self.threshold_events = Counter(
+            "memory_monitor_threshold_events_total", "Threshold crossings that triggered a heapdump", ("device",)
+        )
+        self.heapdumps = Counter("memory_monitor_heapdumps_total", "Heapdump jobs by result", ("device", "result"))
+        self.heapdump_duration = Histogram(
+            "memory_monitor_heapdump_duration_seconds",
+            "Wall time of one heapdump job",
+            ("device",),
+            HEAPDUMP_DURATION_BUCKETS,
+        )
+        self.heapdump_bytes = Counter(
+            "memory_monitor_heapdump_bytes_total", "Bytes of heapdump files written", ("device",)
+        )
+        self.devices_monitored = Gauge("memory_monitor_devices_monitored", "Number of monitored devices")
+        self.start_time = Gauge("memory_monitor_start_time_seconds", "Unix time the service started")
+        self.start_time.set(value=start_time if start_time is not None else time.time())
+
+    def families(self) -> Iterable[_Metric]:
+        return (
+            self.memory_mb,
+            self.sample_duration,
+            self.samples,
+            self.sample_errors,
+            self.schedule_lag,
+            self.threshold_events,
+            self.heapdumps,
+            self.heapdump_duration,
+            self.heapdump_bytes,
+            self.devices_monitored,
+            self.start_time,
+        )
+
+    def observe_sample(
+        self, device_id: str, status: str, value_mb: float, duration: float, timestamp: Optional[float] = None
+    ) -> None:
+        self.sample_duration.observe(device_id, value=duration)
+        self.sketches.add(device_id, "latency", duration, timestamp)
+        if status == "success":
+            self.samples.inc(device_id, "success")
+            self.memory_mb.set(device_id, value=value_mb)
+            self.sketches.add(device_id, "memory", value_mb, timestamp)
+            return
+        label = normalize_status(status)
+        self.samples.inc(device_id, label)
+        self.sample_errors.inc(device_id, label)
+
+    def observe_heapdump(self, device_id: str, ok: bool, duration: float, size_bytes: int) -> None:
+        self.heapdumps.inc(device_id, "success" if ok else "failed")
+        self.heapdump_duration.observe(device_id, value=duration)
+        if size_bytes:
+            self.heapdump_bytes.inc(device_id, amount=size_bytes)
+
+    def render(self) -> str:
+        return "".join(family.render() for family in self.families())
+
+
+class FederationMetrics:
+    """聚合模式（FederatedMonitorService）的指标：各节点的可用性和请求耗时。"""
+
+    def __init__(self, start_time: Optional[float] = None) -> None:
+        self.node_up = Gauge("memory_monitor_node_up", "Whether the last request to the node succeeded", ("node",))
+        self.node_request_duration = Histogram(
+            "memory_monitor_node_request_duration_seconds",
+            "Wall time of one request to a node",
+            ("node",),
+            SAMPLE_LATENCY_BUCKETS,
+        )
+        self.node_errors = Counter("memory_monitor_node_errors_total", "Failed requests to a node", ("node",))
+        self.cache_hits = Counter("memory_monitor_federation_cache_hits_total", "Requests served from the cache")
+        self.start_time = Gauge("memory_monitor_start_time_seconds", "Unix time the service started")
+        self.start_time.set(value=start_time if start_time is not None else time.time())
+
+    def families(self) -> Iterable[_Metric]:
+        return (self.node_up, self.node_request_duration, self.node_errors, self.cache_hits, self.start_time)
+
+    def observe_request(self, node: str, ok: bool, duration: float) -> None:
+        self.node_request_duration.observe(node, value=duration)
+        self.node_up.set(node, value=1 if ok else 0)
+        if not ok:
+            self.node_errors.inc(node)
+
+    def render(self) -> str:
+        return "".join(family.render() for family in self.families())
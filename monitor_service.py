@@ -4,10 +4,118 @@ import subprocess
 import sys
 import threading
 import time
-from collections import defaultdict, deque
-from datetime import datetime
+from collections import deque
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Deque, Dict, List, Optional
+from typing import Deque, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from checkpoint import (
+    Checkpointer,
+    CheckpointError,
+    DeviceCheckpoint,
+    ServiceCheckpoint,
+    SketchCheckpoint,
+    read_checkpoint,
+)
+from downsample import REARM_RATIO, downsample_indices
+from heapdump_retention import HeapdumpRetention, build_retention_from_env, scan_dumps
+from metrics import MonitorMetrics
+from sample_store import SampleStore, build_store_from_env
+from session_log import RawSample, SessionRecorder
+from sketch import DEFAULT_QUANTILES, merge_all, summarize
+from top_collector import TopCollector
+
+# 通过 reconfigure（/api/config）修改采样周期时允许的最小值（秒）
+MIN_RECONFIGURE_INTERVAL = 0.5
+
+_TOTAL_RE = re.compile(r"TOTAL\s+([\d,]+)")
+_TOTAL_PSS_RE = re.compile(r"TOTAL PSS:\s+([\d,]+)")
+
+
+def parse_meminfo_total(output: str) -> Optional[float]:
+    """
+    从 dumpsys meminfo 输出中解析进程总内存（MB）。优先取表格中的 TOTAL 行，
+    没有时退回 App Summary 的 TOTAL PSS；都没有则返回 None（进程不存在）。
+    """
+    match = _TOTAL_RE.search(output) or _TOTAL_PSS_RE.search(output)
+    if not match:
+        return None
+    return int(match.group(1).replace(",", "")) / 1024
+
+
+def parse_collector_output(raw: RawSample) -> Dict[str, object]:
+    """把采集器的原始结果转换为采样状态和内存值（MB）。"""
+    if raw.returncode is None:
+        return {"status": "timeout", "value": 0.0}
+    if raw.returncode != 0:
+        return {"status": raw.stderr.strip() or "error", "value": 0.0}
+    value_mb = parse_meminfo_total(raw.stdout)
+    if value_mb is None:
+        return {"status": "process_not_found", "value": 0.0}
+    return {"status": "success", "value": value_mb}
+
+
+def _utc_isoformat(timestamp: float) -> str:
+    """Unix 时间戳转为与采样历史一致的格式（UTC，不带时区后缀）。"""
+    return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None).isoformat()
+
+
+class DeviceSnapshot(NamedTuple):
+    """
+    单台设备某一时刻的不可变状态。采样线程每次写入都会生成新的快照，读取方只需拿到引用即可。
+    """
+
+    device: str
+    status: str
+    latest_mb: float
+    last_updated: Optional[str]
+    history: Tuple[Dict[str, object], ...]
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "device": self.device,
+            "status": self.status,
+            "latest_mb": self.latest_mb,
+            "last_updated": self.last_updated,
+            "history": list(self.history),
+        }
+
+
+class _DeviceState:
+    """
+    单台设备的采样状态，持有独立的锁。写入时复制（copy-on-write）出新的 DeviceSnapshot，
+    读取方直接读取 snapshot 属性，不会阻塞采样线程。
+    """
+
+    __slots__ = ("device_id", "lock", "points", "heapdump_cooldown", "snapshot")
+
+    def __init__(self, device_id: str, history_points: int) -> None:
+        self.device_id = device_id
+        self.lock = threading.Lock()
+        self.points: Deque[Dict[str, object]] = deque(maxlen=history_points)
+        self.heapdump_cooldown = False
+        self.snapshot = DeviceSnapshot(device_id, "idle", 0.0, None, ())
+
+    def record(self, timestamp: datetime, value: float, status: str) -> DeviceSnapshot:
+        # isoformat 在写入时只计算一次，读取方不再逐点格式化
+        point = {"time": timestamp.isoformat(), "value": value}
+        with self.lock:
+            self.points.append(point)
+            self.snapshot = DeviceSnapshot(
+                self.device_id, status, value, point["time"], tuple(self.points)
+            )
+        return self.snapshot
+
+    def restore(self, points: List[Tuple[float, float]], status: str, heapdump_cooldown: bool) -> None:
+        """用检查点中的历史和冷却状态初始化（只在采样开始前调用）。"""
+        with self.lock:
+            self.points.extend({"time": _utc_isoformat(epoch), "value": value} for epoch, value in points)
+            self.heapdump_cooldown = heapdump_cooldown
+            if self.points:
+                last = self.points[-1]
+                self.snapshot = DeviceSnapshot(
+                    self.device_id, status, last["value"], last["time"], tuple(self.points)
+                )
 
 
 class MemoryMonitorService:
@@ -25,6 +133,12 @@ class MemoryMonitorService:
         history_points: int = 15,
         heapdump_script: str = "heapdump.py",
         heapdump_output: str = "./tmp/heapdump",
+        sample_store: Optional[SampleStore] = None,
+        top_interval: Optional[float] = None,
+        retention: Optional[HeapdumpRetention] = None,
+        record_path: Optional[str] = None,
+        checkpoint_path: Optional[str] = None,
+        checkpoint_interval: float = 30.0,
     ) -> None:
         self.process_name = process_name
         self.devices = devices or []
@@ -33,21 +147,32 @@ class MemoryMonitorService:
         self.history_points = history_points
         self.heapdump_script = Path(heapdump_script)
         self.heapdump_output = Path(heapdump_output)
+        self.sample_store = sample_store
+        self.top_interval = top_interval
+        self.retention = retention
+        self.record_path = record_path
+        self._recorder: Optional[SessionRecorder] = None
+        self.checkpoint_path = checkpoint_path
+        self._checkpointer = (
+            Checkpointer(checkpoint_path, self._checkpoint_state, checkpoint_interval) if checkpoint_path else None
+        )
+        # 采样线程在 _wake 上等待下一个周期；修改配置或停止时换一个新的 Event 并唤醒旧的
+        self._wake = threading.Event()
+        self._device_tokens: Dict[str, object] = {}
+        self._config_lock = threading.Lock()
 
         self._monitor_threads: List[threading.Thread] = []
+        self._top_collectors: Dict[str, TopCollector] = {}
         self._is_running = False
-        self._lock = threading.Lock()
-        self._heapdump_cooldown = defaultdict(bool)
         self._start_time = datetime.utcnow()
+        self.metrics = MonitorMetrics()
 
-        self._data: Dict[str, Dict[str, Deque]] = defaultdict(
-            lambda: {
-                "timestamps": deque(maxlen=self.history_points),
-                "values": deque(maxlen=self.history_points),
-                "status": "idle",
-            }
-        )
+        # 设备表与事件列表均为写入时复制：写入方持锁替换引用，读取方无锁读取
+        self._states_lock = threading.Lock()
+        self._states: Dict[str, _DeviceState] = {}
+        self._events_lock = threading.Lock()
         self._threshold_events: Deque[Dict[str, str]] = deque(maxlen=50)
+        self._events_snapshot: Tuple[Dict[str, str], ...] = ()
 
     # --------------------------------------------------------------------- #
     # Public API
@@ -62,44 +187,106 @@ class MemoryMonitorService:
             return
 
         self._is_running = True
+        self._wake = threading.Event()
+        self._restore_checkpoint()
+        if self.record_path:
+            self._recorder = SessionRecorder(
+                self.record_path,
+                {"process": self.process_name, "interval": self.interval, "devices": list(self.devices)},
+            )
+            print(f"MemoryMonitorService: 采集器原始输出记录到 {self.record_path}")
         for device in self.devices:
-            thread = threading.Thread(target=self._monitor_device, args=(device,), daemon=True)
-            thread.start()
-            self._monitor_threads.append(thread)
+            self._start_device(device)
+        if self.retention is not None:
+            self.retention.start()
+        if self._checkpointer is not None:
+            self._checkpointer.start()
+        self.metrics.devices_monitored.set(value=len(self.devices))
         print(
             f"MemoryMonitorService: 已启动，监控 {len(self.devices)} 台设备：{', '.join(self.devices)}"
         )
 
     def stop(self) -> None:
         self._is_running = False
+        self._wake.set()
+        for collector in self._top_collectors.values():
+            collector.stop()
+        self._top_collectors.clear()
         for thread in self._monitor_threads:
             thread.join(timeout=1)
         self._monitor_threads.clear()
+        if self._checkpointer is not None:
+            # 采样已停止，最后一次检查点包含全部状态
+            self._checkpointer.stop()
+        if self._recorder is not None:
+            self._recorder.close()
+            self._recorder = None
+        if self.retention is not None:
+            self.retention.stop()
+        if self.sample_store is not None:
+            self.sample_store.close()
 
-    def get_status(self) -> Dict[str, object]:
-        with self._lock:
-            devices = []
-            for device_id, payload in self._data.items():
-                timestamps = list(payload["timestamps"])
-                values = list(payload["values"])
-                latest_value = values[-1] if values else 0.0
-                last_updated = (
-                    timestamps[-1].isoformat() if timestamps else None
-                )
-                devices.append(
-                    {
-                        "device": device_id,
-                        "status": payload["status"],
-                        "latest_mb": latest_value,
-                        "last_updated": last_updated,
-                        "history": [
-                            {"time": ts.isoformat(), "value": val}
-                            for ts, val in zip(timestamps, values)
-                        ],
-                    }
-                )
+    def get_snapshots(self) -> List[DeviceSnapshot]:
+        return [state.snapshot for state in self._states.values()]
 
-            events = list(self._threshold_events)
+    def get_config(self) -> Dict[str, object]:
+        return {
+            "process": self.process_name,
+            "threshold_mb": self.threshold_mb,
+            "interval": self.interval,
+            "devices": list(self.devices),
+            "checkpoint": self.checkpoint_path,
+        }
+
+    def reconfigure(
+        self,
+        threshold_mb: Optional[float] = None,
+        interval: Optional[float] = None,
+        devices: Optional[List[str]] = None,
+    ) -> Dict[str, object]:
+        """
+        运行时修改阈值、采样周期和设备列表，无需重启。新阈值在下一次采样时生效（冷却状态保留），
+        新周期会唤醒正在等待的采样线程；新增设备立即开始采样，移除的设备停止采样并从状态中删除。
+        参数不合法时抛出 ValueError。
+        """
+        if threshold_mb is not None and not threshold_mb > 0:
+            raise ValueError("threshold_mb 必须大于 0")
+        # 周期为 0 时每台设备会不间断地执行 adb，运行时修改必须给出正的周期
+        if interval is not None and not interval >= MIN_RECONFIGURE_INTERVAL:
+            raise ValueError(f"interval 不能小于 {MIN_RECONFIGURE_INTERVAL} 秒")
+        if devices is not None and (not devices or len(set(devices)) != len(devices)):
+            raise ValueError("devices 不能为空且不能重复")
+        with self._config_lock:
+            if threshold_mb is not None:
+                self.threshold_mb = threshold_mb
+            if interval is not None:
+                self.interval = interval
+                self._wake_all()
+            if devices is not None and self._is_running:
+                for device in [device for device in self.devices if device not in devices]:
+                    self._stop_device(device)
+                for device in [device for device in devices if device not in self.devices]:
+                    self._start_device(device)
+                self.metrics.devices_monitored.set(value=len(self.devices))
+            elif devices is not None:
+                self.devices = list(devices)
+        print(
+            f"MemoryMonitorService: 配置已更新：阈值 {self.threshold_mb} MB，周期 {self.interval}s，"
+            f"设备 {', '.join(self.devices)}"
+        )
+        return self.get_config()
+
+    def get_status(
+        self,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        max_points: Optional[int] = None,
+    ) -> Dict[str, object]:
+        devices = [snapshot.to_dict() for snapshot in self.get_snapshots()]
+        if start is not None or end is not None or max_points is not None:
+            for device in devices:
+                device["history"] = self.get_history(device["device"], start, end, max_points) or []
+        events = list(self._events_snapshot)
 
         return {
             "process": self.process_name,
@@ -111,20 +298,94 @@ class MemoryMonitorService:
             "interval": self.interval,
         }
 
+    def get_history(
+        self,
+        device_id: str,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        max_points: Optional[int] = None,
+    ) -> Optional[List[Dict[str, object]]]:
+        """
+        返回设备在 [start, end]（Unix 时间戳）内的内存曲线。指定了时间范围且配置了 SampleStore 时从磁盘读取，
+        否则使用内存中的最近历史。点数超过 max_points 时做 LTTB 降采样，越过阈值的点总是保留。
+        设备不存在时返回 None。
+        """
+        snapshot = next((item for item in self.get_snapshots() if item.device == device_id), None)
+        if (start is not None or end is not None) and self.sample_store is not None:
+            times: List[float] = []
+            values: List[float] = []
+            for record in self.sample_store.iter_records(device_id, "memory", start, end):
+                # 采样失败的记录值为 0，会被误当作极值和阈值穿越点
+                if record.get("status") == "success":
+                    times.append(record["ts"])
+                    values.append(record["value_mb"])
+            if snapshot is None and not times:
+                return None
+            indices = range(len(times))
+            if max_points:
+                indices = downsample_indices(times, values, max_points, self.threshold_mb)
+            return [{"time": _utc_isoformat(times[i]), "value": values[i]} for i in indices]
+
+        if snapshot is None:
+            return None
+        points = list(snapshot.history)
+        if start is not None or end is not None:
+            lower = _utc_isoformat(start) if start is not None else ""
+            upper = _utc_isoformat(end) if end is not None else "~"
+            # ISO 8601 字符串可直接按字典序比较
+            points = [point for point in points if lower <= point["time"] <= upper]
+        if max_points and len(points) > max_points:
+            times = [datetime.fromisoformat(point["time"]).replace(tzinfo=timezone.utc).timestamp() for point in points]
+            values = [point["value"] for point in points]
+            points = [points[i] for i in downsample_indices(times, values, max_points, self.threshold_mb)]
+        return points
+
+    def get_percentiles(
+        self,
+        devices: Optional[List[str]] = None,
+        metric: str = "memory",
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        quantiles: Sequence[float] = DEFAULT_QUANTILES,
+        include_sketch: bool = False,
+    ) -> Dict[str, object]:
+        """
+        从分位数草图计算各设备及全部设备合并后的百分位（metric 为 memory（MB）或 latency（秒）），
+        不扫描原始样本。include_sketch 时附带序列化的草图，供聚合节点跨主机合并。
+        """
+        store = self.metrics.sketches
+        sketches = store.query(devices or store.devices(metric), metric, start, end)
+        result: Dict[str, object] = {
+            "metric": metric,
+            "from": start,
+            "to": end,
+            "bucket_seconds": store.bucket_seconds,
+            "relative_accuracy": store.relative_accuracy,
+            "devices": {device: summarize(sketch, quantiles) for device, sketch in sketches.items()},
+            "fleet": summarize(merge_all(sketches.values(), store.relative_accuracy), quantiles),
+        }
+        if include_sketch:
+            result["sketches"] = {device: sketch.to_dict() for device, sketch in sketches.items()}
+        return result
+
     def get_heapdumps(self, limit: int = 10) -> List[Dict[str, object]]:
-        directory = self.heapdump_output
-        if not directory.exists():
-            return []
-        files = sorted(directory.glob("*.hprof"), key=lambda f: f.stat().st_mtime, reverse=True)
+        # 已被保留策略压缩的 dump 以原文件名列出，下载接口透明处理 .gz
+        dumps = []
+        for dump in scan_dumps(self.heapdump_output):
+            try:
+                dumps.append((dump.path.stat().st_mtime, dump))
+            except FileNotFoundError:
+                continue
+        dumps.sort(key=lambda item: item[0], reverse=True)
         items: List[Dict[str, object]] = []
-        for file in files[:limit]:
-            stats = file.stat()
+        for mtime, dump in dumps[:limit]:
             items.append(
                 {
-                    "name": file.name,
-                    "path": str(file.resolve()),
-                    "modified": datetime.fromtimestamp(stats.st_mtime).isoformat(),
-                    "size_mb": round(stats.st_size / (1024 * 1024), 2),
+                    "name": dump.name,
+                    "path": str(dump.path.resolve()),
+                    "modified": datetime.fromtimestamp(mtime).isoformat(),
+                    "size_mb": round(dump.size / (1024 * 1024), 2),
+                    "compressed": dump.compressed,
                 }
             )
         return items
@@ -141,55 +402,179 @@ class MemoryMonitorService:
                 devices.append(line.split("\t")[0])
         return devices
 
-    def _monitor_device(self, device_id: str) -> None:
-        while self._is_running:
-            info = self._collect_memory(device_id)
-            timestamp = datetime.utcnow()
-            with self._lock:
-                bucket = self._data[device_id]
-                bucket["timestamps"].append(timestamp)
-                bucket["values"].append(info["value"])
-                bucket["status"] = info["status"]
-            if info["status"] == "success":
-                self._process_threshold(device_id, info["value"], timestamp)
-            time.sleep(self.interval)
+    def _state_for(self, device_id: str) -> _DeviceState:
+        state = self._states.get(device_id)
+        if state is not None:
+            return state
+        with self._states_lock:
+            state = self._states.get(device_id)
+            if state is None:
+                state = _DeviceState(device_id, self.history_points)
+                self._states = {**self._states, device_id: state}
+        return state
 
-    def _collect_memory(self, device_id: str) -> Dict[str, object]:
-        cmd = f"adb -s {device_id} shell dumpsys meminfo {self.process_name}"
+    def _start_device(self, device_id: str) -> None:
+        self._state_for(device_id)
+        if device_id not in self.devices:
+            self.devices = [*self.devices, device_id]
+        token = object()
+        self._device_tokens[device_id] = token
+        thread = threading.Thread(
+            target=self._monitor_device, args=(device_id, token), name=f"monitor-{device_id}", daemon=True
+        )
+        thread.start()
+        self._monitor_threads.append(thread)
+        if self.top_interval and self.sample_store is not None:
+            collector = TopCollector(
+                device_id, self.sample_store, self.top_interval, process_filter=[self.process_name]
+            )
+            collector.start()
+            self._top_collectors[device_id] = collector
+
+    def _stop_device(self, device_id: str) -> None:
+        # 采样线程在下一轮检查令牌后退出，不在这里等待（可能正在执行 adb）
+        self._device_tokens.pop(device_id, None)
+        self.devices = [device for device in self.devices if device != device_id]
+        collector = self._top_collectors.pop(device_id, None)
+        if collector is not None:
+            collector.stop()
+        with self._states_lock:
+            self._states = {key: state for key, state in self._states.items() if key != device_id}
+        self._monitor_threads = [thread for thread in self._monitor_threads if thread.is_alive()]
+        self._wake_all()
+
+    def _wake_all(self) -> None:
+        wake, self._wake = self._wake, threading.Event()
+        wake.set()
+
+    def _checkpoint_state(self) -> ServiceCheckpoint:
+        cooldowns = {device: state.heapdump_cooldown for device, state in self._states.items()}
+        devices = []
+        for snapshot in self.get_snapshots():
+            points = [
+                (datetime.fromisoformat(point["time"]).replace(tzinfo=timezone.utc).timestamp(), point["value"])
+                for point in snapshot.history
+            ]
+            devices.append(
+                DeviceCheckpoint(snapshot.device, snapshot.status, cooldowns.get(snapshot.device, False), points)
+            )
+        sketches = [SketchCheckpoint(*item) for item in self.metrics.sketches.export()]
+        return ServiceCheckpoint(time.time(), devices, list(self._events_snapshot), sketches)
+
+    def _restore_checkpoint(self) -> None:
+        if not self.checkpoint_path:
+            return
         try:
-            result = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=15)
-        except subprocess.TimeoutExpired:
-            return {"status": "timeout", "value": 0.0}
+            checkpoint = read_checkpoint(self.checkpoint_path)
+        except CheckpointError as exc:
+            print(f"MemoryMonitorService: 忽略无法读取的检查点：{exc}")
+            return
+        if checkpoint is None:
+            return
+        restored = 0
+        for device in checkpoint.devices:
+            # 只恢复本次仍要监控的设备
+            if device.device in self.devices:
+                self._restore_device(device)
+                restored += 1
+        with self._events_lock:
+            self._threshold_events.extend(checkpoint.events)
+            self._events_snapshot = tuple(self._threshold_events)
+        for item in checkpoint.sketches:
+            self.metrics.sketches.restore(item.device, item.metric, item.bucket, item.sketch)
+        age = time.time() - checkpoint.created
+        print(
+            f"MemoryMonitorService: 已从检查点恢复 {restored} 台设备、{len(checkpoint.events)} 个事件"
+            f"（{age:.0f} 秒前写入）"
+        )
 
-        if result.returncode != 0:
-            return {"status": result.stderr.strip() or "error", "value": 0.0}
+    def _restore_device(self, device: DeviceCheckpoint) -> None:
+        points = device.points[-self.history_points :] if self.history_points else []
+        self._state_for(device.device).restore(points, device.status, device.heapdump_cooldown)
 
-        output = result.stdout
-        total_match = re.search(r"TOTAL\s+([\d,]+)", output)
-        pss_match = re.search(r"TOTAL PSS:\s+([\d,]+)", output)
+    def _monitor_device(self, device_id: str, token: Optional[object] = None) -> None:
+        state = self._state_for(device_id)
+        planned: Optional[float] = None
+        while self._device_active(device_id, token):
+            started = time.perf_counter()
+            if planned is not None:
+                self.metrics.schedule_lag.observe(value=max(0.0, started - planned))
+            raw = self._run_collector(device_id)
+            collected = time.perf_counter()
+            if not self._device_active(device_id, token):
+                # 采集期间设备已被移除：丢弃结果，避免重新创建它的状态
+                break
+            epoch = time.time()
+            if self._recorder is not None:
+                self._recorder.write(device_id, raw, collected - started, epoch)
+            self._handle_sample(state, parse_collector_output(raw), collected - started, epoch)
+            planned = collected + self.interval
+            self._wake.wait(self.interval)
 
-        if total_match:
-            value_kb = int(total_match.group(1).replace(",", ""))
-        elif pss_match:
-            value_kb = int(pss_match.group(1).replace(",", ""))
-        else:
-            return {"status": "process_not_found", "value": 0.0}
+    def _device_active(self, device_id: str, token: Optional[object]) -> bool:
+        return self._is_running and (token is None or self._device_tokens.get(device_id) is token)
+
+    def _handle_sample(self, state: _DeviceState, info: Dict[str, object], duration: float, epoch: float) -> None:
+        """一次采样结果的处理：指标、历史、落盘和阈值判断。实时采样与会话回放共用。"""
+        device_id = state.device_id
+        # 带上采样时间：分片模式下指标调用在主进程延迟重放，草图仍按采样时刻分桶
+        self.metrics.observe_sample(device_id, info["status"], info["value"], duration, timestamp=epoch)
+        timestamp = datetime.fromtimestamp(epoch, timezone.utc).replace(tzinfo=None)
+        self._record_sample(state, timestamp, info, duration)
+        if info["status"] == "success":
+            self._process_threshold(device_id, info["value"], timestamp)
+
+    def _record_sample(
+        self, state: _DeviceState, timestamp: datetime, info: Dict[str, object], duration: float
+    ) -> None:
+        state.record(timestamp, info["value"], info["status"])
+        if self.sample_store is not None:
+            self.sample_store.append(
+                state.device_id,
+                "memory",
+                {
+                    "ts": timestamp.replace(tzinfo=timezone.utc).timestamp(),
+                    "value_mb": info["value"],
+                    "status": info["status"],
+                    "duration": round(duration, 4),
+                },
+            )
+
+    def _publish_event(self, event: Dict[str, object]) -> None:
+        with self._events_lock:
+            self._threshold_events.append(event)
+            self._events_snapshot = tuple(self._threshold_events)
+
+    def _collect_memory(self, device_id: str) -> Dict[str, object]:
+        return parse_collector_output(self._run_collector(device_id))
 
-        return {"status": "success", "value": value_kb / 1024}
+    def _run_collector(self, device_id: str) -> RawSample:
+        cmd = f"adb -s {device_id} shell dumpsys meminfo {self.process_name}"
+        try:
+            result = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=15)
+        except subprocess.TimeoutExpired:
+            return RawSample(None, "", "")
+        return RawSample(result.returncode, result.stdout, result.stderr)
 
     def _process_threshold(self, device_id: str, value_mb: float, timestamp: datetime) -> None:
-        if value_mb >= self.threshold_mb and not self._heapdump_cooldown[device_id]:
+        state = self._state_for(device_id)
+        if value_mb >= self.threshold_mb and not state.heapdump_cooldown:
             event = {
                 "device": device_id,
                 "time": timestamp.isoformat(),
                 "value_mb": round(value_mb, 1),
             }
-            with self._lock:
-                self._threshold_events.append(event)
-            self._heapdump_cooldown[device_id] = True
-            threading.Thread(target=self._trigger_heapdump, args=(device_id,), daemon=True).start()
-        elif value_mb < self.threshold_mb * 0.9:
-            self._heapdump_cooldown[device_id] = False
+            self._publish_event(event)
+            self.metrics.threshold_events.inc(device_id)
+            state.heapdump_cooldown = True
+            threading.Thread(
+                target=self._trigger_heapdump,
+                args=(device_id,),
+                name=f"heapdump-{device_id}",
+                daemon=True,
+            ).start()
+        elif value_mb < self.threshold_mb * REARM_RATIO:
+            state.heapdump_cooldown = False
 
     def _trigger_heapdump(self, device_id: str) -> None:
         cmd = [
@@ -203,10 +588,29 @@ class MemoryMonitorService:
             str(self.heapdump_output),
         ]
         print(f"[{datetime.now().strftime('%H:%M:%S')}] {device_id} 内存 {self.threshold_mb}+ MB，触发 heapdump")
+        started_wall = time.time()
+        started = time.perf_counter()
+        ok = True
         try:
             subprocess.run(cmd, check=True)
         except subprocess.CalledProcessError as exc:
+            ok = False
             print(f"Heapdump failed for {device_id}: {exc}")
+        size_bytes = sum(f.stat().st_size for f in self._new_heapdumps(device_id, started_wall))
+        self.metrics.observe_heapdump(device_id, ok, time.perf_counter() - started, size_bytes)
+        if self.retention is not None:
+            self.retention.request()
+
+    def _new_heapdumps(self, device_id: str, since: float) -> List[Path]:
+        # 文件名规则与 heapdump.memory_snapshot 保持一致：heapdump.<设备>.<时间戳>.hprof
+        suffix = device_id.replace(":", "_").replace(".", "_")
+        if not self.heapdump_output.exists():
+            return []
+        return [
+            f
+            for f in self.heapdump_output.glob(f"heapdump.{suffix}.*.hprof")
+            if f.stat().st_mtime >= since
+        ]
 
 
 def build_service_from_env() -> MemoryMonitorService:
@@ -221,8 +625,28 @@ def build_service_from_env() -> MemoryMonitorService:
     history = int(os.environ.get("MONITOR_HISTORY_POINTS", "15"))
     heapdump_script = os.environ.get("HEAPDUMP_SCRIPT", "heapdump.py")
     heapdump_output = os.environ.get("HEAPDUMP_OUTPUT", "./tmp/heapdump")
+    top_interval = float(os.environ.get("MONITOR_TOP_INTERVAL", "0")) or None
+    workers = int(os.environ.get("MONITOR_WORKERS", "0"))
+    record_path = os.environ.get("MONITOR_RECORD") or None
+    checkpoint_path = os.environ.get("MONITOR_CHECKPOINT") or None
+    checkpoint_interval = float(os.environ.get("MONITOR_CHECKPOINT_INTERVAL", "30"))
+    replay = os.environ.get("MONITOR_REPLAY", "")
+
+    if replay:
+        # 回放模式：进程名和采样周期取自会话日志，阈值等判断参数照常生效；
+        # 不创建采样存储、保留策略、会话记录和检查点，历史样本不会写入线上数据
+        from replay import ReplayMemoryMonitorService
 
-    return MemoryMonitorService(
+        return ReplayMemoryMonitorService(
+            [path.strip() for path in replay.split(",") if path.strip()],
+            speed=float(os.environ.get("MONITOR_REPLAY_SPEED", "1")),
+            threshold_mb=threshold,
+            history_points=history,
+            heapdump_script=heapdump_script,
+            heapdump_output=heapdump_output,
+        )
+
+    kwargs = dict(
         process_name=process,
         devices=devices,
         interval=interval,
@@ -230,7 +654,19 @@ def build_service_from_env() -> MemoryMonitorService:
         history_points=history,
         heapdump_script=heapdump_script,
         heapdump_output=heapdump_output,
+        sample_store=build_store_from_env(),
+        top_interval=top_interval,
+        retention=build_retention_from_env(heapdump_output),
+        record_path=record_path,
+        checkpoint_path=checkpoint_path,
+        checkpoint_interval=checkpoint_interval,
     )
+    if workers > 1:
+        # 分片模式依赖本模块，延迟导入避免循环引用
+        from sharded_service import ShardedMemoryMonitorService
+
+        return ShardedMemoryMonitorService(workers=workers, **kwargs)
+    return MemoryMonitorService(**kwargs)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,120 @@
+"""
+会话回放：把 MONITOR_RECORD 记录的采集器原始输出按原始节奏（或 N 倍速）重新送入 MemoryMonitorService，
+解析、阈值判断和 heapdump 触发逻辑与实时采样完全相同，heapdump 只记录不执行。
+
+用法：python replay.py session.ndjson.gz [更多会话日志 ...] --speed 0 --threshold 250
+"""
+
+import argparse
+import glob
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+from monitor_service import MemoryMonitorService, parse_collector_output
+from session_log import read_sessions
+
+
+class ReplayMemoryMonitorService(MemoryMonitorService):
+    """
+    回放后端：设备列表、进程名和采样周期默认取自会话头，阈值等判断参数使用传入的配置。
+    speed 为回放倍速，0 表示不等待、尽可能快地回放；回放结束后 finished 被置位。
+    heapdump 为空跑（dry-run）：触发决定记录在 heapdump_decisions 中并计入指标，不调用 adb。
+    """
+
+    def __init__(self, session_paths: Sequence[str], speed: float = 1.0, **kwargs) -> None:
+        header, _ = read_sessions(session_paths)
+        kwargs["devices"] = list(header.get("devices", []))
+        kwargs.setdefault("process_name", header.get("process", ""))
+        kwargs.setdefault("interval", header.get("interval", 3))
+        # 回放不采集 top，不再次记录，不读写检查点，也不写入线上采样存储、不清理线上 heapdump 目录
+        for key in ("top_interval", "record_path", "checkpoint_path", "checkpoint_interval", "sample_store", "retention"):
+            kwargs.pop(key, None)
+        super().__init__(**kwargs)
+        self.session_paths = list(session_paths)
+        self.speed = speed
+        self.replayed = 0
+        self.statuses: Counter = Counter()
+        self.heapdump_decisions: List[Dict[str, object]] = []
+        self.finished = threading.Event()
+
+    # --------------------------------------------------------------------- #
+    # Public API
+    # --------------------------------------------------------------------- #
+    def start(self) -> None:
+        if self._is_running:
+            return
+        self._is_running = True
+        for device in self.devices:
+            self._state_for(device)
+        thread = threading.Thread(target=self._replay, name="session-replay", daemon=True)
+        thread.start()
+        self._monitor_threads.append(thread)
+        self.metrics.devices_monitored.set(value=len(self.devices))
+        speed = f"{self.speed:g} 倍速" if self.speed > 0 else "不限速"
+        print(f"MemoryMonitorService: 回放 {', '.join(self.session_paths)}（{speed}），设备：{', '.join(self.devices)}")
+
+    # --------------------------------------------------------------------- #
+    # Internal helpers
+    # --------------------------------------------------------------------- #
+    def _replay(self) -> None:
+        _, records = read_sessions(self.session_paths)
+        first_ts: Optional[float] = None
+        started = time.monotonic()
+        try:
+            for record in records:
+                if not self._is_running:
+                    break
+                if first_ts is None:
+                    first_ts = record.ts
+                if self.speed > 0:
+                    delay = (record.ts - first_ts) / self.speed - (time.monotonic() - started)
+                    if delay > 0:
+                        time.sleep(delay)
+                state = self._state_for(record.device)
+                info = parse_collector_output(record.raw)
+                self._handle_sample(state, info, record.duration, record.ts)
+                self.statuses[info["status"]] += 1
+                self.replayed += 1
+        finally:
+            self.finished.set()
+
+    def _publish_event(self, event: Dict[str, object]) -> None:
+        # 阈值事件即 heapdump 触发决定；同步记录，不依赖触发线程何时执行
+        super()._publish_event(event)
+        self.heapdump_decisions.append(event)
+
+    def _trigger_heapdump(self, device_id: str) -> None:
+        self.metrics.observe_heapdump(device_id, True, 0.0, 0)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="回放采样会话日志，评估阈值与 heapdump 触发逻辑")
+    parser.add_argument("sessions", nargs="+", help="会话日志路径，支持通配符（分片模式下每个采样进程一份）")
+    parser.add_argument("--speed", type=float, default=0, help="回放倍速，0 表示尽可能快（默认）")
+    parser.add_argument("--threshold", type=float, default=250.0, help="内存阈值（MB）")
+    args = parser.parse_args(argv)
+
+    paths = sorted({path for pattern in args.sessions for path in (glob.glob(pattern) or [pattern])})
+    service = ReplayMemoryMonitorService(paths, speed=args.speed, threshold_mb=args.threshold)
+    started = time.perf_counter()
+    service.start()
+    try:
+        service.finished.wait()
+    except KeyboardInterrupt:
+        pass
+    elapsed = time.perf_counter() - started
+    service.stop()
+
+    print(f"回放 {service.replayed} 条样本，用时 {elapsed:.2f}s（{service.replayed / max(elapsed, 1e-9):.0f} 条/秒）")
+    print("采样状态：" + "，".join(f"{status} {count}" for status, count in service.statuses.most_common()))
+    print(f"heapdump 触发 {len(service.heapdump_decisions)} 次（阈值 {args.threshold:g} MB）：")
+    for event in service.heapdump_decisions:
+        when = datetime.fromisoformat(event["time"]).strftime("%m-%d %H:%M:%S")
+        print(f"  {when}  {event['device']}  {event['value_mb']} MB")
+
+
+if __name__ == "__main__":
+    main()
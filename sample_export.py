@@ -0,0 +1,189 @@
+import csv
+import io
+import json
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from monitor_service import _utc_isoformat
+from sample_store import SampleStore
+
+# 每种记录导出的字段（device、time 两列总在最前）
+EXPORT_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "memory": ("ts", "value_mb", "status", "duration"),
+    "top": ("ts", "pid", "name", "cpu", "res_kb"),
+}
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+CHUNK_ROWS = 5000
+PARQUET_ROW_GROUP_ROWS = 65536
+
+
+class ExportError(Exception):
+    pass
+
+
+def iter_chunks(
+    store: SampleStore,
+    devices: Sequence[str],
+    kind: str,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    chunk_rows: int = CHUNK_ROWS,
+) -> Iterator[List[Dict[str, object]]]:
+    """按设备依次从 SampleStore 流式读取记录，每 chunk_rows 条产出一批，内存占用与总行数无关。"""
+    chunk: List[Dict[str, object]] = []
+    for device in devices:
+        for record in store.iter_records(device, kind, start, end):
+            record["device"] = device
+            chunk.append(record)
+            if len(chunk) >= chunk_rows:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def _columns(kind: str) -> Tuple[str, ...]:
+    return ("device", "time") + EXPORT_FIELDS[kind]
+
+
+def iter_csv(chunks: Iterable[List[Dict[str, object]]], kind: str) -> Iterator[str]:
+    columns = _columns(kind)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for chunk in chunks:
+        writer.writerows(
+            [record["device"], _utc_isoformat(record["ts"])] + [record.get(field) for field in columns[2:]]
+            for record in chunk
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_ndjson(chunks: Iterable[List[Dict[str, object]]], kind: str) -> Iterator[str]:
+    columns = _columns(kind)
+    for chunk in chunks:
+        lines = []
+        for record in chunk:
+            row = {"device": record["device"], "time": _utc_isoformat(record["ts"])}
+            row.update((field, record.get(field)) for field in columns[2:])
+            lines.append(json.dumps(row, ensure_ascii=False, separators=(",", ":")))
+        yield "\n".join(lines) + "\n"
+
+
+class _ChunkSink:
+    """ParquetWriter 的输出目标：只缓存尚未发送的字节，由生成器在每个行组写完后取走。"""
+
+    def __init__(self) -> None:
+        self.parts: List[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.parts.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data, self.parts = b"".join(self.parts), []
+        return data
+
+
+def _parquet_schema(kind: str):
+    import pyarrow as pa
+
+    types = {
+        "device": pa.dictionary(pa.int32(), pa.string()),
+        "time": pa.timestamp("ms", tz="UTC"),
+        "ts": pa.float64(),
+        "value_mb": pa.float64(),
+        "status": pa.string(),
+        "duration": pa.float64(),
+        "pid": pa.int64(),
+        "name": pa.string(),
+        "cpu": pa.float64(),
+        "res_kb": pa.float64(),
+    }
+    return pa.schema([(column, types[column]) for column in _columns(kind)])
+
+
+def iter_parquet(
+    chunks: Iterable[List[Dict[str, object]]], kind: str, row_group_rows: int = PARQUET_ROW_GROUP_ROWS
+) -> Iterator[bytes]:
+    """按行组写 Parquet：凑满 row_group_rows 行写一个行组并立即发送，最后写入文件尾（footer）。"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise ExportError("Parquet 导出需要安装 pyarrow") from exc
+
+    schema = _parquet_schema(kind)
+    columns = _columns(kind)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    # 按列累积，避免为一个行组保留几万个记录字典
+    pending: Dict[str, list] = {column: [] for column in columns}
+
+    def write_group() -> None:
+        writer.write_table(pa.Table.from_pydict(pending, schema=schema), row_group_size=len(pending["time"]))
+        for values in pending.values():
+            values.clear()
+
+    try:
+        for chunk in chunks:
+            for record in chunk:
+                pending["device"].append(record["device"])
+                pending["time"].append(int(record["ts"] * 1000))
+                for field in columns[2:]:
+                    pending[field].append(record.get(field))
+            if len(pending["time"]) >= row_group_rows:
+                write_group()
+                yield sink.drain()
+        if pending["time"]:
+            write_group()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def export(
+    store: SampleStore,
+    devices: Sequence[str],
+    kind: str = "memory",
+    fmt: str = "csv",
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+) -> Iterator:
+    """导出入口：返回按块产出 str（csv / ndjson）或 bytes（parquet）的生成器。"""
+    if kind not in EXPORT_FIELDS:
+        raise ExportError(f"不支持的记录类型：{kind}")
+    if fmt not in FORMATS:
+        raise ExportError(f"不支持的导出格式：{fmt}")
+    if fmt == "parquet":
+        # 提前检查依赖，使缺少 pyarrow 时返回错误而不是中断的响应
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError as exc:
+            raise ExportError("Parquet 导出需要安装 pyarrow") from exc
+    chunks = iter_chunks(store, devices, kind, start, end)
+    if fmt == "csv":
+        return iter_csv(chunks, kind)
+    if fmt == "ndjson":
+        return iter_ndjson(chunks, kind)
+    return iter_parquet(chunks, kind)
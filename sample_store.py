@@ -0,0 +1,194 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import quote, unquote
+
+DEFAULT_SEGMENT_BYTES = 16 * 1024 * 1024
+DEFAULT_MAX_SEGMENTS = 8
+
+
+class _Segments:
+    """单个 (设备, 类型) 的分段文件：<root>/<设备>/<类型>.<序号>.ndjson，写满后滚动。"""
+
+    def __init__(self, directory: Path, kind: str, max_segment_bytes: int, max_segments: int) -> None:
+        self.directory = directory
+        self.kind = kind
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segments = max_segments
+        self.lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        existing = self.sequences()
+        self.sequence = existing[-1] if existing else 0
+        self.handle = open(self.path(self.sequence), "a", encoding="utf-8")
+        # 上次进程在写一行的中途退出时文件不以换行结尾，先补一个换行，新记录不会与残行拼在同一行
+        if not self._ends_with_newline(self.path(self.sequence)):
+            self.handle.write("\n")
+            self.handle.flush()
+
+    @staticmethod
+    def _ends_with_newline(path: Path) -> bool:
+        with open(path, "rb") as handle:
+            handle.seek(0, os.SEEK_END)
+            if handle.tell() == 0:
+                return True
+            handle.seek(-1, os.SEEK_END)
+            return handle.read(1) == b"\n"
+
+    def path(self, sequence: int) -> Path:
+        return self.directory / f"{self.kind}.{sequence:06d}.ndjson"
+
+    def sequences(self) -> List[int]:
+        found = []
+        for file in self.directory.glob(f"{self.kind}.*.ndjson"):
+            try:
+                found.append(int(file.name.split(".")[-2]))
+            except ValueError:
+                continue
+        return sorted(found)
+
+    def write(self, lines: str) -> None:
+        with self.lock:
+            self.handle.write(lines)
+            self.handle.flush()
+            if self.handle.tell() >= self.max_segment_bytes:
+                self._rotate()
+
+    def _rotate(self) -> None:
+        self.handle.close()
+        self.sequence += 1
+        self.handle = open(self.path(self.sequence), "a", encoding="utf-8")
+        for stale in self.sequences()[: -self.max_segments]:
+            self.path(stale).unlink(missing_ok=True)
+
+    def close(self) -> None:
+        with self.lock:
+            self.handle.close()
+
+
+class SampleStore:
+    """
+    按设备、按类型（memory / top ...）存放采样记录的本地存储。每条记录一行 JSON，
+    "ts" 字段为 Unix 时间戳；每个分段超过 max_segment_bytes 后滚动，最多保留 max_segments 个分段，
+    总占用有上限。
+    """
+
+    def __init__(
+        self,
+        root: str,
+        max_segment_bytes: int = DEFAULT_SEGMENT_BYTES,
+        max_segments: int = DEFAULT_MAX_SEGMENTS,
+    ) -> None:
+        self.root = Path(root)
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segments = max_segments
+        self._lock = threading.Lock()
+        self._segments: Dict[Tuple[str, str], _Segments] = {}
+
+    def _directory(self, device_id: str) -> Path:
+        return self.root / quote(device_id, safe="")
+
+    def _segments_for(self, device_id: str, kind: str) -> _Segments:
+        key = (device_id, kind)
+        segments = self._segments.get(key)
+        if segments is None:
+            with self._lock:
+                segments = self._segments.get(key)
+                if segments is None:
+                    segments = _Segments(
+                        self._directory(device_id), kind, self.max_segment_bytes, self.max_segments
+                    )
+                    self._segments[key] = segments
+        return segments
+
+    def append(self, device_id: str, kind: str, record: Dict[str, object]) -> None:
+        self.append_many(device_id, kind, (record,))
+
+    def append_many(self, device_id: str, kind: str, records: Iterable[Dict[str, object]]) -> None:
+        lines = "".join(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n" for record in records)
+        if lines:
+            self._segments_for(device_id, kind).write(lines)
+
+    def devices(self) -> List[str]:
+        if not self.root.exists():
+            return []
+        return sorted(unquote(entry.name) for entry in self.root.iterdir() if entry.is_dir())
+
+    def segment_paths(self, device_id: str, kind: str) -> List[Path]:
+        directory = self._directory(device_id)
+        if not directory.exists():
+            return []
+        paths = []
+        for file in directory.glob(f"{kind}.*.ndjson"):
+            try:
+                paths.append((int(file.name.split(".")[-2]), file))
+            except ValueError:
+                continue
+        return [file for _, file in sorted(paths)]
+
+    def iter_records(
+        self,
+        device_id: str,
+        kind: str,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+    ) -> Iterator[Dict[str, object]]:
+        """按时间顺序逐条读取记录，不会把整个分段读入内存。"""
+        paths = self.segment_paths(device_id, kind)
+        for index, path in enumerate(paths):
+            # 下一个分段的第一条记录仍早于 start 时，整个分段都在范围之前，不必逐行解析
+            if start is not None and index + 1 < len(paths):
+                first_ts = self._first_ts(paths[index + 1])
+                if first_ts is not None and first_ts < start:
+                    continue
+            try:
+                handle = open(path, "r", encoding="utf-8")
+            except FileNotFoundError:
+                # 读取过程中该分段被滚动删除
+                continue
+            with handle:
+                for line in handle:
+                    if not line.endswith("\n"):
+                        break
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # 崩溃留下的残缺记录
+                        continue
+                    ts = record.get("ts", 0.0)
+                    if start is not None and ts < start:
+                        continue
+                    if end is not None and ts > end:
+                        return
+                    yield record
+
+    @staticmethod
+    def _first_ts(path: Path) -> Optional[float]:
+        try:
+            with open(path, "r", encoding="utf-8") as handle:
+                line = handle.readline()
+        except FileNotFoundError:
+            return None
+        if not line.endswith("\n"):
+            return None
+        try:
+            return json.loads(line).get("ts")
+        except ValueError:
+            return None
+
+    def close(self) -> None:
+        with self._lock:
+            for segments in self._segments.values():
+                segments.close()
+            self._segments.clear()
+
+
+def build_store_from_env() -> Optional[SampleStore]:
+    """MONITOR_SAMPLE_DIR 未设置时不落盘。"""
+    root = os.environ.get("MONITOR_SAMPLE_DIR", "")
+    if not root:
+        return None
+    segment_mb = float(os.environ.get("MONITOR_SAMPLE_SEGMENT_MB", DEFAULT_SEGMENT_BYTES / (1024 * 1024)))
+    segments = int(os.environ.get("MONITOR_SAMPLE_SEGMENTS", DEFAULT_MAX_SEGMENTS))
+    return SampleStore(root, int(segment_mb * 1024 * 1024), segments)
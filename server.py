@@ -1,11 +1,26 @@
+import atexit
+import math
 import os
+import signal
 import subprocess
+import threading
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import List
+from typing import List, Optional, Tuple
 
-from flask import Flask, jsonify, send_from_directory, url_for
+from flask import Flask, Response, abort, jsonify, request, url_for
+from werkzeug.security import safe_join
 
+import sample_export
+from downsample import DEFAULT_MAX_POINTS, MAX_POINTS_LIMIT
+from federation import build_federation_from_env
+from file_transfer import accepts_gzip, compress_response, send_file_range, send_gunzip_stream, send_gzip_stream
+from heapdump_retention import resolve_dump
+from sketch import DEFAULT_QUANTILES, SKETCH_METRICS
 from monitor_service import build_service_from_env
+from static_assets import INDEX, StaticAssets
+
+FRONTEND_DIR = Path(__file__).resolve().parent / "frontend"
 
 DEFAULT_CONNECT = [
     "172.16.250.57",
@@ -14,8 +29,6 @@ DEFAULT_CONNECT = [
     "172.16.250.23",
 ]
 
-HEAPDUMP_DIR = Path("./tmp/heapdump").resolve()
-
 
 def connect_devices(addresses: List[str]) -> None:
     for address in addresses:
@@ -29,55 +42,389 @@ def connect_devices(addresses: List[str]) -> None:
             print(f"adb connect {address} failed: {exc}")
 
 
-def create_app() -> Flask:
-    app = Flask(__name__, static_folder="frontend", static_url_path="")
+def _parse_time(value: Optional[str]) -> Optional[float]:
+    """from/to 参数：Unix 时间戳（秒）或 ISO 8601 时间；不带时区的按 UTC 处理，与采样历史一致。"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        abort(400, description=f"无法解析的时间：{value}")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _history_args() -> Tuple[Optional[float], Optional[float], Optional[int]]:
+    start = _parse_time(request.args.get("from"))
+    end = _parse_time(request.args.get("to"))
+    max_points = request.args.get("max_points", type=int)
+    if max_points is None and (start is not None or end is not None):
+        max_points = DEFAULT_MAX_POINTS
+    if max_points is not None:
+        max_points = max(3, min(max_points, MAX_POINTS_LIMIT))
+    return start, end, max_points
+
+
+def _parse_quantiles(value: Optional[str]) -> Tuple[float, ...]:
+    """q 参数：逗号分隔，可写成 0.95 或 95（百分数）。"""
+    if not value:
+        return DEFAULT_QUANTILES
+    quantiles = []
+    for item in value.split(","):
+        try:
+            q = float(item)
+        except ValueError:
+            abort(400, description=f"无法解析的分位数：{item}")
+        q = q / 100 if q > 1 else q
+        if not 0 <= q <= 1:
+            abort(400, description=f"分位数超出范围：{item}")
+        quantiles.append(q)
+    return tuple(quantiles)
+
+
+def register_debug_routes(app: Flask, service) -> None:
+    """
+    调试接口：统计采样 profile、tracemalloc 分配排行和线程列表。
+    仅在 MONITOR_DEBUG_ENDPOINTS=true 时注册；设置 MONITOR_DEBUG_TOKEN 后需携带 X-Debug-Token。
+    """
+    import introspection
+
+    token = os.environ.get("MONITOR_DEBUG_TOKEN", "")
+    profile_lock = threading.Lock()
+
+    @app.before_request
+    def _check_debug_token():
+        if not request.path.startswith("/debug/") or not token:
+            return None
+        if request.headers.get("X-Debug-Token") != token:
+            abort(403)
+        return None
+
+    def _positive_arg(name: str, default, convert, upper):
+        # 非正数、NaN/inf 或无法解析时返回 400，过大的值截断到 upper
+        raw = request.args.get(name)
+        if raw is None:
+            return default
+        try:
+            value = convert(raw)
+        except ValueError:
+            abort(400, description=f"无法解析的参数 {name}：{raw}")
+        if not math.isfinite(value) or value <= 0:
+            abort(400, description=f"{name} 必须是正数：{raw}")
+        return min(value, upper)
+
+    @app.route("/debug/profile")
+    def debug_profile():
+        seconds = _positive_arg("seconds", 5.0, float, introspection.MAX_PROFILE_SECONDS)
+        interval = max(
+            _positive_arg("interval", 0.005, float, introspection.MAX_PROFILE_INTERVAL),
+            introspection.MIN_PROFILE_INTERVAL,
+        )
+        if not profile_lock.acquire(blocking=False):
+            return jsonify({"error": "profile already running"}), 409
+        try:
+            stacks = introspection.sample_profile(seconds, interval)
+        finally:
+            profile_lock.release()
+        return Response(stacks, mimetype="text/plain")
+
+    @app.route("/debug/tracemalloc")
+    def debug_tracemalloc():
+        seconds = _positive_arg("seconds", 5.0, float, introspection.MAX_PROFILE_SECONDS)
+        limit = _positive_arg("limit", 20, int, introspection.MAX_TRACEMALLOC_LIMIT)
+        if not profile_lock.acquire(blocking=False):
+            return jsonify({"error": "profile already running"}), 409
+        try:
+            return jsonify(introspection.tracemalloc_top(seconds, limit))
+        finally:
+            profile_lock.release()
+
+    @app.route("/debug/threads")
+    def debug_threads():
+        return jsonify({"threads": introspection.list_threads(service)})
+
+
+class SamplerLockError(RuntimeError):
+    pass
+
+
+# Windows 上的字节锁是强制锁：锁住 PID 之后的一个字节，另一个进程仍能读出持有者的 PID
+_WINDOWS_LOCK_OFFSET = 1024
+
 
-    connect_env = os.environ.get("MONITOR_CONNECT_LIST")
-    addresses = (
-        [item.strip() for item in connect_env.split(",") if item.strip()]
-        if connect_env
-        else DEFAULT_CONNECT
-    )
-    connect_devices(addresses)
+def _lock_file(handle) -> None:
+    """非阻塞地独占锁住 handle，已被其他进程持有时抛 OSError。"""
+    if os.name == "nt":
+        import msvcrt
 
-    service = build_service_from_env()
+        handle.seek(_WINDOWS_LOCK_OFFSET)
+        msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+    else:
+        import fcntl
+
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+
+def _release_sampler_lock(handle) -> None:
+    # flock 随文件关闭释放；Windows 要求关闭前显式解锁同一个字节区间
+    if os.name == "nt":
+        import msvcrt
+
+        handle.seek(_WINDOWS_LOCK_OFFSET)
+        msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+    handle.close()
+
+
+def _acquire_sampler_lock():
+    """
+    同一个 heapdump 目录只允许一个进程采样：多 worker 的 WSGI 服务器（如 gunicorn -w 4）
+    在每个 worker 中调用 create_app() 时，第二个 worker 会在这里失败，而不是再启动一份采样线程。
+    返回需要在进程生命周期内保持打开的锁文件。POSIX 上使用 flock，Windows 上使用 msvcrt.locking。
+    """
+    directory = Path(os.environ.get("HEAPDUMP_OUTPUT", "./tmp/heapdump"))
+    directory.mkdir(parents=True, exist_ok=True)
+    handle = open(directory / ".monitor.lock", "a+", encoding="utf-8")
+    try:
+        _lock_file(handle)
+    except OSError:
+        handle.seek(0)
+        owner = handle.read().strip() or "未知"
+        handle.close()
+        raise SamplerLockError(
+            f"进程 {owner} 已在 {directory} 上运行采样服务；请使用单进程多线程方式部署（python server.py）"
+        ) from None
+    handle.seek(0)
+    handle.truncate()
+    handle.write(str(os.getpid()))
+    handle.flush()
+    return handle
+
+
+def shutdown_app(app: Flask) -> None:
+    """
+    优雅停止：停止采样（等待采样线程/进程退出、写入最后一次检查点、关闭会话记录）并释放采样锁。
+    可重复调用；create_app() 已把它注册到 atexit，外部 WSGI 服务器也可在 worker 退出钩子中调用。
+    """
+    service = app.extensions.pop("memory_monitor", None)
+    if service is not None:
+        service.stop()
+    lock = app.extensions.pop("memory_monitor_lock", None)
+    if lock is not None:
+        _release_sampler_lock(lock)
+
+
+def create_app() -> Flask:
+    """
+    创建应用并启动采样（或聚合）服务。每个进程只应调用一次；模块导入本身没有副作用，
+    外部 WSGI 服务器使用工厂形式加载，例如 waitress-serve --call server:create_app。
+    """
+    # 静态文件由 StaticAssets 从内存提供，不使用 Flask 按请求读文件的静态路由
+    app = Flask(__name__, static_folder=None)
+    assets = StaticAssets(str(FRONTEND_DIR))
+
+    # 设置了 MONITOR_NODES 时作为聚合节点运行，不连接和采样本机设备
+    service = build_federation_from_env()
+    if service is None:
+        app.extensions["memory_monitor_lock"] = _acquire_sampler_lock()
+        connect_env = os.environ.get("MONITOR_CONNECT_LIST")
+        addresses = (
+            [item.strip() for item in connect_env.split(",") if item.strip()]
+            if connect_env
+            else DEFAULT_CONNECT
+        )
+        connect_devices(addresses)
+        service = build_service_from_env()
     service.start()
+    app.extensions["memory_monitor"] = service
+    atexit.register(shutdown_app, app)
+    app.after_request(compress_response)
 
     @app.route("/api/status")
     def api_status():
-        return jsonify(service.get_status())
+        return jsonify(service.get_status(*_history_args()))
+
+    @app.route("/api/config")
+    def api_config():
+        if not hasattr(service, "reconfigure"):
+            abort(404, description="聚合模式没有可修改的采样配置，请修改各节点")
+        return jsonify(service.get_config())
+
+    @app.route("/api/config", methods=["PUT", "PATCH"])
+    def api_update_config():
+        """
+        运行时修改 threshold_mb、interval、devices（JSON 正文，省略的字段保持不变）。
+        修改只在本次运行中有效，重启后仍以环境变量为准。设置 MONITOR_ADMIN_TOKEN 后需携带 X-Admin-Token。
+        """
+        if not hasattr(service, "reconfigure"):
+            abort(404, description="聚合模式没有可修改的采样配置，请修改各节点")
+        token = os.environ.get("MONITOR_ADMIN_TOKEN", "")
+        if token and request.headers.get("X-Admin-Token") != token:
+            abort(403)
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict):
+            abort(400, description="请求正文必须是 JSON 对象")
+        unknown = set(body) - {"threshold_mb", "interval", "devices"}
+        if unknown:
+            abort(400, description=f"不支持的配置项：{', '.join(sorted(unknown))}")
+        devices = body.get("devices")
+        if devices is not None and (
+            not isinstance(devices, list) or not all(isinstance(item, str) and item for item in devices)
+        ):
+            abort(400, description="devices 必须是设备序列号列表")
+        try:
+            threshold_mb = float(body["threshold_mb"]) if body.get("threshold_mb") is not None else None
+            interval = float(body["interval"]) if body.get("interval") is not None else None
+            return jsonify(service.reconfigure(threshold_mb=threshold_mb, interval=interval, devices=devices))
+        except (TypeError, ValueError) as exc:
+            abort(400, description=str(exc))
+
+    @app.route("/api/devices/<path:device>/history")
+    def api_device_history(device: str):
+        start, end, max_points = _history_args()
+        points = service.get_history(device, start, end, max_points)
+        if points is None:
+            abort(404)
+        return jsonify(
+            {
+                "device": device,
+                "from": start,
+                "to": end,
+                "max_points": max_points,
+                "threshold": service.threshold_mb,
+                "history": points,
+            }
+        )
+
+    @app.route("/api/percentiles")
+    def api_percentiles():
+        metric = request.args.get("metric", "memory")
+        if metric not in SKETCH_METRICS:
+            abort(400, description=f"metric 只能是 {', '.join(SKETCH_METRICS)}")
+        devices = [item for value in request.args.getlist("device") for item in value.split(",") if item]
+        return jsonify(
+            service.get_percentiles(
+                devices or None,
+                metric,
+                _parse_time(request.args.get("from")),
+                _parse_time(request.args.get("to")),
+                _parse_quantiles(request.args.get("q")),
+                include_sketch=request.args.get("sketch") == "1",
+            )
+        )
+
+    @app.route("/api/export")
+    def api_export():
+        store = service.sample_store
+        if store is None:
+            abort(404, description="未配置 MONITOR_SAMPLE_DIR，没有可导出的采样记录")
+        start = _parse_time(request.args.get("from"))
+        end = _parse_time(request.args.get("to"))
+        kind = request.args.get("kind", "memory")
+        fmt = request.args.get("format", "csv")
+        devices = [item for value in request.args.getlist("device") for item in value.split(",") if item]
+        devices = devices or store.devices()
+        try:
+            chunks = sample_export.export(store, devices, kind, fmt, start, end)
+        except sample_export.ExportError as exc:
+            abort(400, description=str(exc))
+        mimetype, extension = sample_export.FORMATS[fmt]
+        name = devices[0] if len(devices) == 1 else "all"
+        response = Response(chunks, mimetype=mimetype)
+        response.headers.set(
+            "Content-Disposition", "attachment", filename=f"{kind}_{name}.{extension}".replace(":", "_")
+        )
+        return response
+
+    @app.route("/metrics")
+    def metrics():
+        return Response(service.metrics.render(), mimetype="text/plain; version=0.0.4")
 
     @app.route("/api/heapdumps")
     def api_heapdumps():
         files = service.get_heapdumps()
         for item in files:
-            item["url"] = url_for("download_heapdump", filename=item["name"])
+            # 聚合模式下链接已指向所在节点
+            item.setdefault("url", url_for("download_heapdump", filename=item["name"]))
         return jsonify({"files": files})
 
     @app.route("/heapdump/<path:filename>")
     def download_heapdump(filename: str):
-        return send_from_directory(HEAPDUMP_DIR, filename, as_attachment=True)
+        if service.heapdump_output is None:
+            abort(404)
+        directory = service.heapdump_output.resolve()
+        if safe_join(str(directory), filename) is None:
+            abort(404)
+        path = resolve_dump(directory, filename)
+        if path is None:
+            abort(404)
+        if path.name != filename:
+            # 已被保留策略压缩：接受 gzip 的客户端直接拿压缩数据（仍可断点续传），否则边解压边发送
+            if accepts_gzip():
+                return send_file_range(path, filename, content_encoding="gzip")
+            return send_gunzip_stream(path, filename)
+        if request.args.get("gzip") == "1" and accepts_gzip():
+            return send_gzip_stream(path, filename)
+        return send_file_range(path, filename)
+
+    if os.environ.get("MONITOR_DEBUG_ENDPOINTS", "false").lower() == "true":
+        register_debug_routes(app, service)
 
     @app.route("/")
     def root():
-        return send_from_directory(app.static_folder, "index.html")
+        return assets.response(INDEX)
 
     @app.route("/<path:path>")
     def static_proxy(path: str):
-        target = Path(app.static_folder) / path
-        if target.exists():
-            return send_from_directory(app.static_folder, path)
-        return send_from_directory(app.static_folder, "index.html")
+        return assets.response(path) or assets.response(INDEX)
 
     return app
 
 
-app = create_app()
+def serve(host: str, port: int, threads: int = 8) -> None:
+    """
+    生产入口：单进程、多线程的 HTTP 服务器，采样服务只有一份（分片采样由 MONITOR_WORKERS 控制）。
+    已安装 waitress 时使用它，否则使用 werkzeug 的多线程服务器。
+    收到 SIGTERM / SIGINT 时停止接受连接，再调用 shutdown_app 停止采样。
+    """
+    app = create_app()
+    try:
+        from waitress import create_server
+    except ImportError:
+        from werkzeug.serving import make_server
+
+        server = make_server(host, port, app, threaded=True)
+        run, close = server.serve_forever, server.server_close
+        print(f"未安装 waitress，使用 werkzeug 多线程服务器：http://{host}:{port}")
+    else:
+        server = create_server(app, host=host, port=port, threads=threads)
+        run, close = server.run, server.close
+        print(f"waitress 已启动（{threads} 个线程）：http://{host}:{port}")
+
+    def _terminate(signum, frame) -> None:
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, _terminate)
+    try:
+        run()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        close()
+        print("正在停止采样服务 ...")
+        shutdown_app(app)
 
 
 if __name__ == "__main__":
     host = os.environ.get("MONITOR_HOST", "0.0.0.0")
     port = int(os.environ.get("MONITOR_PORT", "8000"))
-    debug = os.environ.get("MONITOR_DEBUG", "false").lower() == "true"
-    app.run(host=host, port=port, debug=debug)
+    if os.environ.get("MONITOR_DEBUG", "false").lower() == "true":
+        # 调试服务器；关闭自动重载，否则重载监视进程和子进程会各启动一份采样
+        create_app().run(host=host, port=port, debug=True, use_reloader=False)
+    else:
+        serve(host, port, threads=int(os.environ.get("MONITOR_THREADS", "8")))
 
@@ -0,0 +1,137 @@
+import gzip
+import heapq
+import json
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+SESSION_VERSION = 1
+# 每隔多少秒把压缩流同步刷到磁盘；进程被强杀时最多丢失这段时间的记录
+FLUSH_INTERVAL = 5.0
+
+
+class RawSample(NamedTuple):
+    """一次 dumpsys meminfo 的原始结果。returncode 为 None 表示超时。"""
+
+    returncode: Optional[int]
+    stdout: str
+    stderr: str
+
+
+class SessionRecord(NamedTuple):
+    ts: float
+    device: str
+    raw: RawSample
+    duration: float
+
+
+class SessionRecorder:
+    """
+    把采集器的原始输出（dumpsys 文本、返回码、stderr、耗时）按时间顺序写入 gzip 压缩的 NDJSON 会话日志。
+    首行是会话头（进程名、采样周期、设备列表）。同一台设备相邻两次的 dumpsys 输出大部分相同，
+    gzip 的滑动窗口能覆盖多台设备的连续输出，压缩后每条样本通常只有几百字节。
+    写入定期以 Z_SYNC_FLUSH 刷新，文件在任意时刻被截断都能读出已刷新的部分。
+    """
+
+    def __init__(self, path: str, header: Dict[str, object], flush_interval: float = FLUSH_INTERVAL) -> None:
+        self.path = _unused_path(Path(path))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_interval = flush_interval
+        self.records = 0
+        self._lock = threading.Lock()
+        self._handle = gzip.open(self.path, "wt", encoding="utf-8", compresslevel=6)
+        self._last_flush = time.monotonic()
+        self._write({"version": SESSION_VERSION, "started": time.time(), **header})
+        self._flush()
+
+    def write(self, device_id: str, raw: RawSample, duration: float, ts: Optional[float] = None) -> None:
+        record = {
+            "t": round(time.time() if ts is None else ts, 3),
+            "d": device_id,
+            "rc": raw.returncode,
+            "out": raw.stdout,
+            "dur": round(duration, 4),
+        }
+        if raw.stderr:
+            record["err"] = raw.stderr
+        with self._lock:
+            if self._handle is None:
+                return
+            self._write(record)
+            self.records += 1
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush()
+
+    def _flush(self) -> None:
+        # TextIOWrapper.flush 会调用 GzipFile.flush，即 Z_SYNC_FLUSH 并刷新底层文件
+        self._handle.flush()
+        self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+
+    def _write(self, record: Dict[str, object]) -> None:
+        self._handle.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+
+def _unused_path(path: Path) -> Path:
+    """已存在的会话日志不覆盖（如服务或采样进程重启），改写到 <path>.1、<path>.2 ……"""
+    candidate, index = path, 0
+    while candidate.exists():
+        index += 1
+        candidate = path.with_name(f"{path.name}.{index}")
+    return candidate
+
+
+def _iter_lines(path: Path) -> Iterator[str]:
+    """逐行读取会话日志；记录进程崩溃留下的未结束压缩流时，读到最后一个完整行为止。"""
+    with gzip.open(path, "rt", encoding="utf-8") as handle:
+        try:
+            for line in handle:
+                if line.endswith("\n"):
+                    yield line
+        except (EOFError, zlib.error):
+            return
+
+
+def read_session(path: str) -> Tuple[Dict[str, object], Iterator[SessionRecord]]:
+    """返回 (会话头, 按时间顺序的记录迭代器)。"""
+    lines = _iter_lines(Path(path))
+    try:
+        header = json.loads(next(lines))
+    except StopIteration:
+        raise ValueError(f"{path} 不是有效的会话日志") from None
+    if header.get("version") != SESSION_VERSION:
+        raise ValueError(f"{path} 的会话日志版本 {header.get('version')} 不受支持")
+
+    def records() -> Iterator[SessionRecord]:
+        for line in lines:
+            data = json.loads(line)
+            raw = RawSample(data["rc"], data["out"], data.get("err", ""))
+            yield SessionRecord(data["t"], data["d"], raw, data["dur"])
+
+    return header, records()
+
+
+def read_sessions(paths: Sequence[str]) -> Tuple[Dict[str, object], Iterator[SessionRecord]]:
+    """
+    合并多个会话日志（如分片模式下每个采样进程各写一份）：会话头取第一份并合并设备列表，
+    记录按时间归并。
+    """
+    headers: List[Dict[str, object]] = []
+    streams = []
+    for path in paths:
+        header, records = read_session(path)
+        headers.append(header)
+        streams.append(records)
+    if not headers:
+        raise ValueError("没有会话日志")
+    merged = dict(headers[0])
+    merged["devices"] = sorted({device for header in headers for device in header.get("devices", [])})
+    merged["started"] = min(header.get("started", 0) for header in headers)
+    return merged, heapq.merge(*streams, key=lambda record: record.ts)
@@ -0,0 +1,428 @@
+import multiprocessing
+import queue
+import struct
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from multiprocessing import shared_memory
+from typing import Deque, Dict, List, Optional, Tuple
+
+from checkpoint import DeviceCheckpoint
+from monitor_service import DeviceSnapshot, MemoryMonitorService, _DeviceState, _utc_isoformat
+from sample_store import SampleStore
+
+# 环形缓冲区布局：头部 (version, count, capacity, status_len) + 状态字符串 + capacity 个 (时间戳, MB)
+_HEADER = struct.Struct("<QQQQ")
+_VERSION = struct.Struct("<Q")
+_ENTRY = struct.Struct("<dd")
+STATUS_BYTES = 128
+_STATUS_OFFSET = _HEADER.size
+_ENTRIES_OFFSET = _STATUS_OFFSET + STATUS_BYTES
+
+METRICS_FLUSH_INTERVAL = 1.0
+SUPERVISE_INTERVAL = 1.0
+MAX_READ_RETRIES = 100
+
+
+class SampleRing:
+    """
+    单台设备的共享内存环形缓冲区，只有一个写入方（该设备所在 worker 的采样线程）。
+    写入与读取通过 seqlock 协调：写入前把 version 置为奇数，写完置为下一个偶数；
+    读取方直接在共享内存上解包，读前后 version 一致才采用结果，否则重试，读写双方都不加锁。
+    """
+
+    def __init__(self, device_id: str, shm: shared_memory.SharedMemory, owner: bool) -> None:
+        self.device_id = device_id
+        self._shm = shm
+        self._owner = owner
+        self._cached_version: Optional[int] = None
+        self._cached = DeviceSnapshot(device_id, "idle", 0.0, None, ())
+
+    @classmethod
+    def create(cls, device_id: str, capacity: int) -> "SampleRing":
+        capacity = max(1, capacity)
+        shm = shared_memory.SharedMemory(create=True, size=_ENTRIES_OFFSET + capacity * _ENTRY.size)
+        _HEADER.pack_into(shm.buf, 0, 0, 0, capacity, 0)
+        return cls(device_id, shm, owner=True)
+
+    @classmethod
+    def attach(cls, device_id: str, name: str) -> "SampleRing":
+        # spawn 出的 worker 与主进程共用同一个 resource_tracker，共享内存只由主进程 unlink
+        ring = cls(device_id, shared_memory.SharedMemory(name=name), owner=False)
+        ring._recover()
+        return ring
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def _recover(self) -> None:
+        # 上一个 worker 若在写入中途崩溃，version 会停在奇数，重新置为偶数使读取方可以继续读取
+        version = _VERSION.unpack_from(self._shm.buf, 0)[0]
+        if version & 1:
+            _VERSION.pack_into(self._shm.buf, 0, version + 1)
+
+    def append(self, timestamp: datetime, value: float, status: str) -> None:
+        buf = self._shm.buf
+        version, count, capacity, _ = _HEADER.unpack_from(buf, 0)
+        _VERSION.pack_into(buf, 0, version + 1)
+        epoch = timestamp.replace(tzinfo=timezone.utc).timestamp()
+        _ENTRY.pack_into(buf, _ENTRIES_OFFSET + (count % capacity) * _ENTRY.size, epoch, value)
+        encoded = status.encode("utf-8")[:STATUS_BYTES]
+        buf[_STATUS_OFFSET : _STATUS_OFFSET + len(encoded)] = encoded
+        _HEADER.pack_into(buf, 0, version + 2, count + 1, capacity, len(encoded))
+
+    def snapshot(self) -> DeviceSnapshot:
+        """读取最新快照。数据未变化时直接返回上次构造的快照。"""
+        buf = self._shm.buf
+        for _ in range(MAX_READ_RETRIES):
+            version, count, capacity, status_len = _HEADER.unpack_from(buf, 0)
+            if version == self._cached_version:
+                return self._cached
+            if version & 1:
+                time.sleep(0)
+                continue
+            size = min(count, capacity)
+            first = count - size
+            entries = [
+                _ENTRY.unpack_from(buf, _ENTRIES_OFFSET + ((first + i) % capacity) * _ENTRY.size)
+                for i in range(size)
+            ]
+            status = bytes(buf[_STATUS_OFFSET : _STATUS_OFFSET + status_len])
+            if _VERSION.unpack_from(buf, 0)[0] != version:
+                continue
+            self._cached = self._build(entries, status.decode("utf-8", "replace"))
+            self._cached_version = version
+            return self._cached
+        # 写入方一直处于写入中（通常是 worker 崩溃），返回上一次的快照
+        return self._cached
+
+    def _build(self, entries: List[Tuple[float, float]], status: str) -> DeviceSnapshot:
+        if not entries:
+            return DeviceSnapshot(self.device_id, "idle", 0.0, None, ())
+        history = tuple(
+            {
+                "time": _utc_isoformat(epoch),
+                "value": value,
+            }
+            for epoch, value in entries
+        )
+        return DeviceSnapshot(self.device_id, status, entries[-1][1], history[-1]["time"], history)
+
+    def close(self) -> None:
+        self._shm.close()
+        if self._owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class _MetricsRelay:
+    """
+    worker 进程中代替 MonitorMetrics：记录对指标的调用（如 metrics.schedule_lag.observe(value=...)），
+    由 worker 定期批量发回主进程，在主进程的 MonitorMetrics 上重放，/metrics 因此覆盖所有分片。
+    """
+
+    def __init__(self, calls: Deque[tuple], path: Tuple[str, ...] = ()) -> None:
+        self._calls = calls
+        self._path = path
+
+    def __getattr__(self, name: str) -> "_MetricsRelay":
+        return _MetricsRelay(self._calls, self._path + (name,))
+
+    def __call__(self, *args, **kwargs) -> None:
+        self._calls.append((self._path, args, kwargs))
+
+
+class _ShardWorkerService(MemoryMonitorService):
+    """worker 进程内的服务：采样、阈值判断和 heapdump 照常运行，结果写入共享内存并通过队列上报。"""
+
+    def __init__(self, rings: Dict[str, SampleRing], outbox, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self._rings = rings
+        self._outbox = outbox
+        self._metric_calls: Deque[tuple] = deque()
+        self.metrics = _MetricsRelay(self._metric_calls)
+
+    def _record_sample(
+        self, state: _DeviceState, timestamp: datetime, info: Dict[str, object], duration: float
+    ) -> None:
+        super()._record_sample(state, timestamp, info, duration)
+        self._rings[state.device_id].append(timestamp, info["value"], info["status"])
+
+    def _publish_event(self, event: Dict[str, object]) -> None:
+        super()._publish_event(event)
+        self._outbox.put(("event", event))
+
+    def _process_threshold(self, device_id: str, value_mb: float, timestamp: datetime) -> None:
+        state = self._state_for(device_id)
+        cooldown = state.heapdump_cooldown
+        super()._process_threshold(device_id, value_mb, timestamp)
+        # 冷却状态变化时告知主进程，用于检查点和重新拉起 worker
+        if state.heapdump_cooldown != cooldown:
+            self._outbox.put(("cooldown", (device_id, state.heapdump_cooldown)))
+
+    def flush_metrics(self) -> None:
+        batch = []
+        while self._metric_calls:
+            batch.append(self._metric_calls.popleft())
+        if batch:
+            self._outbox.put(("metrics", batch))
+
+
+def _worker_main(shard: int, ring_names: Dict[str, str], config: Dict[str, object], outbox, control) -> None:
+    rings = {device: SampleRing.attach(device, name) for device, name in ring_names.items()}
+    store_config = config.pop("sample_store", None)
+    store = SampleStore(**store_config) if store_config else None
+    cooldowns = config.pop("cooldowns", {})
+    service = _ShardWorkerService(rings, outbox, devices=list(ring_names), sample_store=store, **config)
+    for device, cooldown in cooldowns.items():
+        service._state_for(device).heapdump_cooldown = cooldown
+    service.start()
+    try:
+        while True:
+            # 主进程退出（管道关闭）时 poll 返回 True，recv 抛出 EOFError
+            if control.poll(METRICS_FLUSH_INTERVAL):
+                message = control.recv()
+                if message == "stop":
+                    break
+                kind, payload = message
+                if kind == "config":
+                    service.reconfigure(**payload)
+            service.flush_metrics()
+    except (KeyboardInterrupt, EOFError, OSError):
+        pass
+    finally:
+        service.stop()
+        service.flush_metrics()
+        for ring in rings.values():
+            ring.close()
+
+
+class ShardedMemoryMonitorService(MemoryMonitorService):
+    """
+    多进程分片模式：设备按轮询分配到 workers 个子进程，每个子进程独立采样（不受主进程 GIL 影响），
+    样本写入每台设备一块的共享内存环形缓冲区；主进程（Flask）直接从共享内存读取快照。
+    阈值事件和指标经队列回传，子进程异常退出时由监督线程重新拉起。
+    对外接口与 MemoryMonitorService 相同。
+    """
+
+    def __init__(self, workers: int, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.workers = max(1, workers)
+        self.worker_restarts = 0
+        self._context = multiprocessing.get_context("spawn")
+        self._rings: Dict[str, SampleRing] = {}
+        self._shards: List[Dict[str, str]] = []
+        self._processes: List[Optional[multiprocessing.Process]] = []
+        # 每个 worker 一条控制管道。不用 multiprocessing.Event：被强杀的 worker 会让 Event.set() 永久阻塞
+        self._controls: List = []
+        self._outbox = None
+        self._service_threads: List[threading.Thread] = []
+        # 监督线程重新拉起 worker 与 stop() 互斥：stop() 之后不会再有新的 worker
+        self._lifecycle_lock = threading.Lock()
+        self._supervisor_stop = threading.Event()
+        self._supervisor: Optional[threading.Thread] = None
+
+    # --------------------------------------------------------------------- #
+    # Public API
+    # --------------------------------------------------------------------- #
+    def start(self) -> None:
+        if self._is_running:
+            return
+        if not self.devices:
+            self.devices = self.get_connected_devices()
+        if not self.devices:
+            print("MemoryMonitorService: 未检测到已连接设备，监控不会启动。")
+            return
+
+        self._is_running = True
+        self._supervisor_stop.clear()
+        self._outbox = self._context.Queue()
+        self._rings = {device: SampleRing.create(device, self.history_points) for device in self.devices}
+        # 在 worker 启动前把检查点中的历史写入共享内存，冷却状态随 worker 配置下发
+        self._restore_checkpoint()
+        workers = min(self.workers, len(self.devices))
+        self._shards = [
+            {device: self._rings[device].name for device in self.devices[index::workers]}
+            for index in range(workers)
+        ]
+        self._controls = [None] * workers
+        self._processes = [self._spawn(index) for index in range(workers)]
+        thread = threading.Thread(target=self._drain_outbox, name="shard-outbox", daemon=True)
+        thread.start()
+        self._service_threads.append(thread)
+        self._supervisor = threading.Thread(target=self._supervise, name="shard-supervisor", daemon=True)
+        self._supervisor.start()
+        # heapdump 由各 worker 触发，保留策略只在主进程中运行一份
+        if self.retention is not None:
+            self.retention.start()
+        if self._checkpointer is not None:
+            self._checkpointer.start()
+        self.metrics.devices_monitored.set(value=len(self.devices))
+        print(
+            f"MemoryMonitorService: 已启动 {workers} 个采样进程，监控 {len(self.devices)} 台设备："
+            f"{', '.join(self.devices)}"
+        )
+
+    def stop(self) -> None:
+        with self._lifecycle_lock:
+            if not self._is_running:
+                return
+            self._is_running = False
+        # 先等监督线程退出，之后 _processes / _controls 只由这里修改
+        self._supervisor_stop.set()
+        if self._supervisor is not None:
+            self._supervisor.join()
+            self._supervisor = None
+        for control in self._controls:
+            try:
+                control.send("stop")
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self._processes:
+            if process is None:
+                continue
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+                process.join(timeout=5)
+        self._processes.clear()
+        for control in self._controls:
+            control.close()
+        self._controls.clear()
+        for thread in self._service_threads:
+            thread.join(timeout=2)
+        self._service_threads.clear()
+        if self._checkpointer is not None:
+            # worker 已退出且队列已读完，最后一次检查点包含全部事件和冷却状态
+            self._checkpointer.stop()
+        for ring in self._rings.values():
+            ring.close()
+        self._rings.clear()
+        if self.retention is not None:
+            self.retention.stop()
+        if self.sample_store is not None:
+            self.sample_store.close()
+
+    def get_snapshots(self) -> List[DeviceSnapshot]:
+        return [ring.snapshot() for ring in self._rings.values()]
+
+    def reconfigure(
+        self,
+        threshold_mb: Optional[float] = None,
+        interval: Optional[float] = None,
+        devices: Optional[List[str]] = None,
+    ) -> Dict[str, object]:
+        """阈值和周期下发到各 worker；设备与共享内存、分片绑定，修改设备列表需要重启。"""
+        if devices is not None and list(devices) != list(self.devices):
+            raise ValueError("分片模式（MONITOR_WORKERS > 1）不支持运行时修改设备列表，请重启服务")
+        config = super().reconfigure(threshold_mb=threshold_mb, interval=interval)
+        payload = {key: value for key, value in (("threshold_mb", threshold_mb), ("interval", interval)) if value is not None}
+        if payload:
+            for control in self._controls:
+                try:
+                    control.send(("config", payload))
+                except (BrokenPipeError, OSError):
+                    # worker 已退出，重新拉起时会使用新配置
+                    pass
+        return config
+
+    # --------------------------------------------------------------------- #
+    # Internal helpers
+    # --------------------------------------------------------------------- #
+    def _worker_config(self, shard: int) -> Dict[str, object]:
+        config: Dict[str, object] = {
+            "process_name": self.process_name,
+            "interval": self.interval,
+            "threshold_mb": self.threshold_mb,
+            "history_points": self.history_points,
+            "heapdump_script": str(self.heapdump_script),
+            "heapdump_output": str(self.heapdump_output),
+            "top_interval": self.top_interval,
+            "cooldowns": {
+                device: state.heapdump_cooldown
+                for device, state in self._states.items()
+                if device in self._shards[shard]
+            },
+        }
+        # 每个 worker 记录到各自的会话日志，回放时按时间归并（replay.py 接受多个文件）
+        if self.record_path:
+            config["record_path"] = f"{self.record_path}.shard{shard}"
+        # 各 worker 只写自己设备的目录；主进程持有的 SampleStore 仅用于读取
+        if self.sample_store is not None:
+            config["sample_store"] = {
+                "root": str(self.sample_store.root),
+                "max_segment_bytes": self.sample_store.max_segment_bytes,
+                "max_segments": self.sample_store.max_segments,
+            }
+        return config
+
+    def _spawn(self, shard: int) -> multiprocessing.Process:
+        if self._controls[shard] is not None:
+            self._controls[shard].close()
+        control, child_control = self._context.Pipe()
+        self._controls[shard] = control
+        process = self._context.Process(
+            target=_worker_main,
+            args=(shard, self._shards[shard], self._worker_config(shard), self._outbox, child_control),
+            name=f"sampler-{shard}",
+            daemon=True,
+        )
+        process.start()
+        child_control.close()
+        return process
+
+    def _supervise(self) -> None:
+        while not self._supervisor_stop.wait(SUPERVISE_INTERVAL):
+            for index, process in enumerate(self._processes):
+                if process is None or process.is_alive():
+                    continue
+                with self._lifecycle_lock:
+                    # stop() 已开始时不再拉起
+                    if not self._is_running:
+                        return
+                    self.worker_restarts += 1
+                    print(
+                        f"MemoryMonitorService: 采样进程 {process.name} 已退出（exitcode={process.exitcode}），"
+                        f"重新启动（累计 {self.worker_restarts} 次）"
+                    )
+                    self._processes[index] = self._spawn(index)
+
+    def _drain_outbox(self) -> None:
+        while self._is_running or not self._outbox.empty():
+            try:
+                kind, payload = self._outbox.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            if kind == "event":
+                self._publish_event(payload)
+                if self.retention is not None:
+                    self.retention.request()
+            elif kind == "metrics":
+                self._replay_metrics(payload)
+            elif kind == "cooldown":
+                device, cooldown = payload
+                self._state_for(device).heapdump_cooldown = cooldown
+
+    def _restore_device(self, device: DeviceCheckpoint) -> None:
+        ring = self._rings.get(device.device)
+        if ring is None:
+            return
+        for epoch, value in device.points[-self.history_points :]:
+            ring.append(datetime.fromtimestamp(epoch, timezone.utc).replace(tzinfo=None), value, device.status)
+        self._state_for(device.device).heapdump_cooldown = device.heapdump_cooldown
+
+    def _replay_metrics(self, calls: List[tuple]) -> None:
+        for path, args, kwargs in calls:
+            # 设备数由主进程统计，各 worker 只知道自己的分片
+            if path[0] == "devices_monitored":
+                continue
+            target = self.metrics
+            for name in path:
+                target = getattr(target, name)
+            target(*args, **kwargs)
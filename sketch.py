@@ -0,0 +1,226 @@
+import math
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# 相对误差 1%：返回的分位数与真实值相差不超过 1%
+RELATIVE_ACCURACY = 0.01
+# 每个草图最多保留的桶数，超出时合并最低的桶（高分位数保持精确）
+MAX_BINS = 2048
+# 时间桶长度与保留数量：默认按小时分桶，保留 7 天
+BUCKET_SECONDS = 3600
+RETENTION_BUCKETS = 7 * 24
+DEFAULT_QUANTILES = (0.5, 0.9, 0.95, 0.99)
+# 每台设备记录的指标：内存（MB，仅成功的采样）和单次采样耗时（秒）
+SKETCH_METRICS = ("memory", "latency")
+# 小于该值的样本计入零桶（对数映射无法处理 0）
+MIN_INDEXABLE = 1e-9
+
+
+class DDSketch:
+    """
+    DDSketch 风格的分位数草图：值 v 落入下标 ceil(log_gamma(v)) 的桶，gamma = (1 + a) / (1 - a)，
+    任意分位数的相对误差不超过 a。插入为 O(1)，桶数有上限，两个相同精度的草图可以直接按桶相加合并，
+    合并结果与把所有样本插入同一个草图完全相同。
+    """
+
+    __slots__ = ("relative_accuracy", "max_bins", "_log_gamma", "bins", "zero_count", "count", "sum", "min", "max")
+
+    def __init__(self, relative_accuracy: float = RELATIVE_ACCURACY, max_bins: int = MAX_BINS) -> None:
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self._log_gamma = math.log((1 + relative_accuracy) / (1 - relative_accuracy))
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if value <= MIN_INDEXABLE:
+            self.zero_count += 1
+            return
+        index = math.ceil(math.log(value) / self._log_gamma)
+        bins = self.bins
+        if index in bins:
+            bins[index] += 1
+        else:
+            bins[index] = 1
+            if len(bins) > self.max_bins:
+                self._collapse()
+
+    def merge(self, other: "DDSketch") -> None:
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("只能合并相对误差相同的草图")
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+
+    def copy(self) -> "DDSketch":
+        clone = DDSketch(self.relative_accuracy, self.max_bins)
+        clone.merge(self)
+        return clone
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if seen > rank:
+            return max(self.min, 0.0)
+        gamma = math.exp(self._log_gamma)
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                # 桶 (gamma^(i-1), gamma^i] 内相对误差最小的代表值
+                value = 2 * gamma ** index / (gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def _collapse(self) -> None:
+        ordered = sorted(self.bins)
+        excess = len(ordered) - self.max_bins
+        target = ordered[excess]
+        for index in ordered[:excess]:
+            self.bins[target] += self.bins.pop(index)
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "bins": {str(index): count for index, count in self.bins.items()},
+            "zero_count": self.zero_count,
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, object]) -> "DDSketch":
+        sketch = cls(float(data["relative_accuracy"]))
+        sketch.bins = {int(index): int(count) for index, count in data["bins"].items()}
+        sketch.zero_count = int(data["zero_count"])
+        sketch.count = int(data["count"])
+        sketch.sum = float(data["sum"])
+        if sketch.count:
+            sketch.min = float(data["min"])
+            sketch.max = float(data["max"])
+        return sketch
+
+
+def merge_all(sketches: Iterable[DDSketch], relative_accuracy: float = RELATIVE_ACCURACY) -> DDSketch:
+    merged = DDSketch(relative_accuracy)
+    for sketch in sketches:
+        merged.merge(sketch)
+    return merged
+
+
+def summarize(sketch: DDSketch, quantiles: Sequence[float]) -> Dict[str, object]:
+    """把草图整理成 API 返回的统计：样本数、最值、均值和各分位数（键如 p95、p99.9）。"""
+    if not sketch.count:
+        return {"count": 0, "min": None, "max": None, "mean": None, "percentiles": {}}
+    return {
+        "count": sketch.count,
+        "min": round(sketch.min, 3),
+        "max": round(sketch.max, 3),
+        "mean": round(sketch.sum / sketch.count, 3),
+        "percentiles": {quantile_label(q): round(sketch.quantile(q), 3) for q in quantiles},
+    }
+
+
+def quantile_label(q: float) -> str:
+    return f"p{q * 100:g}"
+
+
+class SketchStore:
+    """
+    按 (设备, 指标) 保存一组时间桶草图：每 bucket_seconds 一个 DDSketch，只保留最近 retention 个桶，
+    内存占用与运行时长无关。查询时把与 [start, end] 相交的桶合并，时间范围按桶边界对齐。
+    """
+
+    def __init__(
+        self,
+        bucket_seconds: int = BUCKET_SECONDS,
+        retention: int = RETENTION_BUCKETS,
+        relative_accuracy: float = RELATIVE_ACCURACY,
+    ) -> None:
+        self.bucket_seconds = bucket_seconds
+        self.retention = retention
+        self.relative_accuracy = relative_accuracy
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, str], Dict[int, DDSketch]] = {}
+
+    def add(self, device_id: str, metric: str, value: float, timestamp: Optional[float] = None) -> None:
+        timestamp = time.time() if timestamp is None else timestamp
+        bucket = int(timestamp // self.bucket_seconds) * self.bucket_seconds
+        with self._lock:
+            buckets = self._series.setdefault((device_id, metric), {})
+            sketch = buckets.get(bucket)
+            if sketch is None:
+                sketch = buckets[bucket] = DDSketch(self.relative_accuracy)
+                oldest = bucket - self.retention * self.bucket_seconds
+                for stale in [start for start in buckets if start <= oldest]:
+                    del buckets[stale]
+            sketch.add(value)
+
+    def export(self) -> List[Tuple[str, str, int, DDSketch]]:
+        """所有时间桶草图的副本 (设备, 指标, 桶起点, 草图)，用于检查点。"""
+        with self._lock:
+            return [
+                (device_id, metric, bucket, sketch.copy())
+                for (device_id, metric), buckets in self._series.items()
+                for bucket, sketch in buckets.items()
+            ]
+
+    def restore(self, device_id: str, metric: str, bucket: int, sketch: DDSketch) -> None:
+        """把检查点中的草图并入对应时间桶（重启期间已产生的新样本不会被覆盖）。"""
+        with self._lock:
+            buckets = self._series.setdefault((device_id, metric), {})
+            if bucket in buckets:
+                buckets[bucket].merge(sketch)
+            else:
+                buckets[bucket] = sketch
+
+    def devices(self, metric: str) -> List[str]:
+        with self._lock:
+            return sorted(device for device, name in self._series if name == metric)
+
+    def query(
+        self,
+        devices: Iterable[str],
+        metric: str,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+    ) -> Dict[str, DDSketch]:
+        """每台设备在时间范围内合并后的草图；没有数据的设备不出现在结果中。"""
+        lower = int(start // self.bucket_seconds) * self.bucket_seconds if start is not None else None
+        result: Dict[str, DDSketch] = {}
+        with self._lock:
+            for device_id in devices:
+                merged = None
+                for bucket, sketch in self._series.get((device_id, metric), {}).items():
+                    if (lower is not None and bucket < lower) or (end is not None and bucket > end):
+                        continue
+                    if merged is None:
+                        merged = DDSketch(self.relative_accuracy)
+                    merged.merge(sketch)
+                if merged is not None:
+                    result[device_id] = merged
+        return result
@@ -0,0 +1,101 @@
+import hashlib
+import mimetypes
+import re
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional
+
+from flask import Response, request
+
+from file_transfer import brotli, compress_bytes, negotiate_encoding
+
+# 带指纹的文件名随内容变化，可以让浏览器缓存一年且不再验证；入口页和未带指纹的路径每次都验证
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+FINGERPRINT_SUFFIXES = (".js", ".css")
+COMPRESSIBLE_SUFFIXES = (".html", ".js", ".css", ".json", ".svg", ".txt")
+INDEX = "index.html"
+
+
+class _Asset(NamedTuple):
+    content_type: str
+    etag: str
+    cache_control: str
+    # 内容编码 -> 字节，"identity" 为原文
+    bodies: Dict[str, bytes]
+
+
+class StaticAssets:
+    """
+    前端静态文件的内存缓存：启动时读入 folder 下的全部文件，之后的请求不再访问文件系统。
+
+    - .js / .css 额外以 名称.<内容哈希>.扩展名 提供，入口页中的引用改写为带指纹的名称；
+    - 可压缩的文件预先用最高级别压缩成 gzip（以及已安装 brotli 时的 br）；
+    - 响应带强 ETag，If-None-Match 命中时返回 304。
+
+    文件修改后需重启服务才会生效。
+    """
+
+    def __init__(self, folder: str) -> None:
+        self.folder = Path(folder)
+        self._assets: Dict[str, _Asset] = {}
+        self.fingerprints: Dict[str, str] = {}
+
+        files = {
+            path.relative_to(self.folder).as_posix(): path.read_bytes()
+            for path in sorted(self.folder.rglob("*"))
+            if path.is_file()
+        }
+        for name, data in files.items():
+            if name.endswith(FINGERPRINT_SUFFIXES):
+                stem, dot, suffix = name.rpartition(".")
+                digest = hashlib.sha256(data).hexdigest()[:12]
+                self.fingerprints[name] = f"{stem}.{digest}{dot}{suffix}"
+        for name, data in files.items():
+            if name.endswith(".html"):
+                data = self._rewrite_references(data)
+            self._add(name, data, REVALIDATE_CACHE)
+            if name in self.fingerprints:
+                self._add(self.fingerprints[name], data, IMMUTABLE_CACHE)
+
+    def response(self, path: str) -> Optional[Response]:
+        """返回 path 对应的响应；不存在时返回 None。"""
+        asset = self._assets.get(path)
+        if asset is None:
+            return None
+        encoding = negotiate_encoding(tuple(key for key in ("br", "gzip") if key in asset.bodies))
+        etag = asset.etag if encoding is None else f"{asset.etag}-{encoding}"
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(asset.bodies[encoding or "identity"], content_type=asset.content_type)
+            if encoding is not None:
+                response.headers["Content-Encoding"] = encoding
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = asset.cache_control
+        if len(asset.bodies) > 1:
+            response.vary.add("Accept-Encoding")
+        return response
+
+    def _add(self, name: str, data: bytes, cache_control: str) -> None:
+        content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        if content_type.startswith("text/") or content_type == "application/javascript":
+            content_type += "; charset=utf-8"
+        bodies = {"identity": data}
+        if name.endswith(COMPRESSIBLE_SUFFIXES):
+            bodies["gzip"] = compress_bytes(data, "gzip", best=True)
+            if brotli is not None:
+                bodies["br"] = compress_bytes(data, "br", best=True)
+        etag = hashlib.sha256(data).hexdigest()[:20]
+        self._assets[name] = _Asset(content_type, etag, cache_control, bodies)
+
+    def _rewrite_references(self, html: bytes) -> bytes:
+        # 只改写 src= / href= 中与文件名完全相同的相对引用，外部 CDN 链接不受影响
+        def replace(match: "re.Match[bytes]") -> bytes:
+            target = match.group(2).decode("utf-8")
+            fingerprinted = self.fingerprints.get(target.lstrip("/"))
+            if fingerprinted is None:
+                return match.group(0)
+            prefix = "/" if target.startswith("/") else ""
+            return match.group(1) + f"{prefix}{fingerprinted}".encode("utf-8") + match.group(3)
+
+        return re.sub(rb'((?:src|href)=")([^"]+)(")', replace, html)
@@ -0,0 +1,112 @@
+import json
+import mmap
+import os
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+# 用文件开头的若干字节做指纹，识别“同名但已被轮转替换”的文件（inode 不可靠的平台上同样有效）
+FINGERPRINT_BYTES = 256
+
+
+class IncrementalReader:
+    """
+    增量读取不断追加的日志：为每个文件记录已读到的字节偏移，下次调用只通过 mmap 读取新增的完整行。
+    偏移持久化到 state_file（JSON），进程重启后继续从上次位置读取。
+    文件被截断（变小）或被轮转替换（inode/开头指纹变化）时从头重新读取。
+    """
+
+    def __init__(self, state_file: Optional[str] = None) -> None:
+        self.state_file = Path(state_file) if state_file else None
+        self._lock = threading.Lock()
+        self._state: Dict[str, Dict[str, object]] = {}
+        if self.state_file is not None and self.state_file.exists():
+            try:
+                self._state = json.loads(self.state_file.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                self._state = {}
+
+    @staticmethod
+    def _fingerprint(handle, length: int) -> int:
+        handle.seek(0)
+        return zlib.crc32(handle.read(length))
+
+    def offset(self, path: str) -> int:
+        return int(self._state.get(str(Path(path).resolve()), {}).get("offset", 0))
+
+    def reset(self, path: str) -> None:
+        with self._lock:
+            self._state.pop(str(Path(path).resolve()), None)
+            self.save()
+
+    def save(self) -> None:
+        if self.state_file is None:
+            return
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_file.with_suffix(self.state_file.suffix + ".tmp")
+        tmp.write_text(json.dumps(self._state), encoding="utf-8")
+        os.replace(tmp, self.state_file)
+
+    def read_new_lines(self, path: str, encoding: str = "utf-8") -> Iterator[str]:
+        """
+        逐行产出自上次调用以来新增的完整行（不含行尾换行符）。末尾尚未写完的半行留到下次。
+        调用方中途停止迭代时，只记录已经产出的部分。
+        """
+        key = str(Path(path).resolve())
+        try:
+            handle = open(key, "rb")
+        except FileNotFoundError:
+            return
+        with handle:
+            stat = os.fstat(handle.fileno())
+            size = stat.st_size
+            previous = self._state.get(key, {})
+            offset = int(previous.get("offset", 0))
+            prefix_len = min(size, FINGERPRINT_BYTES)
+            fingerprint = self._fingerprint(handle, prefix_len)
+
+            rotated = previous.get("inode") not in (None, stat.st_ino)
+            # 上次读取时文件开头可能不足 FINGERPRINT_BYTES，按当时的长度比较
+            previous_len = int(previous.get("prefix_len", 0))
+            if not rotated and previous_len:
+                if size < previous_len:
+                    rotated = True
+                else:
+                    same = fingerprint if previous_len == prefix_len else self._fingerprint(handle, previous_len)
+                    rotated = previous.get("fingerprint") != same
+            if rotated or size < offset:
+                offset = 0
+
+            record = {
+                "offset": offset,
+                "inode": stat.st_ino,
+                "fingerprint": fingerprint,
+                "prefix_len": prefix_len,
+            }
+            self._state[key] = record
+            if size <= offset:
+                # 没有新内容也要保存变化的偏移和指纹（如被截断或轮转成空文件），否则重启后沿用旧偏移
+                if record != previous:
+                    with self._lock:
+                        self.save()
+                return
+
+            granularity = mmap.ALLOCATIONGRANULARITY
+            map_start = offset - offset % granularity
+            mapped = mmap.mmap(handle.fileno(), size - map_start, offset=map_start, access=mmap.ACCESS_READ)
+            try:
+                position = offset - map_start
+                end = mapped.rfind(b"\n", position)
+                if end < 0:
+                    return
+                while position <= end:
+                    newline = mapped.find(b"\n", position, end + 1)
+                    line = mapped[position:newline]
+                    position = newline + 1
+                    record["offset"] = map_start + position
+                    yield line.rstrip(b"\r").decode(encoding, "replace")
+            finally:
+                mapped.close()
+                with self._lock:
+                    self.save()
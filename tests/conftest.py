@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# 仓库模块位于根目录（非包），测试直接按模块名导入
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
@@ -0,0 +1,146 @@
+import io
+import json
+import subprocess
+import tarfile
+
+import pytest
+
+import util
+
+PROCESS = "technology.cariad.smartsystem.cn"
+
+
+def _tar_gz(folder, names):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+        directory = tarfile.TarInfo(folder)
+        directory.type = tarfile.DIRTYPE
+        tar.addfile(directory)
+        for name in names:
+            data = f"{folder}/{name}".encode()
+            info = tarfile.TarInfo(f"{folder}/{name}")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+class FakeBench:
+    """按序列号模拟设备：cache 下每个文件夹的文件数，以及 exec-out tar 输出的字节流。"""
+
+    def __init__(self, devices):
+        self.devices = devices
+        self.commands = []
+
+    def run_shell(self, command):
+        self.commands.append(command)
+        serial = command.split()[2]
+        if serial not in self.devices:
+            raise RuntimeError(f"device {serial} offline")
+        if "am get-current-user" in command:
+            return "10\n"
+        if "dumpsys package" in command:
+            return "    versionName=1.2.3\n"
+        if "wc -l" in command:
+            folder = command.split("/cache/")[1].split()[0]
+            return f"{len(self.devices[serial]['files'].get(folder, []))}\n"
+        return ""
+
+    def popen(self, cmd, stdout=None, stderr=None):
+        serial, folder = cmd[2], cmd[-1]
+        device = self.devices[serial]
+        stream = device.get("streams", {}).get(folder)
+        if stream is None:
+            stream = _tar_gz(folder, device["files"][folder])
+        return FakeProcess(stream, device.get("returncode", 0))
+
+    def removed(self, serial):
+        return [c.split("/cache/")[1] for c in self.commands if c.startswith(f"adb -s {serial} shell rm -rf")]
+
+
+class FakeProcess:
+    def __init__(self, data, returncode):
+        self.stdout = io.BytesIO(data)
+        self.returncode = returncode
+
+    def wait(self):
+        return self.returncode
+
+
+@pytest.fixture
+def bench(monkeypatch):
+    def install(devices):
+        fake = FakeBench(devices)
+        monkeypatch.setattr(util, "runShell", fake.run_shell)
+        monkeypatch.setattr(subprocess, "Popen", fake.popen)
+        return fake
+
+    return install
+
+
+def test_collects_all_devices_into_manifest(bench, tmp_path):
+    fake = bench({
+        "dev1": {"files": {"crash": ["a.log", "b.log"], "dump": ["x.hprof"]}},
+        "dev2": {"files": {"crash": [], "dump": []}},
+    })
+    manifest_file = util.collectCrashOOMArtifacts(PROCESS, devices=["dev1", "dev2"], output=str(tmp_path))
+
+    manifest = json.loads(open(manifest_file, encoding="utf-8").read())
+    dev1, dev2 = manifest["devices"]["dev1"], manifest["devices"]["dev2"]
+    assert dev1["version"] == "1.2.3"
+    assert dev1["crash"]["count"] == 2 and dev1["oom"]["count"] == 1
+    with tarfile.open(dev1["crash"]["archive"], "r:gz") as tar:
+        assert sorted(m.name for m in tar if m.isfile()) == ["crash/a.log", "crash/b.log"]
+    assert dev2["crash"] == {"count": 0, "archive": None}
+    # 只有成功拉取的文件夹才在设备上清理
+    assert sorted(fake.removed("dev1")) == ["crash", "dump"]
+    assert fake.removed("dev2") == []
+
+
+@pytest.mark.parametrize("stream", [
+    b"",
+    _tar_gz("crash", ["a.log", "b.log"])[:40],
+    _tar_gz("crash", ["a.log"]),
+], ids=["empty", "truncated", "missing-members"])
+def test_incomplete_stream_keeps_device_files(bench, tmp_path, stream):
+    # 空流、截断的 gzip、文件数少于设备上的数量：都不删除设备上的原始文件
+    fake = bench({"dev1": {"files": {"crash": ["a.log", "b.log"], "dump": []}, "streams": {"crash": stream}}})
+    entry = util.collectDeviceArtifacts("dev1", PROCESS, output=str(tmp_path))
+    assert entry["crash"] == {"count": 2, "archive": None}
+    assert fake.removed("dev1") == []
+
+
+def test_failed_device_is_recorded_and_stale_manifest_removed(bench, tmp_path):
+    bench({"dev1": {"files": {"crash": ["a.log"], "dump": []}}})
+    stale = tmp_path / util.ARTIFACT_MANIFEST
+    stale.write_text(json.dumps({"devices": {"old": {}}}), encoding="utf-8")
+
+    manifest_file = util.collectCrashOOMArtifacts(PROCESS, devices=["dev1", "gone"], output=str(tmp_path))
+    manifest = json.loads(open(manifest_file, encoding="utf-8").read())
+    assert set(manifest["devices"]) == {"dev1", "gone"}
+    assert "offline" in manifest["devices"]["gone"]["error"]
+
+
+def test_summary_reads_manifest_and_keeps_it(bench, tmp_path):
+    bench({
+        "dev1": {"files": {"crash": ["a.log", "b.log"], "dump": ["x.hprof"]}},
+        "dev2": {"files": {"crash": ["c.log"], "dump": []}},
+    })
+    manifest_file = util.collectCrashOOMArtifacts(PROCESS, devices=["dev1", "dev2", "gone"], output=str(tmp_path))
+
+    crash_num, oom_num, crash_logs, oom_logs = util.getFinalCrashOOMTestResult(manifest_file)
+    assert (crash_num, oom_num) == (3, 1)
+    assert crash_logs.split("\r\n") == ["dev1 1.2.3: 2", "dev2 1.2.3: 1"]
+    assert oom_logs.split("\r\n") == ["dev1 outOfMemory: 1", "dev2 outOfMemory: 0"]
+    # 报表写出之前 manifest 不能被删除，失败时还能重新生成
+    assert (tmp_path / util.ARTIFACT_MANIFEST).exists()
+    assert util.getFinalCrashOOMTestResult(manifest_file)[:2] == (3, 1)
+
+
+def test_summary_without_manifest_counts_file_names(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "result/tmp/crash").mkdir(parents=True)
+    (tmp_path / "result/tmp/dump").mkdir(parents=True)
+    (tmp_path / "result/tmp/crash/1.2.3.crash.4.tar.gz").write_bytes(b"")
+    (tmp_path / "result/tmp/dump/outOfMemort.2.hprof.tar.gz").write_bytes(b"")
+    assert util.getFinalCrashOOMTestResult()[:2] == (4, 2)
+    assert util.getFinalCrashOOMTestResult(str(tmp_path / "missing.json"))[:2] == (4, 2)
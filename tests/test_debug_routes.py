@@ -0,0 +1,35 @@
+import pytest
+from flask import Flask
+
+import server
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    server.register_debug_routes(app, None)
+    return app.test_client()
+
+
+@pytest.mark.parametrize("query", [
+    "interval=-1",
+    "interval=0",
+    "seconds=-1",
+    "seconds=nan",
+    "interval=inf",
+    "interval=abc",
+])
+def test_profile_rejects_invalid_parameters(client, query):
+    response = client.get(f"/debug/profile?{query}")
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("query", ["seconds=-1", "limit=0", "limit=x"])
+def test_tracemalloc_rejects_invalid_parameters(client, query):
+    assert client.get(f"/debug/tracemalloc?{query}").status_code == 400
+
+
+def test_profile_clamps_tiny_interval(client):
+    response = client.get("/debug/profile?seconds=0.05&interval=1e-9")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
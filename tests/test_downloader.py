@@ -0,0 +1,138 @@
+import hashlib
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+
+from downloader import MANIFEST_SUFFIX, DownloadError, RangeDownloader
+
+SEGMENT = 64 * 1024
+PAYLOAD = os.urandom(SEGMENT * 8 + 123)
+
+
+class _RangeHandler(BaseHTTPRequestHandler):
+    """按 server 上的开关模拟制品库：支持 / 忽略 Range、给出校验和、在传输中途断开。"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        data = server.payload
+        match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        with server.lock:
+            server.ranges.append(self.headers.get("Range"))
+        if match and server.support_range:
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else len(data) - 1
+            body = data[start : end + 1]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+        else:
+            start, body = 0, data
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        if server.checksum is not None:
+            self.send_header("X-Checksum-Sha256", server.checksum)
+        self.end_headers()
+        if server.abort_from is not None and start >= server.abort_from and len(body) > 1:
+            # 只发送一半后断开，模拟传输中途中断
+            self.wfile.write(body[: len(body) // 2])
+            self.wfile.flush()
+            self.connection.shutdown(2)
+            return
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def range_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _RangeHandler)
+    server.daemon_threads = True
+    server.payload = PAYLOAD
+    server.support_range = True
+    server.checksum = hashlib.sha256(PAYLOAD).hexdigest()
+    server.abort_from = None
+    server.ranges = []
+    server.lock = threading.Lock()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/release.zip"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _segment_requests(server):
+    # 第一个请求是 bytes=0-0 的探测
+    return [item for item in server.ranges if item and item != "bytes=0-0"]
+
+
+def test_segmented_download(range_server, tmp_path):
+    target = tmp_path / "release.zip"
+    RangeDownloader(workers=4, segment_size=SEGMENT, retries=0).download(range_server.url, str(target))
+
+    assert target.read_bytes() == PAYLOAD
+    assert not (tmp_path / ("release.zip" + MANIFEST_SUFFIX)).exists()
+    assert len(_segment_requests(range_server)) == 9
+
+
+def test_resume_from_manifest_after_abort(range_server, tmp_path):
+    target = tmp_path / "release.zip"
+    manifest = tmp_path / ("release.zip" + MANIFEST_SUFFIX)
+    abort_from = SEGMENT * 5
+    range_server.abort_from = abort_from
+    with pytest.raises(DownloadError):
+        RangeDownloader(workers=4, segment_size=SEGMENT, retries=0).download(range_server.url, str(target))
+    assert manifest.exists()
+
+    range_server.abort_from = None
+    range_server.ranges.clear()
+    RangeDownloader(workers=4, segment_size=SEGMENT, retries=0).download(range_server.url, str(target))
+
+    assert target.read_bytes() == PAYLOAD
+    assert not manifest.exists()
+    # 已完成的前 5 段不再请求，只续传中断的分段
+    starts = [int(re.match(r"bytes=(\d+)-", item).group(1)) for item in _segment_requests(range_server)]
+    assert starts and min(starts) >= abort_from
+
+
+def test_checksum_mismatch_discards_download(range_server, tmp_path):
+    target = tmp_path / "release.zip"
+    range_server.checksum = hashlib.sha256(b"other").hexdigest()
+    with pytest.raises(DownloadError, match="校验失败"):
+        RangeDownloader(workers=2, segment_size=SEGMENT, retries=0).download(range_server.url, str(target))
+
+    # 校验失败的数据不能用于续传
+    assert not target.exists()
+    assert not (tmp_path / ("release.zip" + MANIFEST_SUFFIX)).exists()
+
+
+def test_explicit_checksum_mismatch(range_server, tmp_path):
+    range_server.checksum = None
+    with pytest.raises(DownloadError):
+        RangeDownloader(segment_size=SEGMENT, retries=0).download(
+            range_server.url, str(tmp_path / "release.zip"), checksum="0" * 64
+        )
+
+
+def test_server_ignoring_range_falls_back_to_stream(range_server, tmp_path):
+    target = tmp_path / "release.zip"
+    range_server.support_range = False
+    RangeDownloader(workers=4, segment_size=SEGMENT, retries=0).download(range_server.url, str(target))
+
+    assert target.read_bytes() == PAYLOAD
+    # 探测之后只有一次不带 Range 的完整请求
+    assert range_server.ranges == ["bytes=0-0", None]
+
+
+def test_caller_session_adapters_are_kept(range_server, tmp_path):
+    session = requests.Session()
+    adapter = HTTPAdapter(max_retries=5)
+    session.mount("http://", adapter)
+    RangeDownloader(session, segment_size=SEGMENT, retries=0).download(range_server.url, str(tmp_path / "a.zip"))
+
+    assert session.get_adapter(range_server.url) is adapter
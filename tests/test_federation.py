@@ -0,0 +1,165 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+from benchmarks.load import install_shim
+from federation import FederatedMonitorService, Node
+
+ROOT = Path(__file__).resolve().parent.parent
+# 每个节点监控的 fake 设备；阈值足够高，测试期间不会触发 heapdump
+NODE_DEVICES = {"a": ["fake-0000", "fake-0001"], "b": ["fake-0002"]}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _get(url: str, timeout: float = 2.0):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return json.load(response)
+
+
+def _wait_ready(url: str, process: subprocess.Popen, deadline: float = 30.0) -> None:
+    """等到节点的每台设备都至少有一次成功采样。"""
+    started = time.monotonic()
+    while time.monotonic() - started < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"节点进程已退出：{process.returncode}")
+        try:
+            devices = _get(url + "/api/status")["devices"]
+            if devices and all(device["history"] for device in devices):
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"{url} 未就绪")
+
+
+@pytest.fixture(scope="module")
+def nodes(tmp_path_factory):
+    """以独立进程运行 server.py 的两个节点，各自使用临时端口和 fake adb。"""
+    workdir = tmp_path_factory.mktemp("federation")
+    shim = install_shim(workdir / "bin")
+    processes = {}
+    urls = {}
+    for name, devices in NODE_DEVICES.items():
+        port = _free_port()
+        env = dict(
+            os.environ,
+            PATH=f"{shim}{os.pathsep}{os.environ.get('PATH', '')}",
+            FAKE_ADB_DEVICES="3",
+            FAKE_ADB_STATE_DIR=str(workdir / "device"),
+            FAKE_ADB_LATENCY="0.01",
+            FAKE_ADB_JITTER="0",
+            MONITOR_DEVICES=",".join(devices),
+            MONITOR_CONNECT_LIST=devices[0],
+            MONITOR_INTERVAL="1",
+            MONITOR_THRESHOLD_MB="100000",
+            MONITOR_HOST="127.0.0.1",
+            MONITOR_PORT=str(port),
+            HEAPDUMP_OUTPUT=str(workdir / name / "heapdump"),
+        )
+        env.pop("MONITOR_NODES", None)
+        env.pop("MONITOR_WORKERS", None)
+        log = open(workdir / f"{name}.log", "w", encoding="utf-8")
+        processes[name] = subprocess.Popen(
+            [sys.executable, str(ROOT / "server.py")], cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT
+        )
+        urls[name] = f"http://127.0.0.1:{port}"
+    try:
+        for name, url in urls.items():
+            _wait_ready(url, processes[name])
+        yield {name: (urls[name], processes[name]) for name in urls}
+    finally:
+        for process in processes.values():
+            if process.poll() is None:
+                process.terminate()
+        for process in processes.values():
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def _federation(nodes, cache_ttl: float = 0.0) -> FederatedMonitorService:
+    return FederatedMonitorService(
+        [Node(name, url) for name, (url, _) in nodes.items()], timeout=2.0, cache_ttl=cache_ttl
+    )
+
+
+def test_merged_status(nodes):
+    service = _federation(nodes)
+    status = service.get_status()
+
+    placement = {device["device"]: device["node"] for device in status["devices"]}
+    assert placement == {"fake-0000": "a", "fake-0001": "a", "fake-0002": "b"}
+    assert status["devices_monitored"] == 3
+    assert [(node["name"], node["ok"]) for node in status["nodes"]] == [("a", True), ("b", True)]
+    assert not any(device["stale"] for device in status["devices"])
+    # 历史查询按设备归属转发到所在节点
+    assert service.get_history("fake-0002")
+
+
+def test_merged_percentiles(nodes):
+    service = _federation(nodes)
+    result = service.get_percentiles(quantiles=(0.5, 0.99))
+
+    assert set(result["devices"]) == {"fake-0000", "fake-0001", "fake-0002"}
+    counts = [summary["count"] for summary in result["devices"].values()]
+    assert all(count > 0 for count in counts)
+    # 机群草图由各设备草图合并而来，样本数相加
+    assert result["fleet"]["count"] == sum(counts)
+    assert set(result["fleet"]["percentiles"]) == {"p50", "p99"}
+    for device, summary in result["devices"].items():
+        assert summary["min"] <= summary["percentiles"]["p50"] <= summary["max"]
+
+
+def test_single_flight_cache(nodes):
+    service = _federation(nodes, cache_ttl=30.0)
+    calls = []
+    fetch = service._fetch
+
+    def counting_fetch(node, path):
+        calls.append(node.name)
+        # 放慢请求，让并发的调用都落在同一次加载期间
+        time.sleep(0.3)
+        return fetch(node, path)
+
+    service._fetch = counting_fetch
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(service.get_status())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(calls) == ["a", "b"]
+    assert len(results) == 8
+    assert all(result is results[0] for result in results)
+    assert service.metrics.cache_hits.total() == 7
+
+
+def test_stale_fallback_after_node_killed(nodes):
+    service = _federation(nodes)
+    assert all(node["ok"] for node in service.get_status()["nodes"])
+
+    _, process = nodes["b"]
+    process.kill()
+    process.wait(timeout=10)
+    status = service.get_status()
+
+    by_name = {node["name"]: node for node in status["nodes"]}
+    assert by_name["a"]["ok"] and not by_name["b"]["ok"]
+    stale = {device["device"]: device["stale"] for device in status["devices"]}
+    # 节点 b 不可达时沿用它上一次成功的数据并标记为旧数据
+    assert stale == {"fake-0000": False, "fake-0001": False, "fake-0002": True}
@@ -0,0 +1,105 @@
+import json
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook, load_workbook
+
+import util
+
+CPU_ROWS = [12.5, 30.0, None, "n/a", 8.25, 150.0]
+MEM_ROWS_KB = [204800, 262144, 215040, None]
+
+
+def _raw_workbook(path):
+    workbook = Workbook()
+    cpu = workbook.active
+    cpu.title = "cpuinfo"
+    # cpuinfo 第 1 行是标题，表头在第 2 行
+    cpu.append(["CPU usage"])
+    cpu.append(["Time", "Total", "smartsystem"])
+    for index, value in enumerate(CPU_ROWS):
+        cpu.append([f"10:00:{index:02d}", value, 1.0])
+    mem = workbook.create_sheet("meminfo")
+    mem.append(["Time", "Java Heap", "Total"])
+    for index, value in enumerate(MEM_ROWS_KB):
+        mem.append([f"10:00:{index:02d}", 1024, value])
+    workbook.save(path)
+
+
+def _pandas_statistic(path, sheetname):
+    # 原先基于 pandas 的统计口径
+    if sheetname == "cpuinfo":
+        df = pd.read_excel(path, header=[1], sheet_name=sheetname, engine="openpyxl")
+        scale = 1
+    else:
+        df = pd.read_excel(path, sheet_name=sheetname, engine="openpyxl")
+        scale = 1024
+    column = pd.to_numeric(df["Total"], errors="coerce")
+    return round(column.mean() / scale, 1), round(column.max() / scale, 1)
+
+
+@pytest.mark.parametrize("sheetname, unit", [("cpuinfo", "%"), ("meminfo", "MB")])
+def test_statistic_matches_pandas(tmp_path, sheetname, unit):
+    raw = tmp_path / "raw.xlsx"
+    _raw_workbook(raw)
+    mean_value, max_value, result_unit = util.getStatistic(str(raw), sheetname, "Total")
+    assert (mean_value, max_value) == _pandas_statistic(raw, sheetname)
+    assert result_unit == unit
+
+
+def test_missing_column_raises(tmp_path):
+    raw = tmp_path / "raw.xlsx"
+    _raw_workbook(raw)
+    with pytest.raises(KeyError):
+        util.getStatistic(str(raw), "meminfo", "PSS")
+
+
+@pytest.fixture
+def report_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("MONITOR_SERVICE_URL", raising=False)
+    monkeypatch.setattr(util, "runShell", lambda command: "    versionName=1.2.3\n    versionName=SOP2\n")
+    template = Workbook()
+    template.active.title = "Report"
+    template.active["C15"] = "description"
+    template.save(tmp_path / "SmartSystemPerformanceTest.xlsx")
+    (tmp_path / "temp.txt").write_text("capture log\n", encoding="utf-8")
+    return tmp_path
+
+
+def test_report_reads_raw_samples_once(report_dir, monkeypatch):
+    raw = report_dir / "result.xlsx"
+    _raw_workbook(raw)
+    manifest = report_dir / util.ARTIFACT_MANIFEST
+    manifest.write_text(json.dumps({"devices": {
+        "dev1": {"version": "1.2.3", "crash": {"count": 1, "archive": None}, "oom": {"count": 0, "archive": None}},
+    }}), encoding="utf-8")
+
+    opened = []
+    real_load_workbook = util.load_workbook
+
+    def counting_load_workbook(filename, *args, **kwargs):
+        opened.append(str(filename))
+        return real_load_workbook(filename, *args, **kwargs)
+
+    monkeypatch.setattr(util, "load_workbook", counting_load_workbook)
+    util.generateFinalReport(str(raw), "com.example", 0, 3600, artifact_manifest=str(manifest))
+    assert opened.count(str(raw)) == 1
+
+    report = real_load_workbook(raw)
+    sheet = report["Report"]
+    assert sheet["D9"].value == "150.0%"
+    assert sheet["D10"].value == "50.2%"
+    assert (sheet["G9"].value, sheet["G10"].value) == ("FAILED", "FAILED")
+    assert sheet["D11"].value == "256.0MB"
+    assert sheet["D12"].value == "222.0MB"
+    assert (sheet["G11"].value, sheet["G12"].value) == ("FAILED", "FAILED")
+    assert (sheet["D13"].value, sheet["D14"].value) == (1, 0)
+    assert (sheet["B5"].value, sheet["B6"].value) == ("SOP2", "1.2.3")
+    assert sheet["C18"].value == "capture log\n"
+    # 原始数据逐行追加到报表中
+    assert report["cpuinfo"].max_row == 2 + len(CPU_ROWS)
+    assert [row[2] for row in report["meminfo"].iter_rows(min_row=2, values_only=True)] == MEM_ROWS_KB
+    assert not (report_dir / "temp.txt").exists()
+    assert manifest.exists()
+
@@ -0,0 +1,22 @@
+import pytest
+
+from monitor_service import MIN_RECONFIGURE_INTERVAL, MemoryMonitorService
+
+
+def _service(tmp_path) -> MemoryMonitorService:
+    return MemoryMonitorService("com.example", devices=["fake-0000"], heapdump_output=str(tmp_path / "heapdump"))
+
+
+@pytest.mark.parametrize("interval", [0, -1, MIN_RECONFIGURE_INTERVAL / 2])
+def test_reconfigure_rejects_busy_loop_interval(tmp_path, interval):
+    service = _service(tmp_path)
+    with pytest.raises(ValueError):
+        service.reconfigure(interval=interval)
+    assert service.interval == 3
+
+
+def test_reconfigure_applies_valid_values(tmp_path):
+    service = _service(tmp_path)
+    config = service.reconfigure(threshold_mb=300, interval=MIN_RECONFIGURE_INTERVAL)
+    assert config["threshold_mb"] == 300
+    assert config["interval"] == MIN_RECONFIGURE_INTERVAL
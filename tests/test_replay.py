@@ -0,0 +1,42 @@
+from monitor_service import build_service_from_env
+from replay import ReplayMemoryMonitorService
+from session_log import RawSample, SessionRecorder
+
+MEMINFO = "** MEMINFO in pid 1 [com.example] **\n           TOTAL   {kb}    0    0\n"
+
+
+def _record_session(path, values_mb):
+    recorder = SessionRecorder(str(path), {"process": "com.example", "interval": 1, "devices": ["fake-0000"]})
+    for index, value in enumerate(values_mb):
+        recorder.write("fake-0000", RawSample(0, MEMINFO.format(kb=value * 1024), ""), 0.01, ts=1_700_000_000 + index)
+    recorder.close()
+    return recorder.path
+
+
+def test_replay_from_env_does_not_touch_live_storage(tmp_path, monkeypatch):
+    session = _record_session(tmp_path / "session.ndjson.gz", [100, 300, 120])
+    live = tmp_path / "live"
+    monkeypatch.setenv("MONITOR_REPLAY", str(session))
+    monkeypatch.setenv("MONITOR_REPLAY_SPEED", "0")
+    monkeypatch.setenv("MONITOR_SAMPLE_DIR", str(live / "samples"))
+    monkeypatch.setenv("MONITOR_RECORD", str(live / "record.ndjson.gz"))
+    monkeypatch.setenv("MONITOR_CHECKPOINT", str(live / "state.ckpt"))
+    monkeypatch.setenv("MONITOR_THRESHOLD_MB", "250")
+    monkeypatch.setenv("HEAPDUMP_OUTPUT", str(live / "heapdump"))
+
+    service = build_service_from_env()
+    assert isinstance(service, ReplayMemoryMonitorService)
+    assert service.sample_store is None
+    assert service.retention is None
+    assert service.record_path is None
+    assert service.checkpoint_path is None
+
+    service.start()
+    assert service.finished.wait(10)
+    service.stop()
+
+    assert service.replayed == 3
+    assert [event["value_mb"] for event in service.heapdump_decisions] == [300.0]
+    assert not (live / "samples").exists()
+    assert not (live / "record.ndjson.gz").exists()
+    assert not (live / "state.ckpt").exists()
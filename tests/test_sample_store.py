@@ -0,0 +1,36 @@
+from sample_store import SampleStore
+
+
+def _ts(records):
+    return [record["ts"] for record in records]
+
+
+def test_append_after_torn_write_starts_a_new_line(tmp_path):
+    store = SampleStore(str(tmp_path))
+    store.append_many("dev1", "memory", ({"ts": float(ts), "value": ts} for ts in range(3)))
+    store.close()
+    # 模拟写到一半时进程崩溃
+    segment = store.segment_paths("dev1", "memory")[-1]
+    with open(segment, "a", encoding="utf-8") as handle:
+        handle.write('{"ts":3.0,"va')
+
+    store = SampleStore(str(tmp_path))
+    store.append("dev1", "memory", {"ts": 4.0, "value": 4})
+    assert _ts(store.iter_records("dev1", "memory")) == [0.0, 1.0, 2.0, 4.0]
+    store.close()
+
+
+def test_corrupt_lines_are_skipped(tmp_path):
+    store = SampleStore(str(tmp_path), max_segment_bytes=64)
+    store.append_many("dev1", "memory", ({"ts": float(ts), "value": ts} for ts in range(6)))
+    store.close()
+    first, second = store.segment_paths("dev1", "memory")[:2]
+    # 残行与下一条记录拼在同一行（旧版本写出的文件），以及分段开头的残行
+    with open(first, "a", encoding="utf-8") as handle:
+        handle.write('{"ts":9.0,"va{"ts":10.0}\n')
+    second.write_text('{"ts\n' + second.read_text(encoding="utf-8"), encoding="utf-8")
+
+    records = list(store.iter_records("dev1", "memory"))
+    assert _ts(records) == sorted(_ts(records))
+    assert set(_ts(records)) == {float(ts) for ts in range(6)}
+    assert _ts(store.iter_records("dev1", "memory", start=3.0)) == [3.0, 4.0, 5.0]
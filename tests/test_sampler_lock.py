@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+import types
+
+import pytest
+
+import server
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_second_process_is_refused(tmp_path, monkeypatch):
+    monkeypatch.setenv("HEAPDUMP_OUTPUT", str(tmp_path))
+    handle = server._acquire_sampler_lock()
+    try:
+        script = "import server\ntry:\n    server._acquire_sampler_lock()\nexcept server.SamplerLockError as e:\n    print(e)\n"
+        result = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, timeout=60)
+        assert f"进程 {os.getpid()} 已在" in result.stdout
+    finally:
+        server._release_sampler_lock(handle)
+    # 释放后可以再次获取
+    server._release_sampler_lock(server._acquire_sampler_lock())
+
+
+def test_windows_locks_a_byte_after_the_pid(tmp_path, monkeypatch):
+    calls = []
+    fake = types.SimpleNamespace(LK_NBLCK=2, LK_UNLCK=0)
+
+    def locking(fd, mode, size):
+        calls.append((mode, os.lseek(fd, 0, os.SEEK_CUR), size))
+        if mode == fake.LK_NBLCK and len(calls) > 1:
+            raise OSError(13, "Permission denied")
+
+    fake.locking = locking
+    monkeypatch.setitem(sys.modules, "msvcrt", fake)
+    monkeypatch.setattr(server, "os", types.SimpleNamespace(name="nt"))
+    with open(tmp_path / ".monitor.lock", "a+", encoding="utf-8") as handle:
+        server._lock_file(handle)
+        with pytest.raises(OSError):
+            server._lock_file(handle)
+        server._release_sampler_lock(handle)
+    assert calls == [
+        (fake.LK_NBLCK, server._WINDOWS_LOCK_OFFSET, 1),
+        (fake.LK_NBLCK, server._WINDOWS_LOCK_OFFSET, 1),
+        (fake.LK_UNLCK, server._WINDOWS_LOCK_OFFSET, 1),
+    ]
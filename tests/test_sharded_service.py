@@ -0,0 +1,66 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from benchmarks.load import install_shim
+from sharded_service import SUPERVISE_INTERVAL, ShardedMemoryMonitorService
+
+
+@pytest.fixture
+def fake_adb(tmp_path, monkeypatch):
+    shim = install_shim(tmp_path / "bin")
+    monkeypatch.setenv("PATH", f"{shim}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("FAKE_ADB_DEVICES", "4")
+    monkeypatch.setenv("FAKE_ADB_STATE_DIR", str(tmp_path / "device"))
+    monkeypatch.setenv("FAKE_ADB_LATENCY", "0.01")
+    monkeypatch.setenv("FAKE_ADB_JITTER", "0")
+    return tmp_path
+
+
+def _service(workdir) -> ShardedMemoryMonitorService:
+    return ShardedMemoryMonitorService(
+        workers=2,
+        process_name="com.example",
+        devices=[f"fake-{index:04d}" for index in range(4)],
+        interval=1,
+        threshold_mb=100000,
+        heapdump_output=str(workdir / "heapdump"),
+    )
+
+
+def _wait(predicate, timeout: float = 20.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_supervisor_restarts_killed_worker(fake_adb):
+    service = _service(fake_adb)
+    service.start()
+    try:
+        victim = service._processes[0]
+        victim.kill()
+        assert _wait(lambda: service.worker_restarts == 1)
+        assert _wait(lambda: service._processes[0] is not victim and service._processes[0].is_alive())
+    finally:
+        service.stop()
+
+
+def test_stop_while_worker_dead_does_not_respawn(fake_adb):
+    service = _service(fake_adb)
+    service.start()
+    supervisor = service._supervisor
+    # 监督线程下一轮检查前杀掉 worker 并立即停止：不能再拉起，也不能因 _controls 已清空而出错
+    service._processes[0].kill()
+    service.stop()
+
+    assert not supervisor.is_alive()
+    assert service._processes == [] and service._controls == []
+    time.sleep(SUPERVISE_INTERVAL * 1.5)
+    assert service.worker_restarts == 0
+    assert not [child for child in multiprocessing.active_children() if child.name.startswith("sampler-")]
@@ -0,0 +1,35 @@
+from tail_reader import IncrementalReader
+
+
+def _write(path, lines, mode="w"):
+    with open(path, mode, encoding="utf-8") as fh:
+        fh.writelines(f"{line}\n" for line in lines)
+
+
+def test_reads_only_new_lines_across_restarts(tmp_path):
+    log, state = tmp_path / "capture.log", tmp_path / "state.json"
+    _write(log, [f"line {index}" for index in range(5)])
+    assert list(IncrementalReader(str(state)).read_new_lines(str(log))) == [f"line {index}" for index in range(5)]
+
+    _write(log, ["line 5", "partial"], mode="a")
+    with open(log, "a", encoding="utf-8") as fh:
+        fh.write("tail without newline")
+    assert list(IncrementalReader(str(state)).read_new_lines(str(log))) == ["line 5", "partial"]
+
+
+def test_truncation_to_empty_is_persisted(tmp_path):
+    log, state = tmp_path / "capture.log", tmp_path / "state.json"
+    old = [f"line {index}" for index in range(10)]
+    _write(log, old)
+    reader = IncrementalReader(str(state))
+    assert list(reader.read_new_lines(str(log))) == old
+
+    # 原地截断为空：没有新行可读，但新的偏移必须落盘
+    _write(log, [])
+    assert list(reader.read_new_lines(str(log))) == []
+    assert IncrementalReader(str(state)).offset(str(log)) == 0
+
+    # 重启后文件重新写到超过旧偏移，开头与旧文件相同：仍要从头读取
+    new = [f"line {index}" for index in range(20)]
+    _write(log, new)
+    assert list(IncrementalReader(str(state)).read_new_lines(str(log))) == new
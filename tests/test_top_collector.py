@@ -0,0 +1,82 @@
+from pathlib import Path
+
+from top_collector import TopCollector, TopFrameParser
+
+FIXTURE = Path(__file__).resolve().parent.parent / "benchmarks" / "fixtures" / "top_toybox.log"
+DELAY = 5.0
+
+
+class _Clock:
+    """每读到一帧的摘要首行前进一个刷新周期，模拟 top -b -d 5 的输出节奏。"""
+
+    def __init__(self) -> None:
+        self.now = 1_700_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _lines_with_clock(clock: _Clock):
+    for line in FIXTURE.read_text(encoding="utf-8").splitlines(keepends=True):
+        if line.startswith("Tasks:"):
+            clock.now += DELAY
+        yield line
+
+
+def test_frame_time_is_header_time_not_flush_time():
+    clock = _Clock()
+    parser = TopFrameParser(clock=clock)
+    header_times = []
+    frame_times = []
+    for line in _lines_with_clock(clock):
+        if line.split() and line.split()[0] == "PID":
+            header_times.append(clock.now)
+        if parser.feed(line) is not None:
+            frame_times.append(parser.frame_time)
+            # 帧在下一帧开始时才结束，此时时钟已前进一个周期
+            assert clock.now - parser.frame_time == DELAY
+    if parser.flush() is not None:
+        frame_times.append(parser.frame_time)
+
+    assert frame_times == header_times
+
+
+class _Store:
+    def __init__(self) -> None:
+        self.rows = []
+
+    def append_many(self, device_id, kind, records):
+        self.rows.extend(records)
+
+
+class _Stdout:
+    def __init__(self, lines) -> None:
+        self._lines = lines
+
+    def __iter__(self):
+        return self._lines
+
+    def close(self) -> None:
+        pass
+
+
+class _Process:
+    def __init__(self, lines) -> None:
+        self.stdout = _Stdout(lines)
+
+    def wait(self, timeout=None):
+        return 0
+
+
+def test_collector_stamps_rows_with_frame_start():
+    clock = _Clock()
+    store = _Store()
+    process = _Process(_lines_with_clock(clock))
+    collector = TopCollector("fake-0000", store, delay=DELAY, popen=lambda *args, **kwargs: process, clock=clock)
+    collector._running = True
+    collector._stream_once()
+
+    stamps = sorted({row["ts"] for row in store.rows})
+    assert collector.frames == 40
+    # 每帧的行都带该帧表头到达的时间，而不是晚一个周期的下一帧到达时间
+    assert stamps == [1_700_000_000.0 + DELAY * (index + 1) for index in range(40)]
@@ -0,0 +1,45 @@
+import os
+import zipfile
+
+import util
+
+
+def _release_zip(path, folders=300):
+    members = {}
+    for index in range(folders):
+        members[f"f{index}/app{index}.apk"] = os.urandom(2048)
+        members[f"f{index}/default_permissions_{index}.xml"] = f"<default {index}/>".encode()
+        members[f"f{index}/privapp_permissions_{index}.xml"] = f"<privapp {index}/>".encode()
+    members["README.txt"] = b"not needed"
+    with zipfile.ZipFile(path, "w") as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+    return members
+
+
+def test_parallel_extract_into_new_shared_folders(tmp_path):
+    # 每个文件夹下 3 个成员同时落在一个尚不存在的父目录里
+    zip_path = tmp_path / "release.zip"
+    members = _release_zip(zip_path)
+    for run in range(10):
+        out = tmp_path / f"out{run}"
+        files = util.unzip(str(zip_path), str(out), workers=16)
+        assert len(files) == 300
+        for name, data in members.items():
+            target = out / "release" / name
+            if name == "README.txt":
+                assert not target.exists()
+            else:
+                assert target.read_bytes() == data
+        assert files["f7"]["apk"] == f"{out}/release/f7/app7.apk"
+
+
+def test_skips_members_already_extracted(tmp_path, capsys):
+    zip_path = tmp_path / "release.zip"
+    _release_zip(zip_path, folders=5)
+    util.unzip(str(zip_path), str(tmp_path / "out"))
+    (tmp_path / "out" / "release" / "f0" / "app0.apk").write_bytes(b"corrupt")
+    capsys.readouterr()
+
+    util.unzip(str(zip_path), str(tmp_path / "out"))
+    assert "解压 1 个文件，跳过 14 个已存在的文件" in capsys.readouterr().out
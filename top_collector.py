@@ -0,0 +1,220 @@
+import subprocess
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence
+
+from sample_store import SampleStore
+
+# 不同版本 top 的列名：toybox 为 "S[%CPU] ... RES ... ARGS"，Android 7 及更早为 "CPU% ... RSS ... Name"
+_CPU_COLUMNS = ("%CPU", "CPU%")
+_RES_COLUMNS = ("RES", "RSS")
+_NAME_COLUMNS = ("ARGS", "CMD", "COMMAND", "NAME")
+
+MAX_RESTART_BACKOFF = 30.0
+
+
+def parse_size_kb(text: str) -> Optional[float]:
+    """把 top 中的内存列（"97M"、"1.2G"、"512K"、"123456"）换算为 KB。"""
+    if not text:
+        return None
+    units = {"K": 1, "M": 1024, "G": 1024 * 1024, "T": 1024 * 1024 * 1024}
+    unit = text[-1].upper()
+    try:
+        if unit in units:
+            return float(text[:-1]) * units[unit]
+        return float(text)
+    except ValueError:
+        return None
+
+
+def _split_header(line: str) -> List[str]:
+    columns = []
+    for token in line.split():
+        # toybox 把状态列和 CPU 列写在一起：S[%CPU]
+        if token.startswith("S[") and token.endswith("]"):
+            columns.extend(["S", token[2:-1]])
+        else:
+            columns.append(token)
+    return [column.upper() for column in columns]
+
+
+class TopFrameParser:
+    """
+    增量解析 top -b 的输出。逐行 feed，遇到进程表结束（下一帧的摘要行或空行）时返回整帧记录，
+    否则返回 None。每条记录包含 pid、name、cpu（%）和 res_kb。
+    帧要等到下一帧开始才能确定结束，返回时已晚了约一个刷新周期；frame_time 给出刚返回的帧
+    表头被解析时的 clock() 时间，即该帧实际输出的时刻。
+    """
+
+    def __init__(
+        self, process_filter: Optional[Sequence[str]] = None, clock: Callable[[], float] = time.time
+    ) -> None:
+        self.process_filter = tuple(process_filter or ())
+        self.clock = clock
+        self.columns: Optional[List[str]] = None
+        self.rows: List[Dict[str, object]] = []
+        self.frame_time: Optional[float] = None
+        self._started: Optional[float] = None
+        self._name_index: Optional[int] = None
+        self._cpu_index: Optional[int] = None
+        self._res_index: Optional[int] = None
+
+    def _index(self, candidates: Sequence[str]) -> Optional[int]:
+        for candidate in candidates:
+            if candidate in self.columns:
+                return self.columns.index(candidate)
+        return None
+
+    def _set_header(self, line: str) -> None:
+        self._started = self.clock()
+        self.columns = _split_header(line)
+        self._name_index = self._index(_NAME_COLUMNS)
+        self._cpu_index = self._index(_CPU_COLUMNS)
+        self._res_index = self._index(_RES_COLUMNS)
+
+    def _parse_row(self, tokens: List[str]) -> Optional[Dict[str, object]]:
+        name_index, cpu_index, res_index = self._name_index, self._cpu_index, self._res_index
+        if name_index is None or cpu_index is None:
+            return None
+        # 个别列（如 PCY）可能为空，导致列数少于表头；此时进程名取最后一列
+        name = " ".join(tokens[name_index:]) if len(tokens) >= len(self.columns) else tokens[-1]
+        if self.process_filter and not any(item in name for item in self.process_filter):
+            return None
+        try:
+            cpu = float(tokens[cpu_index].rstrip("%"))
+        except (IndexError, ValueError):
+            return None
+        res_kb = parse_size_kb(tokens[res_index]) if res_index is not None and res_index < len(tokens) else None
+        return {"pid": int(tokens[0]), "name": name, "cpu": cpu, "res_kb": res_kb}
+
+    def _finish(self) -> Optional[List[Dict[str, object]]]:
+        if self.columns is None:
+            return None
+        frame, self.rows, self.columns = self.rows, [], None
+        self.frame_time = self._started
+        return frame
+
+    def feed(self, line: str) -> Optional[List[Dict[str, object]]]:
+        tokens = line.split()
+        if tokens and tokens[0].upper() == "PID":
+            frame = self._finish()
+            self._set_header(line)
+            return frame
+        if self.columns is not None and tokens and tokens[0].isdigit():
+            row = self._parse_row(tokens)
+            if row is not None:
+                self.rows.append(row)
+            return None
+        return self._finish()
+
+    def flush(self) -> Optional[List[Dict[str, object]]]:
+        return self._finish()
+
+
+class TopCollector:
+    """
+    单台设备的 top 流式采集器：持续读取 adb shell top -b -d N，按帧解析为结构化记录写入 SampleStore
+    （类型 "top"），流中断或进程退出后按指数退避自动重启，直到调用 stop()。
+    """
+
+    def __init__(
+        self,
+        device_id: str,
+        store: SampleStore,
+        delay: float = 5.0,
+        process_filter: Optional[Sequence[str]] = None,
+        serial: Optional[str] = None,
+        popen: Callable[..., subprocess.Popen] = subprocess.Popen,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.device_id = device_id
+        # adb -s 使用的序列号；为空字符串时使用 adb 默认设备
+        self.serial = device_id if serial is None else serial
+        self.store = store
+        self.delay = delay
+        self.process_filter = list(process_filter or [])
+        self.restarts = 0
+        self.frames = 0
+        self.last_frame_time: Optional[datetime] = None
+        self._popen = popen
+        self._clock = clock
+        self._running = False
+        self._process: Optional[subprocess.Popen] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def is_alive(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def command(self) -> List[str]:
+        device_args = ["-s", self.serial] if self.serial else []
+        return ["adb", *device_args, "shell", "top", "-b", "-d", str(self.delay)]
+
+    def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._supervise, name=f"top-{self.device_id}", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._running = False
+        process = self._process
+        if process is not None and process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _supervise(self) -> None:
+        backoff = 1.0
+        while self._running:
+            started = time.monotonic()
+            self._stream_once()
+            if not self._running:
+                break
+            # 正常运行过一段时间后再断开，退避从头计算
+            if time.monotonic() - started > MAX_RESTART_BACKOFF:
+                backoff = 1.0
+            self.restarts += 1
+            print(f"TopCollector: {self.device_id} 的 top 流已中断，{backoff:.0f}s 后重启（第 {self.restarts} 次）")
+            time.sleep(backoff)
+            backoff = min(backoff * 2, MAX_RESTART_BACKOFF)
+
+    def _stream_once(self) -> None:
+        try:
+            self._process = self._popen(
+                self.command(),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                encoding="utf-8",
+                errors="replace",
+                bufsize=1,
+            )
+        except OSError as exc:
+            print(f"TopCollector: 无法启动 adb top（{self.device_id}）：{exc}")
+            return
+
+        parser = TopFrameParser(self.process_filter, clock=self._clock)
+        for line in self._process.stdout:
+            frame = parser.feed(line)
+            if frame is not None:
+                self._write_frame(frame, parser.frame_time)
+            if not self._running:
+                break
+        frame = parser.flush()
+        if frame:
+            self._write_frame(frame, parser.frame_time)
+        self._process.stdout.close()
+        self._process.wait()
+
+    def _write_frame(self, frame: List[Dict[str, object]], timestamp: float) -> None:
+        # 时间戳取帧表头到达的时刻，而不是帧结束（下一帧到达）时
+        self.frames += 1
+        self.last_frame_time = datetime.utcfromtimestamp(timestamp)
+        self.store.append_many(self.device_id, "top", ({"ts": timestamp, **row} for row in frame))
@@ -1,8 +1,14 @@
 import requests
 import os
 import zipfile
+import zlib
+import json
+import shutil
+import tarfile
+import threading
 import subprocess
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 import time
 from datetime import datetime
 from adbutils import adb
@@ -127,88 +133,98 @@ def getSmartSystemZips(session, url):
         print("Smartsystem release包列表获取失败，请检查网络")
         return False
 
-"""
-def downloadZip(session, url , zip_folder, file_name):    
-    zip_filename = zip_folder + '/' + file_name
-    chunk_size = 8192 
-    response = session.get(url, stream=True)
-    if response.status_code == 200:        
-        mkdirs(zip_folder)        
-        print('正在下载' + zip_filename)
-        with open(zip_filename, 'wb') as file:
-            i = 0
-            # 逐块读取响应内容并写入文件
-            for chunk in response.iter_content(chunk_size=chunk_size):
-                i += 1
-                if chunk:  # 过滤掉keep-alive新块
-                    file.write(chunk)
-                if i % 1000 == 0:
-                    print('下载到第' + str(i) + '个数据包了,chunk_zie=' + str(chunk_size))
-            print(zip_filename + ':下载完毕')
-    else:
-        print('Failed to download file')
-        exit()
-    return zip_filename
-"""
-
 def downloadZip(session, url, zip_folder, file_name):
-        zip_filename = zip_folder + "/" + file_name
-        if os.path.exists(zip_filename):
-            print("之前已经下载成功，跳过本步骤")
-            return zip_filename
+    # 分段并发下载，中断后可续传（进度记录在 <文件>.part.json），完成后校验大小和校验和
+    from downloader import DownloadError, RangeDownloader, MANIFEST_SUFFIX
+    zip_filename = zip_folder + "/" + file_name
+    if os.path.exists(zip_filename) and not os.path.exists(zip_filename + MANIFEST_SUFFIX):
+        print("之前已经下载成功，跳过本步骤")
+        return zip_filename
 
-        chunk_size = 8192
-        print(url)
+    mkdirs(zip_folder)
+    print("正在下载" + zip_filename)
+    try:
+        RangeDownloader(session).download(url, zip_filename)
+    except DownloadError as e:
+        print(f"Failed to download file: {e}")
         exit()
-        response = session.get(url, stream=True)
-        if response.status_code == 200:
-            mkdirs(zip_folder)
-            print("正在下载" + zip_filename)
-            with open(zip_filename, "wb") as file:
-                i = 0
-                # 逐块读取响应内容并写入文件
-                for chunk in response.iter_content(chunk_size=chunk_size):
-                    i += 1
-                    if chunk:  # 过滤掉keep-alive新块
-                        file.write(chunk)
-                    if i % 1000 == 0:
-                        print("下载到第" + str(i) + "个数据包了,chunk_zie=" + str(chunk_size))
-                print(zip_filename + ":下载完毕")
-        else:
-            print("Failed to download file")
-            exit()
-        return zip_filename
+    print(zip_filename + ":下载完毕")
+    return zip_filename
 
 
-def unzip(zip_path, extract_path):
+def classifyReleaseMember(member_name):
+    # release 包内 <文件夹>/<文件> 中需要的三类文件：apk、default_permissions*.xml、privapp_permissions*.xml
+    parts = member_name.split('/')
+    if len(parts) != 2 or not parts[1]:
+        return None
+    filename, extension_name = extract_name_and_extension(parts[1])
+    if extension_name == '.apk':
+        return parts[0], 'apk'
+    if extension_name == '.xml' and 'default_permissions' in filename:
+        return parts[0], 'default_permissions'
+    if extension_name == '.xml' and 'privapp_permissions' in filename:
+        return parts[0], 'privapp_permissions'
+    return None
+
+def _isExtracted(info, target):
+    # 已存在且大小、CRC 与压缩包中一致的文件无需重新解压
+    if not os.path.isfile(target) or os.path.getsize(target) != info.file_size:
+        return False
+    crc = 0
+    with open(target, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            crc = zlib.crc32(block, crc)
+    return crc == info.CRC
+
+def unzip(zip_path, extract_path, extract_all=False, workers=8):
     unzipped_files = defaultdict(lambda: defaultdict(str)) 
     file_name, _ = extract_name_and_extension(zip_path)
     unzip_folder = extract_path + '/' + file_name
     mkdirs(unzip_folder)
 
-    # 打开ZIP文件
+    # 只扫描一次中央目录，挑出需要的成员
     with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-        # 解压所有文件
-        zip_ref.extractall(unzip_folder)
-
-        # 列出所有文件
-        for file in zip_ref.namelist():
-            parts = file.split('/')            
-            if len(parts) < 2:
+        if extract_all:
+            zip_ref.extractall(unzip_folder)
+        selected = []
+        for info in zip_ref.infolist():
+            kind = classifyReleaseMember(info.filename)
+            if kind is None:
                 continue
-            folder = parts[0]
-            name = parts[1]
-            filename, extension_name = extract_name_and_extension(name)
-            name = unzip_folder + '/' + folder + '/' + name
-            #print(name, filename, extension_name)
-            if extension_name == '.apk':
-                unzipped_files[folder]['apk'] = name
-            elif extension_name == '.xml' and filename.find('default_permissions'):
-                unzipped_files[folder]['default_permissions'] = name
-            elif extension_name == '.xml' and filename.find('privapp_permissions'):
-                unzipped_files[folder]['privapp_permissions'] = name
-        print('解压缩成功！')
-        return unzipped_files
+            folder, key = kind
+            unzipped_files[folder][key] = unzip_folder + '/' + info.filename
+            if not extract_all:
+                selected.append(info)
+
+    # ZipFile.extract 先判断父目录是否存在再创建，多个线程同时解压同一新目录下的成员会抛 FileExistsError；
+    # 提交到线程池之前先串行建好所有父目录
+    for parent in sorted({os.path.dirname(os.path.join(unzip_folder, *info.filename.split('/'))) for info in selected}):
+        os.makedirs(parent, exist_ok=True)
+
+    # 每个线程使用独立的 ZipFile 句柄并行解压，跳过已存在且 CRC 一致的文件
+    local = threading.local()
+    handles = []
+    handles_lock = threading.Lock()
+
+    def extractMember(info):
+        target = os.path.join(unzip_folder, *info.filename.split('/'))
+        if _isExtracted(info, target):
+            return False
+        if not hasattr(local, 'zip_ref'):
+            local.zip_ref = zipfile.ZipFile(zip_path, 'r')
+            with handles_lock:
+                handles.append(local.zip_ref)
+        local.zip_ref.extract(info, unzip_folder)
+        return True
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            extracted = sum(pool.map(extractMember, selected))
+    finally:
+        for handle in handles:
+            handle.close()
+    print(f'解压缩成功！解压 {extracted} 个文件，跳过 {len(selected) - extracted} 个已存在的文件')
+    return unzipped_files
         
 
 def getTheLatestHcp3ReleaseZip(session, zip_folder, sorted_zips, jfrog_dl_base_url, filter="hcp3_release"):    
@@ -226,22 +242,32 @@ def runShell(command):
     return str
 
 
-def startCaptureTopLogs(testbench_ip, log_path):
-    today = datetime.now().strftime('%y%m%d')
-    # 构建日志文件路径
-    mkdirs(log_path + f"/{testbench_ip}")
-    log_file_path = log_path + f"/{testbench_ip}/{today}.log"
+_top_collectors = {}
+
+def startCaptureTopLogs(testbench_ip, log_path, delay=5, process_filter=('technology.cariad.smartsystem.cn',)):
+    # 结构化采集：逐帧解析 top -b 输出，按进程记录 CPU%/RES，写入 log_path 下按设备滚动的样本存储
+    from sample_store import SampleStore
+    from top_collector import TopCollector
 
-    # 执行top命令并将输出重定向到日志文件
     result = runShell(f'adb connect {testbench_ip}')
     print(result)
     result = runShell(f'adb root') 
     print(result)
     result = runShell(f'adb remount')
     print(result)
-    result = runShell(f"adb shell \"top -b|grep -E 'technology.cariad.smartsystem.cn|%cpu'\" > {log_file_path} &")
-    print(result)
-    return log_file_path
+
+    stopCaptureTopLogs(testbench_ip)
+    # 与原先的 adb shell 一致，使用 connect 之后的默认设备，记录按 testbench_ip 归档
+    collector = TopCollector(testbench_ip, SampleStore(log_path), delay, process_filter, serial='')
+    collector.start()
+    _top_collectors[testbench_ip] = collector
+    return collector
+
+def stopCaptureTopLogs(testbench_ip):
+    collector = _top_collectors.pop(testbench_ip, None)
+    if collector is not None:
+        collector.stop()
+        collector.store.close()
 
 def readlines(filename, max_lines):
     lines = []
@@ -252,8 +278,21 @@ def readlines(filename, max_lines):
             lines.append(line)
     return lines
 
+_incremental_readers = {}
+
+def readNewLines(filename, state_file='./tmp/readlines_offsets.json'):
+    # 增量读取：只返回自上次调用以来新增的完整行，偏移保存在 state_file 中，截断/轮转后自动从头读取
+    from tail_reader import IncrementalReader
+    reader = _incremental_readers.get(state_file)
+    if reader is None:
+        reader = _incremental_readers[state_file] = IncrementalReader(state_file)
+    return list(reader.read_new_lines(filename))
+
 def getTopPid(line):
     print(line)
+    return parseTopPid(line)
+
+def parseTopPid(line):
     columns = line.split(' ')
     return columns[0]
 
@@ -330,27 +369,92 @@ def copySheet(source_file, target_file, source_sheet_name, target_sheet_name=Non
     target_workbook.save(target_file)
 
 
+class ColumnStatistic:
+    """
+    逐行累计某一列的均值和最大值，口径与原先 pandas.read_excel 的统计一致：
+    cpuinfo 表头在第 2 行、单位 %；meminfo 表头在第 1 行、单位 KB 换算为 MB。
+    """
+
+    def __init__(self, sheetname, column_name):
+        self.column_name = column_name
+        if sheetname == 'cpuinfo':
+            self.header_row, self.scale, self.unit = 2, 1, '%'
+        else:
+            self.header_row, self.scale, self.unit = 1, 1024, 'MB'
+        self.column_index = None
+        self.total = 0.0
+        self.count = 0
+        self.max_value = None
+
+    def feed(self, row_number, row):
+        if row_number == self.header_row:
+            if self.column_name not in row:
+                raise KeyError(self.column_name)
+            self.column_index = row.index(self.column_name)
+            return
+        if row_number < self.header_row or self.column_index >= len(row):
+            return
+        value = row[self.column_index]
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return
+        self.total += value
+        self.count += 1
+        if self.max_value is None or value > self.max_value:
+            self.max_value = value
+
+    def result(self):
+        if not self.count:
+            return float('nan'), float('nan'), self.unit
+        mean_value = round(self.total / self.count / self.scale, 1)
+        max_value = round(self.max_value / self.scale, 1)
+        return mean_value, max_value, self.unit
+
+
 def getStatistic(filename, sheetname, column_name):    
-    import pandas as pd
-     # 读取Excel数据
-    if sheetname =='cpuinfo':
-        scale = 1        
-        unit = '%'        
-        df = pd.read_excel(filename , header=[1], sheet_name=sheetname, engine='openpyxl')
-    else:
-        scale = 1024
-        unit = 'MB'
-        df = pd.read_excel(filename , sheet_name=sheetname, engine='openpyxl')    
-    mean_value = round(df[column_name].mean() / scale, 1)
-    max_value = round(df[column_name].max() / scale, 1)
+    # 只读模式流式读取，不把整张表载入内存
+    workbook = load_workbook(filename, read_only=True, data_only=True)
+    try:
+        statistic = ColumnStatistic(sheetname, column_name)
+        for row_number, row in enumerate(workbook[sheetname].iter_rows(values_only=True), start=1):
+            statistic.feed(row_number, row)
+    finally:
+        workbook.close()
+    return statistic.result()
+
+def appendSheetWithStatistic(source_workbook, target_workbook, sheetname, column_name):
+    # 一次遍历：原始数据逐行追加到目标工作表，同时统计 column_name 列
+    source_sheet = source_workbook[sheetname]
+    if sheetname not in target_workbook.sheetnames:
+        target_workbook.create_sheet(title=sheetname)
+    target_sheet = target_workbook[sheetname]
+    statistic = ColumnStatistic(sheetname, column_name)
+    for row_number, row in enumerate(source_sheet.iter_rows(values_only=True), start=1):
+        target_sheet.append(row)
+        statistic.feed(row_number, row)
+    return statistic.result()
 
-    return mean_value, max_value, unit
+def getMemoryPercentiles(service_url, begin_time, end_time, quantiles='50,95,99', timeout=10):
+    # 从监控服务的分位数草图读取测试时段内所有设备合并后的内存百分位，不需要导出和扫描原始采样
+    try:
+        response = requests.get(
+            f"{service_url.rstrip('/')}/api/percentiles",
+            params={'metric': 'memory', 'from': begin_time, 'to': end_time, 'q': quantiles},
+            timeout=timeout,
+        )
+        response.raise_for_status()
+    except requests.RequestException as e:
+        print(f"获取内存百分位失败：{e}")
+        return {}
+    return response.json()['fleet']['percentiles']
 
 def getApkVersion(package_name, testbench_ip = ''):
-    versionName = ''
-    SystemVersion = ''    
     result = runShell(f'adb shell dumpsys package {package_name} | findstr "versionName"')
     print(result)
+    return parseApkVersion(result)
+
+def parseApkVersion(result):
+    versionName = ''
+    SystemVersion = ''
     temp = result.split("\n")
     try:
         if len(temp) > 1:
@@ -368,7 +472,7 @@ def getApkVersion(package_name, testbench_ip = ''):
     return versionName, SystemVersion
 
 
-def generateFinalReport(excel_file, pack_name, begin_time, end_time):
+def generateFinalReport(excel_file, pack_name, begin_time, end_time, artifact_manifest=None):
     # 打开 Excel 文件
     workbook = load_workbook('./SmartSystemPerformanceTest.xlsx')
 
@@ -384,8 +488,16 @@ def generateFinalReport(excel_file, pack_name, begin_time, end_time):
     color_red = PatternFill(start_color="FF0000", end_color="FF0000", fill_type="solid")
     color_green = PatternFill(start_color="00FF00", end_color="00FF00", fill_type="solid")
 
+    # 原始数据只读一遍：追加 cpuinfo/meminfo 工作表的同时计算均值和最大值
+    source_workbook = load_workbook(excel_file, read_only=True, data_only=True)
+    try:
+        cpu_statistic = appendSheetWithStatistic(source_workbook, workbook, 'cpuinfo', 'Total')
+        mem_statistic = appendSheetWithStatistic(source_workbook, workbook, 'meminfo', 'Total')
+    finally:
+        source_workbook.close()
+
     # CPU的值
-    cpu_mean, cpu_max , unit = getStatistic(excel_file, 'cpuinfo', 'Total')
+    cpu_mean, cpu_max , unit = cpu_statistic
     testresult_cpumax = cpu_max < threadhold_cpu_max
     testresult_cpumean = cpu_mean < threadhold_cpu_mean
     sheet['D9'] = f'{cpu_max}{unit}'
@@ -396,7 +508,7 @@ def generateFinalReport(excel_file, pack_name, begin_time, end_time):
     sheet['G10'].fill  = color_green if testresult_cpumean else color_red
 
     # 内存的值
-    mem_mean, mem_max , unit = getStatistic(excel_file, 'meminfo', 'Total')
+    mem_mean, mem_max , unit = mem_statistic
     testresult_memmax = mem_max < threadhold_mem_max
     testresult_memmean = mem_mean < threadhold_mem_mean
     sheet['D11'] = f'{mem_max}{unit}'
@@ -405,9 +517,16 @@ def generateFinalReport(excel_file, pack_name, begin_time, end_time):
     sheet['G12']  = 'PASS' if testresult_memmean else 'FAILED'
     sheet['G11'].fill = color_green if testresult_memmax else color_red
     sheet['G12'].fill = color_green if testresult_memmean else color_red
+
+    # 设置了 MONITOR_SERVICE_URL 时补充监控服务统计的内存百分位
+    service_url = os.environ.get('MONITOR_SERVICE_URL')
+    if service_url:
+        mem_percentiles = getMemoryPercentiles(service_url, begin_time, end_time)
+        if mem_percentiles:
+            sheet['H11'] = ' / '.join(f'{name}: {value}MB' for name, value in mem_percentiles.items())
     
     #分析crash/OOM的日志，并填写报告：
-    crash_num, oom_num, crash_logs, oom_logs = getFinalCrashOOMTestResult()
+    crash_num, oom_num, crash_logs, oom_logs = getFinalCrashOOMTestResult(artifact_manifest)
     sheet['C13'] = 'Total Times'
     sheet['C14'] = 'Total Times'
     sheet['D13'] = crash_num
@@ -438,43 +557,47 @@ def generateFinalReport(excel_file, pack_name, begin_time, end_time):
     description.replace('\n', '\r\n')
     sheet['C15'] = description
 
-    # 保存文件
+    # 保存文件（报表与 cpuinfo/meminfo 原始数据一次写出）
     workbook.save('./SmartSystemPerformanceTest_updated.xlsx')
 
-    # 合并报表
-    copySheet(excel_file, './SmartSystemPerformanceTest_updated.xlsx', 'cpuinfo', 'cpuinfo')
-    copySheet(excel_file, './SmartSystemPerformanceTest_updated.xlsx', 'meminfo', 'meminfo')
-
     #删除临时文件：
     deleteFile('temp.txt')
     deleteFile(excel_file)
     rename('./SmartSystemPerformanceTest_updated.xlsx', excel_file)
 
 
-def getFinalCrashOOMTestResult():    
-    #Crash的次数：    
+def getFinalCrashOOMTestResult(manifest_file=None):
+    # 传入本次 collectCrashOOMArtifacts 返回的 manifest 路径时直接汇总，不再从文件名推断；
+    # manifest 保留在原处（报表生成失败时可据此重新生成），下一次收集开始时才删除
+    if manifest_file and os.path.exists(manifest_file):
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        return summarizeArtifactManifest(manifest)
+    crash_files = [item for item in os.listdir('result/tmp/crash') if os.path.isfile('result/tmp/crash/' + item)]
+    oom_files = [item for item in os.listdir('result/tmp/dump') if os.path.isfile('result/tmp/dump/' + item)]
+    return parseCrashOOMFileNames(crash_files, oom_files)
+
+def parseCrashOOMFileNames(crash_files, oom_files):
+    #Crash的次数：<versionName>.crash.<次数>.tar.gz
     crash_result = []   
     crash_num = 0 
-    for item in os.listdir('result/tmp/crash'):
-        if os.path.isfile('result/tmp/crash/' + item):
-            tmp = item.split('.crash.')
-            if len(tmp) > 1:
-                version = tmp[0]
-                print(tmp)
-                parts = tmp[1].split('.')
-                crash_times = int(parts[0])
-                crash_result.append(version + ': ' + str(crash_times))
-                crash_num += crash_times    
+    for item in crash_files:
+        tmp = item.split('.crash.')
+        if len(tmp) > 1:
+            version = tmp[0]
+            parts = tmp[1].split('.')
+            crash_times = int(parts[0])
+            crash_result.append(version + ': ' + str(crash_times))
+            crash_num += crash_times    
     crash_logs = "\r\n".join(crash_result)
-    #oom的次数：
+    #oom的次数：outOfMemort.<次数>.hprof.tar.gz
     oom_num = 0
     oom_result = []
-    for item in os.listdir('result/tmp/dump'):
-        if os.path.isfile('result/tmp/dump/' + item):
-            tmp = item.split('.')
-            oom_times = int(tmp[1])            
-            oom_result.append(item + ': ' + str(oom_times))
-            oom_num += oom_times
+    for item in oom_files:
+        tmp = item.split('.')
+        oom_times = int(tmp[1])            
+        oom_result.append(item + ': ' + str(oom_times))
+        oom_num += oom_times
     oom_logs = "\r\n".join(oom_result)
     return crash_num, oom_num, crash_logs, oom_logs
 
@@ -543,6 +666,95 @@ def getOOMFileFromTestBench(processname):
     result = runShell(f'adb shell rm -rf /data/user/{current_user}/{processname}/cache/{oom_file}')
     result = runShell(f'adb shell rm -rf /data/user/{current_user}/{processname}/cache/{oom_folder}')    
 
+ARTIFACT_MANIFEST = 'manifest.json'
+ARTIFACT_FOLDERS = {'crash': 'crash', 'oom': 'dump'}
+
+def _countRemoteFiles(serial, remote_dir):
+    result = runShell(f'adb -s {serial} shell "ls -l {remote_dir} 2>/dev/null | grep ^- | wc -l"').strip()
+    return int(result) if result.isdigit() else 0
+
+def _streamRemoteTar(serial, remote_parent, folder, local_file):
+    # adb exec-out 直接输出 tar.gz 数据流，边收边写入本地文件，设备上不生成临时压缩包
+    cmd = ['adb', '-s', serial, 'exec-out', 'tar', '-czf', '-', '-C', remote_parent, folder]
+    print('正在执行命令：' + ' '.join(cmd))
+    with open(local_file, 'wb') as f:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        shutil.copyfileobj(process.stdout, f, 1024 * 1024)
+        process.stdout.close()
+        return process.wait() == 0
+
+def _verifyArchive(local_file, count):
+    # exec-out 不一定传回设备端 tar 的退出码：本地归档非空、能按 gzip 完整读出且普通文件不少于 count 个才算拉取成功
+    if not os.path.isfile(local_file) or os.path.getsize(local_file) == 0:
+        return False
+    try:
+        with tarfile.open(local_file, 'r:gz') as tar:
+            members = sum(1 for member in tar if member.isfile())
+    except (tarfile.TarError, EOFError, OSError, zlib.error):
+        return False
+    return members >= count
+
+def collectDeviceArtifacts(serial, processname, output='result/tmp', cleanup=True):
+    runShell(f'adb -s {serial} root')
+    runShell(f'adb -s {serial} wait-for-device')
+    current_user = runShell(f'adb -s {serial} shell am get-current-user').strip()
+    versionName, SystemVersion = parseApkVersion(
+        runShell(f'adb -s {serial} shell "dumpsys package {processname} | grep versionName"'))
+    cache_dir = f'/data/user/{current_user}/{processname}/cache'
+    device_dir = os.path.join(output, 'devices', serial.replace(':', '_'))
+    mkdirs(device_dir)
+
+    entry = {'version': versionName, 'system_version': SystemVersion, 'user': current_user}
+    for kind, folder in ARTIFACT_FOLDERS.items():
+        count = _countRemoteFiles(serial, f'{cache_dir}/{folder}')
+        archive = None
+        if count:
+            archive = os.path.join(device_dir, f'{kind}.tar.gz')
+            # 归档不完整时保留设备上的原始文件，不执行清理
+            if not _streamRemoteTar(serial, cache_dir, folder, archive) or not _verifyArchive(archive, count):
+                print(f'{serial} 拉取 {folder} 失败，保留设备上的文件')
+                archive = None
+            elif cleanup:
+                runShell(f'adb -s {serial} shell rm -rf {cache_dir}/{folder}')
+        entry[kind] = {'count': count, 'archive': archive}
+    return entry
+
+def collectCrashOOMArtifacts(processname, devices=None, output='result/tmp', workers=8, cleanup=True):
+    # 所有设备并发收集 crash/OOM 文件，结果（次数、版本、归档路径）写入结构化 manifest，返回 manifest 路径
+    manifest_file = os.path.join(output, ARTIFACT_MANIFEST)
+    # 先删除上一次的 manifest：本次收集失败时不会留下旧结果
+    if os.path.exists(manifest_file):
+        deleteFile(manifest_file)
+    devices = devices or [device.serial for device in adb.device_list()]
+    manifest = {'process': processname, 'collected_at': datetime.now().isoformat(), 'devices': {}}
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(devices) or 1))) as pool:
+        futures = {serial: pool.submit(collectDeviceArtifacts, serial, processname, output, cleanup) for serial in devices}
+        for serial, future in futures.items():
+            try:
+                manifest['devices'][serial] = future.result()
+            except Exception as e:
+                print(f'{serial} 收集 crash/OOM 文件失败：{e}')
+                manifest['devices'][serial] = {'error': str(e)}
+    mkdirs(output)
+    with open(manifest_file + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(manifest_file + '.tmp', manifest_file)
+    return manifest_file
+
+def summarizeArtifactManifest(manifest):
+    crash_num, oom_num = 0, 0
+    crash_result, oom_result = [], []
+    for serial, entry in manifest.get('devices', {}).items():
+        if 'error' in entry:
+            continue
+        crash_times = entry['crash']['count']
+        oom_times = entry['oom']['count']
+        crash_num += crash_times
+        oom_num += oom_times
+        crash_result.append(f"{serial} {entry['version']}: {crash_times}")
+        oom_result.append(f"{serial} outOfMemory: {oom_times}")
+    return crash_num, oom_num, "\r\n".join(crash_result), "\r\n".join(oom_result)
+
 def getLatestGitTag(repo_base, keyword):
     repo = git.Repo(repo_base)
     # 获取所有的标签